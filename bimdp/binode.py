@@ -287,6 +287,16 @@ def node_id(self):
         """Return the node id (should be string) or None."""
         return self._node_id
 
+    def get_affine_transform(self):
+        """Return None, BiNodes are never fused by `mdp.Flow.compile`.
+
+        Their messages, node ids and jump targets would be lost.
+        """
+        return None
+
+    def get_affine_inverse(self):
+        return None
+
     def bi_reset(self):
         """Reset the node for the next data chunck.
 
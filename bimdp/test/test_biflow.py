@@ -281,4 +281,14 @@ def test_append_node_copy(self):
         assert flow[0] is node1
         assert type(flow) is BiFlow
 
-
+    def test_compile(self):
+        """Test that compile keeps the BiFlow and does not fuse BiNodes."""
+        samples = mdp.numx_rand.random((100,10))
+        flow = BiFlow([mdp.nodes.PCANode(), mdp.nodes.SFANode(),
+                       nodes.PCABiNode(node_id="pca")])
+        flow.train(samples)
+        compiled = flow.compile(samples)
+        assert type(compiled) is BiFlow
+        assert len(compiled) == 2
+        assert isinstance(compiled[0], mdp.nodes.AffineNode)
+        assert compiled[1] is flow[2]
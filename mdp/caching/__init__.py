@@ -1,7 +1,8 @@
 from caching_extension import (activate_caching, deactivate_caching,
-                               cache, set_cachedir,
+                               cache, set_cachedir, MemoryCache,
+                               get_memory_cache,
                                __doc__, __docformat__)
 
 del caching_extension
 __all__ = ['activate_caching', 'deactivate_caching',
-           'cache', 'set_cachedir']
+           'cache', 'set_cachedir', 'MemoryCache', 'get_memory_cache']
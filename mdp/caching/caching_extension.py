@@ -3,27 +3,147 @@
 This extension is based on the **joblib** library by Gael Varoquaux,
 available at http://packages.python.org/joblib/. At the moment, the
 extension is based on joblib v. 0.4.6.
+
+Alternatively the results can be cached in memory (the 'memory' backend),
+in a least recently used (LRU) cache with a limited size.
 """
 __docformat__ = "restructuredtext en"
 
 import joblib
+import hashlib
+import weakref
+import cPickle as pickle
 from copy import deepcopy
 from tempfile import mkdtemp
 
 from ..extension import ExtensionNode, activate_extension, deactivate_extension
 from ..signal_node import Node
+from ..utils import OrderedDict
+from .. import numx
+
+# default size limit of the memory cache in bytes
+DEFAULT_MEMORY_LIMIT = 2**28
 
 # -- global attributes for this extension
 
 _cachedir = None
 # instance of joblib cache object (set with set_cachedir)
 _memory = None
+# cache backend, either 'joblib' or 'memory'
+_backend = 'joblib'
+# instance of MemoryCache, used by the 'memory' backend
+_memory_cache = None
 
 # True is the cache is active for *all* classes
 _cache_active_global = True
 _cached_classes = []
-_cached_instances = []
+_cached_instances = set()
 _cached_methods = {}
+# hash of the node states for the 'memory' backend, a digest is removed
+# as soon as the node state changes
+_node_digests = weakref.WeakKeyDictionary()
+
+
+class MemoryCache(object):
+    """In-memory least recently used (LRU) cache for execution results.
+
+    The total size of the stored results is limited to 'max_bytes', the
+    least recently used results are evicted first. The number of cache hits,
+    misses and evictions are counted.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_LIMIT):
+        """Create an empty cache.
+
+        :Parameters:
+         max_bytes
+           the maximum total size of the cached results in bytes
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        """Return the cached result for key, raise KeyError if missing.
+
+        The result is marked as the most recently used one.
+        """
+        try:
+            item = self._items.pop(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self._items[key] = item
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, result):
+        """Store a result, evicting old results if necessary.
+
+        Results that are larger than max_bytes are not stored.
+        """
+        nbytes = _result_nbytes(result)
+        if nbytes > self.max_bytes:
+            return
+        if key in self._items:
+            self.nbytes -= self._items.pop(key)[1]
+        self._items[key] = (result, nbytes)
+        self.nbytes += nbytes
+        self._evict()
+
+    def set_max_bytes(self, max_bytes):
+        """Change the size limit, evicting old results if necessary."""
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self):
+        """Remove all the cached results and reset the counters."""
+        self._items.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _evict(self):
+        """Remove least recently used results until the limit is met."""
+        while self.nbytes > self.max_bytes:
+            self.nbytes -= self._items.popitem(last=False)[1][1]
+            self.evictions += 1
+
+
+def _result_nbytes(result):
+    """Return the (approximate) size of an execution result in bytes."""
+    if isinstance(result, numx.ndarray):
+        return result.nbytes
+    if isinstance(result, (tuple, list)):
+        return sum(_result_nbytes(item) for item in result)
+    return len(pickle.dumps(result, -1))
+
+
+def _copy_result(result):
+    """Return a copy of result, so that the cached result stays untouched."""
+    if isinstance(result, numx.ndarray):
+        return result.copy()
+    return deepcopy(result)
+
+
+def get_memory_cache():
+    """Return the MemoryCache instance used by the 'memory' backend.
+
+    This can be used to check the hit and miss counters or to clear the
+    cache. None is returned if the 'memory' backend has never been
+    activated.
+    """
+    return _memory_cache
 
 def set_cachedir(cachedir=None, verbose=0):
     """Set root directory for the joblib cache.
@@ -91,10 +211,9 @@ def set_instance_cache(self, active=True):
         # add to global dictionary
         global _cached_instances
         if active:
-            _cached_instances.append(self)
+            _cached_instances.add(self)
         else:
-            if self in _cached_instances:
-                _cached_instances.remove(self)
+            _cached_instances.discard(self)
 
     def execute(self, x, *args, **kwargs):
         global _cached_methods
@@ -104,6 +223,9 @@ def execute(self, x, *args, **kwargs):
         if not self.is_cached():
             return self._non_extension_execute(x, *args, **kwargs)
 
+        if _backend == 'memory':
+            return self._memory_cached_execute(x, *args, **kwargs)
+
         if self not in _cached_methods:
             global _memory
             _cached_methods[self] = _memory.cache(
@@ -115,6 +237,49 @@ def execute(self, x, *args, **kwargs):
 
         return _cached_methods[self](self, x, *args, **kwargs)
 
+    def _memory_cached_execute(self, x, *args, **kwargs):
+        """Execute using the in-memory LRU cache.
+
+        The cache key is a hash of the node state, of the data, dtype and
+        shape of x and of the additional arguments. The node state is only
+        hashed again after the node has been trained or one of its
+        attributes has been set (arrays which are modified in place are
+        not detected).
+        """
+        digest = _node_digests.get(self)
+        if digest is None:
+            # see comment in 'execute' about the pre-execution checks
+            self._pre_execution_checks(x)
+            digest = hashlib.md5(pickle.dumps(self, -1)).digest()
+            _node_digests[self] = digest
+        x = numx.ascontiguousarray(x)
+        key_hash = hashlib.md5(digest)
+        key_hash.update(x.dtype.str.encode('ascii'))
+        key_hash.update(str(x.shape).encode('ascii'))
+        key_hash.update(x.data)
+        if args or kwargs:
+            key_hash.update(pickle.dumps((args, sorted(kwargs.items())), -1))
+        key = key_hash.digest()
+        try:
+            return _copy_result(_memory_cache.get(key))
+        except KeyError:
+            result = self._non_extension_execute(x, *args, **kwargs)
+            _memory_cache.put(key, _copy_result(result))
+            return result
+
+    def train(self, x, *args, **kwargs):
+        _node_digests.pop(self, None)
+        return self._non_extension_train(x, *args, **kwargs)
+
+    def stop_training(self, *args, **kwargs):
+        _node_digests.pop(self, None)
+        return self._non_extension_stop_training(*args, **kwargs)
+
+    def __setattr__(self, name, value):
+        # the node state changes, so the digest must be computed again
+        _node_digests.pop(self, None)
+        self._non_extension___setattr__(name, value)
+
 
 # ------- helper functions and context manager
 
@@ -122,7 +287,8 @@ def execute(self, x, *args, **kwargs):
 
 def activate_caching(cachedir=None,
                      cache_classes=None, cache_instances=None,
-                     verbose=0):
+                     verbose=0, backend='joblib',
+                     memory_limit=DEFAULT_MEMORY_LIMIT):
     """Activate caching extension.
 
     By default, the cache is activated globally (i.e., for all instances
@@ -138,19 +304,38 @@ def activate_caching(cachedir=None,
      cache_classes
       A list of Node instances for which caching is activated.
       Default value: None
+     backend
+      Either 'joblib' (default) to cache the results on disk, or 'memory'
+      to cache them in an in-memory LRU cache (see `MemoryCache`).
+     memory_limit
+      Maximum size in bytes of the results in the memory cache.
     """
     global _cache_active_global
     global _cached_classes
     global _cached_instances
-
-    set_cachedir(cachedir=cachedir, verbose=verbose)
+    global _backend
+    global _memory_cache
+
+    if backend not in ('joblib', 'memory'):
+        err = ("Unknown caching backend '%s', must be either 'joblib' "
+               "or 'memory'." % str(backend))
+        raise ValueError(err)
+    _backend = backend
+    if backend == 'memory':
+        # the cached results are kept between activations
+        if _memory_cache is None:
+            _memory_cache = MemoryCache(memory_limit)
+        else:
+            _memory_cache.set_max_bytes(memory_limit)
+    else:
+        set_cachedir(cachedir=cachedir, verbose=verbose)
     _cache_active_global = (cache_classes is None and cache_instances is None)
 
     # active cache for specific classes and instances
     if cache_classes is not None:
         _cached_classes = list(cache_classes)
     if cache_instances is not None:
-        _cached_instances = list(cache_instances)
+        _cached_instances = set(cache_instances)
 
     activate_extension('cache_execute')
 
@@ -163,10 +348,13 @@ def deactivate_caching(cachedir=None):
     global _cached_classes
     global _cached_instances
     global _cached_methods
+    global _backend
     _cache_active_global = True
     _cached_classes = []
-    _cached_instances = []
+    _cached_instances = set()
     _cached_methods = {}
+    _node_digests.clear()
+    _backend = 'joblib'
 
 class cache(object):
     """Context manager for the 'cache_execute' extension.
@@ -183,7 +371,8 @@ class cache(object):
     """
 
     def __init__(self, cachedir=None, cache_classes=None, cache_instances=None,
-                 verbose=0):
+                 verbose=0, backend='joblib',
+                 memory_limit=DEFAULT_MEMORY_LIMIT):
         """Activate caching extension.
 
         By default, the cache is activated globally (i.e., for all instances
@@ -199,15 +388,22 @@ def __init__(self, cachedir=None, cache_classes=None, cache_instances=None,
          cache_classes
           A list of Node instances for which caching is activated.
           Default value: None
+         backend
+          Either 'joblib' (default) or 'memory', see `activate_caching`.
+         memory_limit
+          Maximum size in bytes of the results in the memory cache.
         """
         self.cachedir = cachedir
         self.cache_classes = cache_classes
         self.cache_instances = cache_instances
         self.verbose = verbose
+        self.backend = backend
+        self.memory_limit = memory_limit
 
     def __enter__(self):
         activate_caching(self.cachedir, self.cache_classes,
-                         self.cache_instances, self.verbose)
+                         self.cache_instances, self.verbose,
+                         self.backend, self.memory_limit)
 
     def __exit__(self, type, value, traceback):
         deactivate_caching()
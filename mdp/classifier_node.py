@@ -2,6 +2,18 @@
 import operator
 
 
+def _label_array(labels):
+    """Return a 1d array with the given labels.
+
+    The array has the 'object' dtype, so that labels of any type (e.g.
+    tuples) are stored unchanged.
+    """
+    array = numx.empty((len(labels),), dtype=object)
+    for i, label in enumerate(labels):
+        array[i] = label
+    return array
+
+
 class ClassifierNode(PreserveDimNode):
     """A ClassifierNode can be used for classification tasks that should not
     interfere with the normal execution flow. A reason for that is that the
@@ -26,12 +38,38 @@ def __init__(self, execute_method=None,
                                              dtype=dtype)
 
     ### Methods to be implemented by the subclasses
+    # Subclasses which compute probabilities should implement either
+    # _prob_array or _prob, the other one is derived from it.
 
     def _label(self, x, *args, **kargs):
         raise NotImplementedError
 
+    def _overrides(self, name):
+        """Return True if the method 'name' of ClassifierNode is overwritten
+        in the class of this node."""
+        method = getattr(type(self), name)
+        # in Python 3 the class attribute is the plain function
+        return (getattr(method, '__func__', method) is not
+                ClassifierNode.__dict__[name])
+
     def _prob(self, x, *args, **kargs):
-        raise NotImplementedError
+        if not self._overrides('_prob_array'):
+            raise NotImplementedError
+        prob, labels = self._prob_array(x, *args, **kargs)
+        return [dict(zip(labels, p)) for p in prob]
+
+    def _prob_array(self, x, *args, **kargs):
+        if not self._overrides('_prob'):
+            raise NotImplementedError
+        prob_dicts = self._prob(x, *args, **kargs)
+        labels = set()
+        for p in prob_dicts:
+            labels.update(p.keys())
+        labels = sorted(labels)
+        prob = numx.zeros((len(prob_dicts), len(labels)))
+        for i, label in enumerate(labels):
+            prob[:, i] = [p.get(label, 0.) for p in prob_dicts]
+        return prob, _label_array(labels)
 
     ### User interface to the overwritten methods
 
@@ -56,6 +94,19 @@ def prob(self, x, *args, **kwargs):
         self._pre_execution_checks(x)
         return self._prob(self._refcast(x), *args, **kwargs)
 
+    def prob_array(self, x, *args, **kwargs):
+        """Returns a tuple (prob, labels), where prob is an array with the
+        probability of each label (columns) for each datapoint (rows) and
+        labels is a 1d array with the labels corresponding to the columns
+        (e.g., (array([[0.1, 0.0, 0.9], [1.0, 0.0, 0.0]]), array([1, 2, 3]))).
+
+        By default, subclasses should overwrite _prob_array to implement
+        their prob_array. The docstring of the '_prob_array' method
+        overwrites this docstring.
+        """
+        self._pre_execution_checks(x)
+        return self._prob_array(self._refcast(x), *args, **kwargs)
+
     def rank(self, x, threshold=None):
         """Returns ordered list with all labels ordered according to prob(x)
         (e.g., [[3 1 2], [2 1 3], ...]).
@@ -64,8 +115,22 @@ def rank(self, x, threshold=None):
         or less probability. E.g. threshold=0 excludes all labels with zero
         probability.
         """
+        if not self._overrides('_prob_array'):
+            # the probabilities are only available as dicts, which may
+            # contain different labels for each datapoint
+            return self._rank_prob_dicts(self.prob(x), threshold)
+        prob, labels = self.prob_array(x)
+        # stable sort in descending order of probability
+        order = (-prob).argsort(axis=1, kind="mergesort")
+        ranking = labels[order]
+        if threshold is None:
+            return ranking.tolist()
+        rows = numx.arange(prob.shape[0])[:, numx.newaxis]
+        keep = prob[rows, order] > threshold
+        return [list(r[k]) for r, k in zip(ranking, keep)]
+
+    def _rank_prob_dicts(self, prob, threshold):
         all_ranking = []
-        prob = self.prob(x)
         for p in prob:
             if threshold is None:
                 ranking = p.items()
@@ -86,7 +151,6 @@ def _execute(self, x):
         elif self.execute_method == "prob":
             return self.prob(x)
 
-# XXX are the _train and _stop_training functions necessary anymore?
 class ClassifierCumulator(VariadicCumulator('data', 'labels'), ClassifierNode):
     """A ClassifierCumulator is a Node whose training phase simply collects
     all input data and labels. In this way it is possible to easily implement
@@ -112,22 +176,10 @@ def _check_train_args(self, x, labels):
             raise mdp.TrainingException(msg)
 
     def _train(self, x, labels):
-        """Cumulate all input data in a one dimensional list."""
-        self.tlen += x.shape[0]
-        self.data.extend(x.ravel().tolist())
-
+        """Cumulate all input data and labels."""
         # if labels is a number, all x's belong to the same class
         if isinstance(labels, (list, tuple, numx.ndarray)):
-            pass
+            labels = numx.asarray(labels).ravel()
         else:
-            labels = [labels] * x.shape[0]
-
-        self.labels.extend(labels.ravel().tolist())
-
-    def _stop_training(self, *args, **kwargs):
-        """Transform the data and labels lists to array objects and reshape them."""
-        self.data = numx.array(self.data, dtype=self.dtype)
-        self.data.shape = (self.tlen, self.input_dim)
-        self.labels = numx.array(self.labels)
-        self.labels.shape = (self.tlen)
-
+            labels = numx.array([labels] * x.shape[0])
+        super(ClassifierCumulator, self)._train(x, labels)
@@ -28,7 +28,7 @@
 """
 
 from flownode import FlowNode
-from layer import Layer, SameInputLayer, CloneLayer
+from layer import Layer, SameInputLayer, CloneLayer, set_thread_pool_size
 from switchboard import (
     Switchboard, SwitchboardException, MeanInverseSwitchboard,
     ChannelSwitchboard,
@@ -51,7 +51,7 @@
            'DoubleRect2dSwitchboard', 'DoubleRect2dSwitchboardException',
            'DoubleRhomb2dSwitchboard', 'DoubleRhomb2dSwitchboardException',
            'HiNetHTMLVisitor', 'HiNetXHTMLVisitor', 'NewlineWriteFile',
-           'show_flow', 'get_2d_image_switchboard'
+           'show_flow', 'get_2d_image_switchboard', 'set_thread_pool_size'
            ]
 
 from mdp.utils import fixup_namespace
@@ -134,6 +134,9 @@ def is_trainable(self):
     def is_invertible(self):
         return all(node.is_invertible() for node in self._flow)
 
+    def is_row_independent(self):
+        return all(node.is_row_independent() for node in self._flow)
+
     def _get_train_seq(self):
         """Return a training sequence containing all training phases."""
         
@@ -171,6 +174,16 @@ def _stop_training_wrapper(*args, **kwargs):
                                                         train_seq[-1][1]))
         return train_seq
 
+    def freeze(self):
+        """Freeze this node and the nodes of the internal flow (see
+        `mdp.Node.freeze`)."""
+        super(FlowNode, self).freeze()
+        self._flow.freeze()
+
+    def unfreeze(self):
+        super(FlowNode, self).unfreeze()
+        self._flow.unfreeze()
+
     def _execute(self, x, *args, **kwargs):
         return self._flow.execute(x, *args, **kwargs)
 
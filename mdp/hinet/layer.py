@@ -5,9 +5,61 @@
 supported.
 """
 
+import threading
+import functools
+import multiprocessing.pool
+
 import mdp
 from mdp import numx
 
+# thread pool shared by all the layers with use_threads=True
+_thread_pool = None
+_thread_pool_size = None
+_thread_pool_lock = threading.Lock()
+# is set in the threads of the pool, to avoid deadlocks in nested layers
+_thread_state = threading.local()
+
+
+def set_thread_pool_size(n_threads=None):
+    """Set the number of threads in the pool shared by all layers.
+
+    n_threads -- Number of threads, if None (default) the number of
+        CPU cores is used.
+    """
+    global _thread_pool, _thread_pool_size
+    with _thread_pool_lock:
+        if _thread_pool is not None:
+            _thread_pool.close()
+            _thread_pool = None
+        _thread_pool_size = n_threads
+
+def _get_thread_pool():
+    """Return the shared thread pool, create it if necessary."""
+    global _thread_pool
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            n_threads = _thread_pool_size
+            if n_threads is None:
+                n_threads = multiprocessing.cpu_count()
+            _thread_pool = multiprocessing.pool.ThreadPool(n_threads)
+        return _thread_pool
+
+def _run_pool_task(task):
+    _thread_state.in_pool = True
+    return task()
+
+def _map_tasks(tasks, use_threads):
+    """Call all the tasks (functions without arguments), return the results.
+
+    If use_threads is True the tasks are performed by the shared thread pool.
+    Inside a pool thread (i.e., in nested layers) the tasks are always
+    performed sequentially.
+    """
+    if not use_threads or getattr(_thread_state, 'in_pool', False):
+        return [task() for task in tasks]
+    return _get_thread_pool().map(_run_pool_task, tasks)
+
+
 # TODO: maybe turn self.nodes into a read only property with self._nodes
 
 # TODO: Find a better way to deal with additional args for train/execute?
@@ -27,9 +79,14 @@ class Layer(mdp.Node):
     Since they are nodes themselves layers can be stacked in a flow (e.g. to
     build a layered network). If one would like to use flows instead of nodes
     inside of a layer one can use a FlowNode.
+
+    With use_threads=True the internal nodes are trained and executed in a
+    thread pool shared by all layers (see set_thread_pool_size). This is
+    useful when the nodes spend most of their time in numerical routines
+    which release the GIL.
     """
 
-    def __init__(self, nodes, dtype=None):
+    def __init__(self, nodes, dtype=None, use_threads=False):
         """Setup the layer with the given list of nodes.
 
         The input and output dimensions for the nodes must be already set
@@ -38,8 +95,11 @@ def __init__(self, nodes, dtype=None):
 
         Keyword arguments:
         nodes -- List of the nodes to be used.
+        use_threads -- If True the nodes are trained and executed in the
+            shared thread pool.
         """
         self.nodes = nodes
+        self.use_threads = use_threads
         # check nodes properties and get the dtype
         dtype = self._check_props(dtype)
         # calculate the the dimensions
@@ -121,6 +181,9 @@ def is_trainable(self):
     def is_invertible(self):
         return all(node.is_invertible() for node in self.nodes)
 
+    def is_row_independent(self):
+        return all(node.is_row_independent() for node in self.nodes)
+
     def _get_train_seq(self):
         """Return the train sequence.
 
@@ -133,15 +196,43 @@ def _get_train_seq(self):
                 max_train_length = node_length
         return ([[self._train, self._stop_training]] * max_train_length)
 
-    def _train(self, x, *args, **kwargs):
-        """Perform single training step by training the internal nodes."""
-        start_index = 0
+    def _input_slices(self):
+        """Return the input slices for the internal nodes."""
+        slices = []
         stop_index = 0
         for node in self.nodes:
             start_index = stop_index
             stop_index += node.input_dim
+            slices.append(slice(start_index, stop_index))
+        return slices
+
+    def _output_slices(self):
+        """Return the output slices for the internal nodes."""
+        slices = []
+        stop_index = 0
+        for node in self.nodes:
+            start_index = stop_index
+            stop_index += node.output_dim
+            slices.append(slice(start_index, stop_index))
+        return slices
+
+    def _train_threaded(self):
+        """Return True if the nodes should be trained in the thread pool."""
+        return self.use_threads
+
+    def _execute_threaded(self):
+        """Return True if the nodes should be executed in the thread pool."""
+        return self.use_threads
+
+    def _train(self, x, *args, **kwargs):
+        """Perform single training step by training the internal nodes."""
+        tasks = []
+        for i_node, in_slice in enumerate(self._input_slices()):
+            node = self.nodes[i_node]
             if node.is_training():
-                node.train(x[:, start_index : stop_index], *args, **kwargs)
+                tasks.append(functools.partial(node.train, x[:, in_slice],
+                                               *args, **kwargs))
+        _map_tasks(tasks, self._train_threaded())
 
     def _stop_training(self, *args, **kwargs):
         """Stop training of the internal nodes."""
@@ -151,6 +242,18 @@ def _stop_training(self, *args, **kwargs):
         if self.output_dim is None:
             self.output_dim = self._get_output_dim_from_nodes()
 
+    def freeze(self):
+        """Freeze this layer and its internal nodes (see
+        `mdp.Node.freeze`)."""
+        super(Layer, self).freeze()
+        for node in self.nodes:
+            node.freeze()
+
+    def unfreeze(self):
+        super(Layer, self).unfreeze()
+        for node in self.nodes:
+            node.unfreeze()
+
     def _pre_execution_checks(self, x):
         """Make sure that output_dim is set and then perform normal checks."""
         if self.output_dim is None:
@@ -168,25 +271,25 @@ def _pre_execution_checks(self, x):
         super(Layer, self)._pre_execution_checks(x)
 
     def _execute(self, x, *args, **kwargs):
-        """Process the data through the internal nodes."""
-        in_start = 0
-        in_stop = 0
-        out_start = 0
-        out_stop = 0
-        y = None
-        for node in self.nodes:
-            out_start = out_stop
-            out_stop += node.output_dim
-            in_start = in_stop
-            in_stop += node.input_dim
-            if y is None:
-                node_y = node.execute(x[:,in_start:in_stop], *args, **kwargs)
-                y = numx.zeros([node_y.shape[0], self.output_dim],
-                               dtype=node_y.dtype)
-                y[:,out_start:out_stop] = node_y
-            else:
-                y[:,out_start:out_stop] = node.execute(x[:,in_start:in_stop],
-                                                        *args, **kwargs)
+        """Process the data through the internal nodes.
+
+        The output of the first node determines the output dtype, the other
+        nodes then write their results directly into the output array.
+        """
+        in_slices = self._input_slices()
+        out_slices = self._output_slices()
+        node_y = self.nodes[0].execute(x[:, in_slices[0]], *args, **kwargs)
+        y = numx.empty([node_y.shape[0], self.output_dim],
+                       dtype=node_y.dtype)
+        y[:, out_slices[0]] = node_y
+        del node_y
+        def _execute_node(i_node):
+            node_x = x[:, in_slices[i_node]]
+            node = self.nodes[i_node]
+            y[:, out_slices[i_node]] = node.execute(node_x, *args, **kwargs)
+        _map_tasks([functools.partial(_execute_node, i_node)
+                    for i_node in range(1, len(self.nodes))],
+                   self._execute_threaded())
         return y
 
     def _inverse(self, x, *args, **kwargs):
@@ -238,18 +341,50 @@ class CloneLayer(Layer):
     A CloneLayer can be used for weight sharing in the training phase. It might
     be also useful for reducing the memory footprint use during the execution
     phase (since only a single node instance is needed).
+
+    If the node is row independent (see Node.is_row_independent) the layer
+    is executed by reshaping the input data, so that the node processes all
+    the input slices with a single execute call.
     """
 
-    def __init__(self, node, n_nodes=1, dtype=None):
+    def __init__(self, node, n_nodes=1, dtype=None, use_threads=False):
         """Setup the layer with the given list of nodes.
 
         Keyword arguments:
         node -- Node to be cloned.
         n_nodes -- Number of repetitions/clones of the given node.
+        use_threads -- Since a single node instance is used, the node is
+            always trained and executed sequentially, so this has no effect
+            (a row independent node processes all the input slices with a
+            single execute call, other nodes may modify themselves in
+            execute and can not be used concurrently).
         """
-        super(CloneLayer, self).__init__((node,) * n_nodes, dtype=dtype)
+        super(CloneLayer, self).__init__((node,) * n_nodes, dtype=dtype,
+                                         use_threads=use_threads)
         self.node = node  # attribute for convenience
 
+    def _train_threaded(self):
+        """Return True if the nodes should be trained in the thread pool."""
+        # the single node instance can not be trained concurrently
+        return False
+
+    def _execute_threaded(self):
+        """Return True if the nodes should be executed in the thread pool."""
+        # a node which is not row independent is executed slice by slice,
+        # the single node instance must then not be used concurrently
+        return False
+
+    def _execute(self, x, *args, **kwargs):
+        """Process the data through the internal node."""
+        if self.node is None or not self.node.is_row_independent():
+            return super(CloneLayer, self)._execute(x, *args, **kwargs)
+        # stack the input slices, so that all rows are executed at once
+        n_nodes = len(self.nodes)
+        y = self.node.execute(x.reshape(x.shape[0] * n_nodes,
+                                        self.node.input_dim),
+                              *args, **kwargs)
+        return y.reshape(x.shape[0], n_nodes * y.shape[1])
+
     def _stop_training(self, *args, **kwargs):
         """Stop training of the internal node."""
         if self.node.is_training():
@@ -264,7 +399,7 @@ class SameInputLayer(Layer):
     receive the complete input data.
     """
 
-    def __init__(self, nodes, dtype=None):
+    def __init__(self, nodes, dtype=None, use_threads=False):
         """Setup the layer with the given list of nodes.
 
         The input dimensions for the nodes must all be equal, the output
@@ -272,8 +407,11 @@ def __init__(self, nodes, dtype=None):
 
         Keyword arguments:
         nodes -- List of the nodes to be used.
+        use_threads -- If True the nodes are trained and executed in the
+            shared thread pool.
         """
         self.nodes = nodes
+        self.use_threads = use_threads
         # check node properties and get the dtype
         dtype = self._check_props(dtype)
         # check that the input dimensions are all the same
@@ -292,11 +430,9 @@ def __init__(self, nodes, dtype=None):
     def is_invertible():
         return False
 
-    def _train(self, x, *args, **kwargs):
-        """Perform single training step by training the internal nodes."""
-        for node in self.nodes:
-            if node.is_training():
-                node.train(x, *args, **kwargs)
+    def _input_slices(self):
+        """Return the input slices for the internal nodes."""
+        return [slice(None)] * len(self.nodes)
 
     def _pre_execution_checks(self, x):
         """Make sure that output_dim is set and then perform nromal checks."""
@@ -311,19 +447,3 @@ def _pre_execution_checks(self, x):
         # intentionally use MRO above Layer, not SameInputLayer
         super(Layer, self)._pre_execution_checks(x)
 
-    def _execute(self, x, *args, **kwargs):
-        """Process the data through the internal nodes."""
-        out_start = 0
-        out_stop = 0
-        y = None
-        for node in self.nodes:
-            out_start = out_stop
-            out_stop += node.output_dim
-            if y is None:
-                node_y = node.execute(x, *args, **kwargs)
-                y = numx.zeros([node_y.shape[0], self.output_dim],
-                               dtype=node_y.dtype)
-                y[:,out_start:out_stop] = node_y
-            else:
-                y[:,out_start:out_stop] = node.execute(x, *args, **kwargs)
-        return y
@@ -8,6 +8,7 @@
 
 import mdp
 from mdp import numx
+from numpy.lib.stride_tricks import as_strided
 
 
 class SwitchboardException(mdp.NodeException):
@@ -30,8 +31,18 @@ class Switchboard(mdp.Node):
     SwitchboardLayer is the most general version of a switchboard layer, since
     there is no imposed rule for the connection topology. For practical
     applications should often derive more specialized classes.
+
+    If the reuse_output attribute is set to True, the same output array is
+    used for all the execute calls with the same number of data points.
+    This avoids the memory allocation, but the result of the previous call
+    is then overwritten.
     """
 
+    # defaults for switchboards pickled before these attributes existed
+    reuse_output = False
+    _strided_layout = None
+    _output_buffer = None
+
     def __init__(self, input_dim, connections):
         """Create a generic switchboard.
 
@@ -63,9 +74,84 @@ def __init__(self, input_dim, connections):
             self.inverse_connections = numx.argsort(self.connections)
         else:
             self.inverse_connections = None
+        self.reuse_output = False
+        self._output_buffer = None
+        # the connections might form a single regular sequence
+        self._set_strided_layout([(self.output_dim,)])
+
+    def _set_strided_layout(self, block_shapes):
+        """Try to represent the connections as strided views of the input.
+
+        block_shapes -- List with the shapes of consecutive blocks of
+            output connections. The indices of the input connections in
+            each block must be an affine function of the block coordinates
+            (e.g., the connections of rectangular fields in an image),
+            otherwise no strided layout is used.
+
+        With a strided layout the routing in execute reduces to copying
+        strided views of the input, without any index arrays.
+        """
+        self._strided_layout = None
+        layout = []
+        start = 0
+        for shape in block_shapes:
+            shape = tuple(shape)
+            size = int(numx.prod(shape))
+            if size == 0:
+                continue
+            stop = start + size
+            if stop > self.output_dim:
+                return
+            block = self.connections[start:stop].astype('int64')
+            # index steps for the unit vectors of the block coordinates
+            unit_steps = numx.cumprod((1,) + shape[:0:-1])[::-1]
+            strides = tuple(int(block[step] - block[0]) if dim > 1 else 0
+                            for dim, step in zip(shape, unit_steps))
+            # verify that the block is described by the strides
+            grid = numx.zeros(shape, dtype='int64') + block[0]
+            for axis, (dim, stride) in enumerate(zip(shape, strides)):
+                grid_shape = [1] * len(shape)
+                grid_shape[axis] = dim
+                grid += (numx.arange(dim) * stride).reshape(grid_shape)
+            if not numx.all(grid.ravel() == block):
+                return
+            layout.append((start, stop, int(block[0]), shape, strides))
+            start = stop
+        if start == self.output_dim:
+            self._strided_layout = layout
+
+    def _get_output_array(self, x):
+        """Return the array for the execution result."""
+        shape = (x.shape[0], self.output_dim)
+        if not self.reuse_output:
+            return numx.empty(shape, dtype=x.dtype)
+        if (self._output_buffer is None or
+            self._output_buffer.shape != shape or
+            self._output_buffer.dtype != x.dtype):
+            self._output_buffer = numx.empty(shape, dtype=x.dtype)
+        return self._output_buffer
 
     def _execute(self, x):
-        return x[:, self.connections]
+        y = self._get_output_array(x)
+        layout = self._strided_layout
+        if layout is None:
+            # the connections have already been checked, so there is no
+            # need for the (buffered) default mode
+            return numx.take(x, self.connections, axis=1, out=y, mode='wrap')
+        for start, stop, offset, shape, strides in layout:
+            x_view = as_strided(x[:, offset:],
+                                shape=(x.shape[0],) + shape,
+                                strides=(x.strides[0],) +
+                                        tuple(stride * x.strides[1]
+                                              for stride in strides))
+            y_strides = numx.cumprod((1,) + shape[:0:-1])[::-1]
+            y_view = as_strided(y[:, start:stop],
+                                shape=(x.shape[0],) + shape,
+                                strides=(y.strides[0],) +
+                                        tuple(int(stride) * y.strides[1]
+                                              for stride in y_strides))
+            y_view[...] = x_view
+        return y
 
     @staticmethod
     def is_trainable():
@@ -327,6 +413,10 @@ def __init__(self, in_channels_xy, field_channels_xy,
                                 connections=connections,
                                 out_channel_dim=out_channel_dim,
                                 in_channel_dim=in_channel_dim)
+        # the fields are regular patches of the input image
+        self._set_strided_layout([(y_out_channels, x_out_channels,
+                                   field_channels_xy[1], field_channels_xy[0],
+                                   in_channel_dim)])
 
 
 class DoubleRect2dSwitchboardException(SwitchboardException):
@@ -497,6 +587,14 @@ def __init__(self, in_channels_xy, field_channels_xy,
                                 connections=connections,
                                 out_channel_dim=out_channel_dim,
                                 in_channel_dim=in_channel_dim)
+        # the long and the short row fields are regular patches
+        self._set_strided_layout([(even_y_out_channels, even_x_out_channels,
+                                   field_channels_xy[1], field_channels_xy[0],
+                                   in_channel_dim),
+                                  (even_y_out_channels - 1,
+                                   even_x_out_channels - 1,
+                                   field_channels_xy[1], field_channels_xy[0],
+                                   in_channel_dim)])
 
 
 class DoubleRhomb2dSwitchboardException(SwitchboardException):
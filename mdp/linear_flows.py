@@ -71,6 +71,48 @@ def __init__(self, *args):
 
         Exception.__init__(self, errstr)
 
+def _fuse_affine_nodes(nodes):
+    """Return a list of nodes equivalent to the sequence of affine nodes
+    'nodes', in which consecutive nodes are replaced by an AffineNode.
+
+    Two transformations are only fused if the fused matrix is not larger
+    than the separate matrices, e.g. a projection on few components
+    followed by a transformation back to a high dimensional space is
+    kept as it is.
+    """
+    result = []
+    # current group of nodes and its fused transformation
+    group, w, b, size = [], None, None, 0
+    for node in nodes + [None]:
+        if node is not None:
+            node_w, node_b = node.get_affine_transform()
+            if not group:
+                group, w, b, size = [node], node_w, node_b, node_w.size
+                continue
+            if w.shape[0]*node_w.shape[1] <= size + node_w.size:
+                group.append(node)
+                w = mdp.utils.mult(w, node_w)
+                b = mdp.utils.mult(b, node_w) + node_b
+                size = w.size
+                continue
+        # close the current group
+        if len(group) == 1:
+            result.append(group[0])
+        elif group:
+            inverses = [member.get_affine_inverse() for member in group
+                        if member.is_invertible()]
+            inverse_w = inverse_b = None
+            if len(inverses) == len(group) and None not in inverses:
+                inverse_w, inverse_b = inverses[-1]
+                for member_w, member_b in inverses[-2::-1]:
+                    inverse_w = mdp.utils.mult(inverse_w, member_w)
+                    inverse_b = mdp.utils.mult(inverse_b, member_w) + member_b
+            result.append(mdp.nodes.AffineNode(w, b, inverse_w, inverse_b,
+                                               dtype=group[0].dtype))
+        if node is not None:
+            group, w, b, size = [node], node_w, node_b, node_w.size
+    return result
+
 class Flow(object):
     """A 'Flow' is a sequence of nodes that are trained and executed
     together to form a more complex algorithm.  Input data is sent to the
@@ -332,6 +374,79 @@ def train(self, data_iterables):
 
         self._close_last_node()
 
+    def freeze(self):
+        """Freeze all the nodes in the flow, so that their execution checks
+        are only performed once for each input signature (see
+        `mdp.Node.freeze`). The training of all the nodes must be completed.
+        """
+        for node in self.flow:
+            node.freeze()
+
+    def unfreeze(self):
+        """Restore the normal execution checks of all the nodes."""
+        for node in self.flow:
+            node.unfreeze()
+
+    def compile(self, x=None, rtol=None, atol=None):
+        """Return a new flow for the execution of the trained flow, in
+        which consecutive affine nodes (e.g. `mdp.nodes.PCANode`,
+        `mdp.nodes.SFANode` or `mdp.nodes.NormalizeNode`) are replaced by
+        a single `mdp.nodes.AffineNode`, so that they are executed with
+        one matrix multiplication.
+
+        Nodes are affine if their `get_affine_transform` method returns
+        a transformation. The other nodes are shared with the new flow.
+        The fused node is invertible if all the replaced nodes provide
+        an affine inverse.
+
+        The new flow has the same class as this flow. Note that
+        `bimdp.BiNode` instances are never fused, since they take part
+        in the message routing.
+
+        If the data array 'x' is given, the outputs of the two flows
+        are compared with 'numx.allclose' and the tolerances 'rtol' and
+        'atol', and a 'FlowException' is raised if they differ. By default
+        both tolerances are the square root of the machine epsilon of the
+        output dtype.
+        """
+        for i, node in enumerate(self.flow):
+            if node.is_training():
+                err_str = ("Node #%d (%s) is still training, only "
+                           "trained flows can be compiled." % (i, str(node)))
+                raise FlowException(err_str)
+        nodes = []
+        affine_nodes = []
+        for node in self.flow:
+            if node.get_affine_transform() is not None:
+                affine_nodes.append(node)
+            else:
+                nodes.extend(_fuse_affine_nodes(affine_nodes))
+                affine_nodes = []
+                nodes.append(node)
+        nodes.extend(_fuse_affine_nodes(affine_nodes))
+        compiled = self.__class__(nodes, crash_recovery=self._crash_recovery,
+                                  verbose=self.verbose)
+        if x is not None:
+            y = self.execute(x)
+            y_compiled = compiled.execute(x)
+            if isinstance(y, tuple):
+                # a BiFlow returns the tuple (y, msg)
+                y, y_compiled = y[0], y_compiled[0]
+            if y.dtype.kind in "fc":
+                eps = numx.finfo(y.dtype).eps
+            else:
+                eps = numx.finfo("d").eps
+            if rtol is None:
+                rtol = numx.sqrt(eps)
+            if atol is None:
+                atol = numx.sqrt(eps)
+            if not numx.allclose(y, y_compiled, rtol=rtol, atol=atol):
+                err_str = ("The output of the compiled flow differs from "
+                           "the output of the flow (maximum absolute "
+                           "difference: %g)." % abs(y-y_compiled).max())
+                raise FlowException(err_str)
+        return compiled
+
     def _execute_seq(self, x, nodenr = None):
         # Filters input data 'x' through the nodes 0..'node_nr' included
         flow = self.flow
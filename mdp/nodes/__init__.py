@@ -9,8 +9,9 @@
                              GeneralExpansionNode)
 from fda_nodes import FDANode
 from em_nodes import FANode
-from misc_nodes import (IdentityNode, HitParadeNode, TimeFramesNode,
-                        TimeDelayNode, TimeDelaySlidingWindowNode,
+from misc_nodes import (IdentityNode, AffineNode, HitParadeNode,
+                        TimeFramesNode, TimeDelayNode,
+                        TimeDelaySlidingWindowNode,
                         EtaComputerNode, NoiseNode, NormalNoiseNode,
                         CutoffNode, HistogramNode, AdaptiveCutoffNode)
 from isfa_nodes import ISFANode
@@ -43,7 +44,7 @@
            'EtaComputerNode', 'HitParadeNode', 'NoiseNode', 'NormalNoiseNode',
            'TimeFramesNode', 'TimeDelayNode', 'TimeDelaySlidingWindowNode',
            'CutoffNode', 'AdaptiveCutoffNode', 'HistogramNode',
-           'IdentityNode', '_OneDimensionalHitParade']
+           'IdentityNode', 'AffineNode', '_OneDimensionalHitParade']
 
 # nodes with external dependencies
 from mdp import config, numx_description, MDPException
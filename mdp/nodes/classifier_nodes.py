@@ -2,6 +2,7 @@
 
 import mdp
 from mdp import ClassifierNode, utils, numx, numx_rand, numx_linalg
+from mdp.classifier_node import _label_array
 
 # TODO: The GaussianClassifier and NearestMeanClassifier could be parallelized.
 
@@ -349,24 +350,46 @@ class GaussianClassifier(ClassifierNode):
 
     Given a set of labelled data, the node fits a gaussian distribution
     to each class.
+
+    At the end of the training the covariance matrix of each class is
+    Cholesky-factorized, and the inverse factors of all the classes are
+    stacked into a single matrix. The Mahalanobis distances of the data to
+    all the class means are then computed with one matrix multiplication
+    for each chunk of rows, and the probabilities are computed in log
+    space, so that high dimensional data does not overflow.
     """
-    
-    def __init__(self, execute_method=False,
+
+    # default for nodes pickled before max_temp_size was added
+    max_temp_size = 2**22
+
+    def __init__(self, execute_method=False, max_temp_size=2**22,
                  input_dim=None, output_dim=None, dtype=None):
+        """
+        max_temp_size -- Maximum number of elements of the temporary arrays
+            used to compute the probabilities. The input data is processed
+            in chunks of rows small enough to respect this limit.
+        """
         super(GaussianClassifier, self).__init__(execute_method=execute_method,
                                                  input_dim=input_dim,
                                                  output_dim=output_dim,
                                                  dtype=dtype)
+        self.max_temp_size = max_temp_size
         self._cov_objs = {}  # only stored during training
-        # this list contains the square root of the determinant of the
+        # this list contains the logarithm of the determinant of the
         # corresponding covariance matrix
-        self._sqrt_def_covs = []
+        self.log_dets = []
         # we are going to store the inverse of the covariance matrices
         # since only those are useful to compute the probabilities
         self.inv_covs = []
         self.means = []
         self.p = []  # number of observations
         self.labels = None
+        # stacked inverse Cholesky factors of the covariance matrices,
+        # the corresponding transformed means and the constant terms of
+        # the log probabilities (set after training)
+        self._whitening = None
+        self._whitened_means = None
+        self._log_consts = None
 
     @staticmethod
     def is_invertible():
@@ -404,79 +427,128 @@ def _train(self, x, labels):
         else:
             self._update_covs(x, labels)
 
+    def _inverse_cholesky(self, cov):
+        """Return the matrix W such that mult(W, W.T) is the inverse of cov.
+
+        W is the transposed inverse of the lower Cholesky factor of cov.
+        """
+        try:
+            chol = numx_linalg.cholesky(cov)
+        except numx_linalg.LinAlgError:
+            err = ("The covariance matrix is singular for at least "
+                   "one class.")
+            raise mdp.NodeException(err)
+        # numpy returns the lower and scipy the upper triangular factor
+        dim = cov.shape[0]
+        if chol[numx.triu_indices(dim, 1)].any():
+            chol = chol.T
+        return utils.inv(chol).T
+
     def _stop_training(self):
         self.labels = self._cov_objs.keys()
         self.labels.sort()
         nitems = 0
+        whitening = []
         for lbl in self.labels:
             cov, mean, p = self._cov_objs[lbl].fix()
             nitems += p
-            self._sqrt_def_covs.append(numx.sqrt(numx_linalg.det(cov)))
-            if self._sqrt_def_covs[-1] == 0.0:
-                err = ("The covariance matrix is singular for at least "
-                       "one class.")
-                raise mdp.NodeException(err)
+            w = self._inverse_cholesky(cov)
+            # the diagonal of w is the inverse of the diagonal of the
+            # Cholesky factor
+            self.log_dets.append(-2. * numx.log(w.diagonal()).sum())
             self.means.append(mean)
             self.p.append(p)
-            self.inv_covs.append(utils.inv(cov))
+            self.inv_covs.append(utils.mult(w, w.T))
+            whitening.append(w)
 
         for i in range(len(self.p)):
             self.p[i] /= float(nitems)
 
+        self._set_whitening(whitening)
         del self._cov_objs
 
-    def _gaussian_prob(self, x, lbl_idx):
-        """Return the probability of the data points x with respect to a
-        gaussian.
+    def _set_whitening(self, whitening):
+        """Stack the inverse Cholesky factors of the classes and compute the
+        transformed means and the constant terms of the log probabilities.
+        """
+        self._whitening = numx.concatenate(whitening, axis=1)
+        self._whitened_means = numx.concatenate(
+                [utils.mult(mean, w) for mean, w in zip(self.means, whitening)])
+        self._log_consts = (numx.log(self.p) - 0.5*numx.array(self.log_dets)
+                            - 0.5*self.input_dim*numx.log(2.*numx.pi))
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if '_whitening' in state:
+            return
+        # pickled before the covariance matrices were Cholesky-factorized
+        self._whitening = self._whitened_means = self._log_consts = None
+        self.__dict__.pop('_sqrt_def_covs', None)
+        if '_cov_objs' in state:
+            # the training is not finished yet
+            self.log_dets = []
+            return
+        whitening = [self._inverse_cholesky(utils.inv(inv_cov))
+                     for inv_cov in self.inv_covs]
+        self.log_dets = [-2. * numx.log(w.diagonal()).sum()
+                         for w in whitening]
+        self._set_whitening(whitening)
+
+    def _log_joint_probabilities(self, x):
+        """Return the logarithm of the joint probability of each data point
+        and each class.
+
+        The result is an array with one row for each data point and one
+        column for each class.
+        """
+        n_labels = len(self.labels)
+        dim = self.input_dim
+        log_prob = numx.empty((x.shape[0], n_labels), dtype=self.dtype)
+        chunk_size = max(1, self.max_temp_size // (n_labels*dim))
+        for start in range(0, x.shape[0], chunk_size):
+            stop = start + chunk_size
+            # whitened data for all the classes at once
+            y = utils.mult(x[start:stop], self._whitening)
+            y -= self._whitened_means
+            y *= y
+            log_prob[start:stop] = y.reshape((len(y), n_labels,
+                                              dim)).sum(axis=2)
+        log_prob *= -0.5
+        log_prob += self._log_consts
+        return log_prob
 
-        Input arguments:
-        x -- Input data
-        S -- Covariance matrix
-        mn -- Mean
+    def _gaussian_prob(self, x, lbl_idx):
+        """Return the probability of the data points x with respect to the
+        gaussian of the class with index lbl_idx.
         """
         x = self._refcast(x)
-
         dim = self.input_dim
-        sqrt_detS = self._sqrt_def_covs[lbl_idx]
-        invS = self.inv_covs[lbl_idx]
-        # subtract the mean
-        x_mn = x - self.means[lbl_idx][numx.newaxis, :]
-        # exponent
-        exponent = -0.5 * (utils.mult(x_mn, invS)*x_mn).sum(axis=1)
-        # constant
-        constant = (2.*numx.pi)**(-dim/2.) / sqrt_detS
-        # probability
-        return constant * numx.exp(exponent)
+        w = self._whitening[:, lbl_idx*dim:(lbl_idx+1)*dim]
+        y = utils.mult(x - self.means[lbl_idx], w)
+        exponent = -0.5 * (y*y).sum(axis=1)
+        constant = (-0.5*self.log_dets[lbl_idx]
+                    - 0.5*dim*numx.log(2.*numx.pi))
+        return numx.exp(exponent + constant)
 
     def class_probabilities(self, x):
         """Return the posterior probability of each class given the input."""
-        self._pre_execution_checks(x)
-
-        # compute the probability for each class
-        tmp_prob = numx.zeros((x.shape[0], len(self.labels)),
-                              dtype=self.dtype)
-        for i in range(len(self.labels)):
-            tmp_prob[:, i] = self._gaussian_prob(x, i)
-            tmp_prob[:, i] *= self.p[i]
-
-        # normalize to probability 1
-        # (not necessary, but sometimes useful)
-        tmp_tot = tmp_prob.sum(axis=1)
-        tmp_tot = tmp_tot[:, numx.newaxis]
-        return tmp_prob / tmp_tot
-
-    def _prob(self, x):
-        """Return the posterior probability of each class given the input in a dict."""
-
-        class_prob = self.class_probabilities(x)
-        return [dict(zip(self.labels, prob)) for prob in class_prob]
+        return self.prob_array(x)[0]
+
+    def _prob_array(self, x):
+        """Return the posterior probability of each class given the input,
+        and the corresponding labels."""
+        log_prob = self._log_joint_probabilities(x)
+        # normalize to probability 1 in a numerically stable way
+        log_prob -= log_prob.max(axis=1)[:, numx.newaxis]
+        prob = numx.exp(log_prob)
+        prob /= prob.sum(axis=1)[:, numx.newaxis]
+        return prob, _label_array(self.labels)
 
     def _label(self, x):
         """Classify the input data using Maximum A-Posteriori."""
-
-        class_prob = self.class_probabilities(x)
-        winner = class_prob.argmax(axis=-1)
-        return [self.labels[winner[i]] for i in range(len(winner))]
+        # the normalization does not change the winner
+        winner = self._log_joint_probabilities(x).argmax(axis=-1)
+        return [self.labels[i] for i in winner]
     
 # TODO: Maybe extract some common elements form this class and
 #    GaussianClassifier, like in _train.
@@ -537,38 +609,85 @@ def _stop_training(self):
             ordered_means.append(self.label_means[label])
         self.ordered_means = numx.vstack(ordered_means)
             
+    def _mean_scores(self, x):
+        """Return -0.5 times the squared distance of each data point
+        (rows) to each class mean (columns), up to a constant for each
+        data point."""
+        scores = utils.mult(x, self.ordered_means.T)
+        scores -= 0.5 * (self.ordered_means**2).sum(1)
+        return scores
+
     def _label(self, x):
         """Classify the data based on minimal distance to mean."""
-        n_labels = len(self.ordered_labels)
-        differences = x[:,:,numx.newaxis].repeat(n_labels, 2). \
-                        swapaxes(1,2) - self.ordered_means
-        square_distances = (differences**2).sum(2)
-        label_indices = square_distances.argmin(1)
+        label_indices = self._mean_scores(x).argmax(1)
         labels = [self.ordered_labels[i] for i in label_indices]
         return labels
+
+    def _prob_array(self, x):
+        """Return the posterior probability of each class given the input,
+        and the corresponding labels.
+
+        The classes are modelled as gaussians with unit covariance matrix
+        around the class means and with the same prior probability, so that
+        the most probable class is the one with the nearest mean.
+        """
+        scores = self._mean_scores(x)
+        scores -= scores.max(axis=1)[:, numx.newaxis]
+        prob = numx.exp(scores)
+        prob /= prob.sum(axis=1)[:, numx.newaxis]
+        return prob, _label_array(self.ordered_labels)
     
     
 class KNNClassifier(ClassifierNode):
-    """K-Nearest-Neighbour Classifier."""
-    
-    def __init__(self, k=1, execute_method=None,
+    """K-Nearest-Neighbour Classifier.
+
+    Two methods are available to find the nearest neighbours:
+
+    'brute' -- The distances to all the stored samples are calculated. To
+        keep the memory usage bounded the query data is processed in chunks,
+        so that the temporary distance matrix has at most 'max_dist_size'
+        entries.
+    'kdtree' -- A KD-tree (scipy.spatial.cKDTree) is built for the samples
+        at the end of the training and then queried for the k nearest
+        neighbours only. This is much faster for large numbers of samples
+        in low dimensional spaces.
+    """
+
+    # defaults for nodes pickled before these attributes were added
+    index = "brute"
+    max_dist_size = 2**22
+    _kdtree = None
+
+    def __init__(self, k=1, execute_method=None, index="brute",
+                 max_dist_size=2**22,
                  input_dim=None, output_dim=None, dtype=None):
         """Initialize classifier.
-        
+
         k -- Number of closest sample points that are taken into account.
+        index -- Method used to find the nearest neighbours, either 'brute'
+            (default) or 'kdtree' (requires scipy).
+        max_dist_size -- Maximum number of entries in the temporary distance
+            matrix for the 'brute' method.
         """
         super(KNNClassifier, self).__init__(execute_method=execute_method,
                                             input_dim=input_dim,
                                             output_dim=output_dim,
                                             dtype=dtype)
+        if index not in ("brute", "kdtree"):
+            err = ("Unknown index method '%s', must be either 'brute' or "
+                   "'kdtree'." % str(index))
+            raise mdp.NodeException(err)
         self.k = k
+        self.index = index
+        self.max_dist_size = max_dist_size
         self._label_samples = {}  # temporary variable during training
         self.n_samples = None
         # initialized after training:
         self.samples = None  # 2d array with all samples
         self.sample_label_indices = None  # 1d array for label indices
         self.ordered_labels = []
-        
+        self._kdtree = None  # only used with the 'kdtree' method
+
     def _train(self, x, labels):
         """Add the sampel points to the classes.
         
@@ -611,14 +730,60 @@ def _stop_training(self):
                                 [numx.ones(len(ordered_samples[i]),
                                            dtype="int32") * i
                                  for i in range(len(self.ordered_labels))])
+        if self.index == "kdtree":
+            try:
+                from scipy.spatial import cKDTree
+            except ImportError:
+                err = "The 'kdtree' index method requires scipy.spatial."
+                raise mdp.NodeException(err)
+            self._kdtree = cKDTree(self.samples)
+
+    def _nearest_neighbors(self, x, k):
+        """Return the indices of the k nearest samples for each point in x.
+
+        The result is an array of shape (len(x), k), the neighbours are not
+        ordered by their distance.
+        """
+        if k >= self.n_samples:
+            return numx.tile(numx.arange(self.n_samples), (len(x), 1))
+        if self._kdtree is not None:
+            indices = self._kdtree.query(x, k=k)[1]
+            return indices.reshape((len(x), k))
+        sample_sqnorms = (self.samples*self.samples).sum(1)
+        # process the data in chunks to limit the size of the distance matrix
+        chunk_len = max(1, self.max_dist_size // self.n_samples)
+        indices = numx.empty((len(x), k), dtype="int")
+        for start in range(0, len(x), chunk_len):
+            x_chunk = x[start:start+chunk_len]
+            square_distances = numx.dot(x_chunk, self.samples.T)
+            square_distances *= -2
+            square_distances += sample_sqnorms
+            square_distances += (x_chunk*x_chunk).sum(1)[:, numx.newaxis]
+            # only a partial sort is needed to find the k smallest
+            indices[start:start+chunk_len] = \
+                        square_distances.argpartition(k-1, axis=1)[:, :k]
+        return indices
+
+    def _votes(self, x):
+        """Return the number of nearest neighbours of each data point
+        (rows) belonging to each class (columns)."""
+        k = min(self.k, self.n_samples)
+        neighbor_label_indices = self.sample_label_indices[
+                                            self._nearest_neighbors(x, k)]
+        # count the votes for each label
+        votes = numx.zeros((len(x), len(self.ordered_labels)), dtype="int")
+        rows = numx.arange(len(x))
+        for i in range(k):
+            votes[rows, neighbor_label_indices[:, i]] += 1
+        return votes
 
     def _label(self, x):
         """Label the data by comparison with the reference points."""
-        square_distances = (x*x).sum(1)[:, numx.newaxis] \
-                      + (self.samples*self.samples).sum(1)
-        square_distances -= 2 * numx.dot(x, self.samples.T)
-        min_inds = square_distances.argsort()
-        win_inds = [numx.bincount(self.sample_label_indices[indices[0:self.k]]).
-                    argmax(0) for indices in min_inds]
-        labels = [self.ordered_labels[i] for i in win_inds]
-        return labels
+        return [self.ordered_labels[i] for i in self._votes(x).argmax(1)]
+
+    def _prob_array(self, x):
+        """Return the fraction of the nearest neighbours belonging to each
+        class, and the corresponding labels."""
+        votes = self._votes(x)
+        prob = votes / float(min(self.k, self.n_samples))
+        return prob, _label_array(self.ordered_labels)
@@ -3,8 +3,25 @@
 from mdp import numx, numx_linalg, utils, NodeException
 import mdp
 import scipy.signal as signal
-
-# TODO automatic selection of convolution
+# scipy.fftpack does not provide real 2D transforms
+from numpy.fft import rfft2, irfft2
+
+def _fast_fft_size(n):
+    """Return the smallest integer larger or equal to n whose only prime
+    factors are 2, 3 and 5 (the FFT is fastest for these sizes)."""
+    best = 2**int(numx.ceil(numx.log2(max(n, 1))))
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            # smallest power of two such that p35*p2 >= n
+            p2 = 1
+            while p35*p2 < n:
+                p2 *= 2
+            best = min(best, p35*p2)
+            p35 *= 3
+        p5 *= 5
+    return best
 
 # TODO provide generators for standard filters
 
@@ -16,7 +33,12 @@ class Convolution2DNode(mdp.Node):
     The ``filters`` argument specifies a set of 2D filters that are
     convolved with the input data during execution. Convolution can
     be selected to be executed by linear filtering of the data, or
-    in the frequency domain using a Discrete Fourier Transform.
+    in the frequency domain using a Discrete Fourier Transform, or
+    the faster method can be chosen automatically for the given shapes.
+
+    In the frequency domain the spectra of the filters are computed only
+    once, the images are transformed in batches and multiplied with all
+    the filter spectra at the same time.
 
     Input data can be given as 3D data, each row being a 2D array
     to be convolved with the filters, or as 2D data, in which case
@@ -25,10 +47,14 @@ class Convolution2DNode(mdp.Node):
     This node depends on ``scipy``.
     """
 
+    # defaults for nodes pickled before these attributes were added
+    max_temp_size = 2**22
+    _filters_spectra = None
+
     def __init__(self, filters, input_shape = None,
                  approach = 'fft',
                  mode = 'full', boundary = 'fill', fillvalue = 0,
-                 output_2d = True,
+                 output_2d = True, max_temp_size = 2**22,
                  input_dim = None, dtype = None):
         """
         Input arguments:
@@ -38,9 +64,13 @@ def __init__(self, filters, input_shape = None,
                        in a flattened format, it is first reshaped before
                        convolution
 
-        approach -- 'approach' is one of ['linear', 'fft']
+        approach -- 'approach' is one of ['linear', 'fft', 'auto']
                     'linear': convolution is done by linear filtering;
                     'fft': convoltion is done using the Fourier Transform
+                    'auto': 'fft' is used if it is expected to be faster
+                    for the given input and filter shapes, and if
+                    'boundary' is 'fill' and 'fillvalue' is 0; otherwise
+                    'linear' is used
                     If 'approach' is 'fft', the 'boundary' and 'fillvalue' arguments
                     are ignored, and are assumed to be 'fill' and 0, respectively.
                     (*Default* = 'fft')
@@ -66,6 +96,12 @@ def __init__(self, filters, input_shape = None,
                      filter_nr: index of convolution filter
                      idx: data point index
                      x, y: 2D coordinates
+
+        max_temp_size -- Maximum number of elements of the temporary
+                     spectra used by the 'fft' approach. The images are
+                     transformed in batches small enough to respect this
+                     limit.
+                     (*Default* = 2**22)
         """
         super(Convolution2DNode, self).__init__(input_dim=input_dim,
                                               dtype=dtype)
@@ -74,8 +110,8 @@ def __init__(self, filters, input_shape = None,
 
         self._input_shape = input_shape
 
-        if approach not in ['linear', 'fft']:
-            raise NodeException("'approach' argument must be one of ['linear', 'fft']")
+        if approach not in ['linear', 'fft', 'auto']:
+            raise NodeException("'approach' argument must be one of ['linear', 'fft', 'auto']")
         self._approach = approach
 
         if mode not in ['valid', 'same', 'full']:
@@ -85,6 +121,7 @@ def __init__(self, filters, input_shape = None,
         self.boundary = boundary
         self.fillvalue = fillvalue
         self.output_2d = output_2d
+        self.max_temp_size = max_temp_size
         self._output_shape = None
 
     # ------- class properties
@@ -98,6 +135,8 @@ def set_filters(self, filters):
             raise NodeException('Filters must be specified in a 3-dim array, with each '+
                                 'filter on a different row')
         self._filters = filters
+        # spectra of the filters, computed on demand: (fft shape, spectra)
+        self._filters_spectra = None
 
     filters = property(get_filters, set_filters)
 
@@ -199,22 +238,69 @@ def _pre_execution_checks(self, x):
             error_str = "x must have at least one observation (zero given)"
             raise NodeException(error_str)
 
+    def _use_fft(self):
+        """Return True if the convolution is computed in the frequency
+        domain."""
+        if self.approach != 'auto':
+            return self.approach == 'fft'
+        if self.boundary != 'fill' or self.fillvalue != 0:
+            return False
+        # compare the number of operations for one image and one filter:
+        # the direct sum over the filter for each output pixel, against
+        # the inverse transform and the product of the spectra (the
+        # forward transforms are shared by all the images or filters)
+        fft_size = numx.prod(self._fft_shape())
+        direct_cost = numx.prod(self._output_shape) * \
+                      numx.prod(self.filters.shape[1:])
+        fft_cost = 3. * fft_size * numx.log2(fft_size)
+        return direct_cost > fft_cost
+
+    def _fft_shape(self):
+        """Return the shape of the Fourier transforms, large enough to
+        avoid circular convolution effects."""
+        return tuple([_fast_fft_size(n+m-1) for n, m in
+                      zip(self._input_shape, self.filters.shape[1:])])
+
+    def _get_filters_spectra(self, fft_shape):
+        if (self._filters_spectra is None or
+            self._filters_spectra[0] != fft_shape):
+            self._filters_spectra = (fft_shape, rfft2(self.filters, fft_shape))
+        return self._filters_spectra[1]
+
+    def _fft_convolve(self, x, y):
+        """Write the convolution of the images x with the filters in y."""
+        fft_shape = self._fft_shape()
+        spectra = self._get_filters_spectra(fft_shape)
+        # the output is centered in the 'full' convolution, as in
+        # scipy.signal.fftconvolve
+        full_shape = [n+m-1 for n, m in
+                      zip(self._input_shape, self.filters.shape[1:])]
+        start0, start1 = [(n-m)//2 for n, m in
+                          zip(full_shape, self._output_shape)]
+        stop0 = start0 + self._output_shape[0]
+        stop1 = start1 + self._output_shape[1]
+        chunk_size = max(1, self.max_temp_size // spectra.size)
+        for start in range(0, x.shape[0], chunk_size):
+            stop = start + chunk_size
+            x_spectra = rfft2(x[start:stop], fft_shape)
+            conv = irfft2(x_spectra[:, numx.newaxis, :, :] * spectra,
+                          fft_shape)
+            y[start:stop] = conv[:, :, start0:stop0, start1:stop1]
+
     def _execute(self, x):
-        is_2d = x.ndim==2
         output_shape, input_shape = self._output_shape, self._input_shape
         filters = self.filters
         nfilters = filters.shape[0]
+        x = x.reshape((x.shape[0], input_shape[0], input_shape[1]))
 
         # XXX depends on convolution
         y = numx.empty((x.shape[0], nfilters,
                         output_shape[0], output_shape[1]), dtype=self.dtype)
-        for n_im, im in enumerate(x):
-            if is_2d:
-                im = im.reshape(input_shape)
-            for n_flt, flt in enumerate(filters):
-                if self.approach == 'fft':
-                    y[n_im,n_flt,:,:] = signal.fftconvolve(im, flt, mode=self.mode)
-                elif self.approach == 'linear':
+        if self._use_fft():
+            self._fft_convolve(x, y)
+        else:
+            for n_im, im in enumerate(x):
+                for n_flt, flt in enumerate(filters):
                     y[n_im,n_flt,:,:] = signal.convolve2d(im, flt,
                                                           mode=self.mode,
                                                           boundary=self.boundary,
@@ -1,8 +1,8 @@
 __docformat__ = "restructuredtext en"
 
 import mdp
-from mdp import numx, numx_linalg, utils
-from mdp.utils import mult, matmult, invert_exp_funcs2
+from mdp import numx
+from mdp.utils import mult, invert_exp_funcs2
 from mdp.nodes import GrowingNeuralGasNode
 
 def nmonomials(degree, nvariables):
@@ -15,6 +15,41 @@ def expanded_dim(degree, nvariables):
     a polynomial expansion of degree ``degree``."""
     return int(mdp.utils.comb(nvariables+degree, degree))-1
 
+# cache for the monomial index tables, indexed by (degree, nvariables)
+_monomial_tables = {}
+
+def _get_monomial_tables(degree, nvariables):
+    """Return the index tables used by ``PolynomialExpansionNode``.
+
+    The result is a list with one pair (factors, variables) of index arrays
+    for each degree from 2 to ``degree``. The monomials of that degree are
+    the products of the expanded columns ``factors`` (monomials of the
+    previous degree) with the input columns ``variables``.
+    """
+    key = (degree, nvariables)
+    if key not in _monomial_tables:
+        tables = []
+        prec_end = 0
+        # number of monomials of the previous degree ending with each
+        # variable
+        next_lens = numx.ones((nvariables+1, ), dtype="l")
+        next_lens[0] = 0
+        for i in range(2, degree+1):
+            prec_start = prec_end
+            prec_end += nmonomials(i-1, nvariables)
+            lens = next_lens[:-1].cumsum(axis=0)
+            next_lens = numx.zeros((nvariables+1, ), dtype="l")
+            factors = []
+            variables = []
+            for j in range(nvariables):
+                factors.append(numx.arange(prec_start+lens[j], prec_end))
+                variables.append(numx.repeat(j, prec_end-prec_start-lens[j]))
+                next_lens[j+1] = prec_end-prec_start-lens[j]
+            tables.append((numx.concatenate(factors).astype("l"),
+                           numx.concatenate(variables).astype("l")))
+        _monomial_tables[key] = tables
+    return _monomial_tables[key]
+
 class _ExpansionNode(mdp.Node):
 
     def __init__(self, input_dim = None, dtype = None):
@@ -40,14 +75,28 @@ def _set_output_dim(self, n):
         raise mdp.NodeException(msg)
 
 class PolynomialExpansionNode(_ExpansionNode):
-    """Perform expansion in a polynomial space."""
+    """Perform expansion in a polynomial space.
+
+    The data is expanded in chunks of rows. The ``project`` method
+    computes a linear projection of the expanded data and the
+    ``update_covariance`` method its covariance matrix, without storing the
+    whole expansion.
+    """
 
-    def __init__(self, degree, input_dim = None, dtype = None):
+    # default for nodes pickled before max_temp_size was added
+    max_temp_size = 2**22
+
+    def __init__(self, degree, input_dim = None, dtype = None,
+                 max_temp_size=2**22):
         """
         Input arguments:
         degree -- degree of the polynomial space where the input is expanded
+        max_temp_size -- maximum number of elements of the expanded chunks
+            used by ``project`` and ``update_covariance``; this also limits the size of the temporary
+            arrays used during execution
         """
         self._degree = int(degree)
+        self.max_temp_size = max_temp_size
         super(PolynomialExpansionNode, self).__init__(input_dim, dtype)
 
     def _get_supported_dtypes(self):
@@ -60,35 +109,87 @@ def expanded_dim(self, dim):
         a polynomial expansion of degree 'self._degree'."""
         return expanded_dim(self._degree, dim)
 
-    def _execute(self, x):
-        degree = self._degree
-        dim = self.input_dim
-        n = x.shape[1]
+    @staticmethod
+    def is_row_independent():
+        return True
 
-        # preallocate memory
-        dexp = numx.zeros((self.output_dim, x.shape[0]), dtype=self.dtype)
-        # copy monomials of degree 1
-        dexp[0:n, :] = x.T
+    def _chunk_size(self):
+        return max(1, self.max_temp_size // self.output_dim)
 
+    def _expand_chunk(self, x, out):
+        """Write the expansion of x in the rows of out."""
+        n = x.shape[1]
+        out[:, :n] = x
         k = n
-        prec_end = 0
-        next_lens = numx.ones((dim+1, ))
-        next_lens[0] = 0
-        for i in range(2, degree+1):
-            prec_start = prec_end
-            prec_end += nmonomials(i-1, dim)
-            prec = dexp[prec_start:prec_end, :]
+        for factors, variables in _get_monomial_tables(self._degree, n):
+            block = out[:, k:k+len(factors)]
+            numx.take(out, factors, axis=1, out=block)
+            block *= numx.take(x, variables, axis=1)
+            k += len(factors)
 
-            lens = next_lens[:-1].cumsum(axis=0)
-            next_lens = numx.zeros((dim+1, ))
-            for j in range(dim):
-                factor = prec[lens[j]:, :]
-                len_ = factor.shape[0]
-                dexp[k:k+len_, :] = x[:, j] * factor
-                next_lens[j+1] = len_
-                k = k+len_
+    def _execute(self, x):
+        dexp = numx.empty((x.shape[0], self.output_dim), dtype=self.dtype)
+        chunk_size = self._chunk_size()
+        for start in range(0, x.shape[0], chunk_size):
+            stop = start + chunk_size
+            self._expand_chunk(x[start:stop], dexp[start:stop])
+        return dexp
+
+    def project(self, x, matrix):
+        """Return ``mult(self.execute(x), matrix)``.
+
+        The data is expanded in chunks of rows into a buffer, which is
+        multiplied with the matrix, so that the whole expansion is never
+        stored in memory.
+        """
+        self._pre_execution_checks(x)
+        x = self._refcast(x)
+        chunk_size = max(1, min(self._chunk_size(), x.shape[0]))
+        buffer = numx.empty((chunk_size, self.output_dim), dtype=self.dtype)
+        y = numx.empty((x.shape[0], matrix.shape[1]),
+                       dtype=numx.promote_types(self.dtype, matrix.dtype))
+        for start in range(0, x.shape[0], chunk_size):
+            stop = start + chunk_size
+            x_chunk = x[start:stop]
+            chunk = buffer[:len(x_chunk)]
+            self._expand_chunk(x_chunk, chunk)
+            y[start:stop] = mult(chunk, matrix)
+        return y
+
+    def update_covariance(self, x, cov_mtx, time_derivative=False):
+        """Update cov_mtx with the output of execute(x), without storing
+        it.
 
-        return dexp.T
+        cov_mtx -- A `mdp.utils.CovarianceMatrix` instance.
+        time_derivative -- If True, the time derivative of the output
+            (as computed by `mdp.nodes.SFANode.time_derivative`) is used
+            instead.
+
+        The second moments of the expansion are accumulated over chunks of
+        rows, so that only a chunk of the expanded data is stored in memory
+        at any time (see ``max_temp_size``).
+        """
+        self._pre_execution_checks(x)
+        x = self._refcast(x)
+        dim = self.output_dim
+        # with time_derivative consecutive chunks share one row
+        overlap = 1 if time_derivative else 0
+        tlen = x.shape[0] - overlap
+        if tlen <= 0:
+            return
+        chunk_size = max(1, min(self._chunk_size(), tlen))
+        buffer = numx.empty((chunk_size+overlap, dim), dtype=self.dtype)
+        moments = numx.zeros((dim, dim), dtype=self.dtype)
+        sums = numx.zeros((dim, ), dtype=self.dtype)
+        for start in range(0, tlen, chunk_size):
+            x_chunk = x[start:start+chunk_size+overlap]
+            chunk = buffer[:len(x_chunk)]
+            self._expand_chunk(x_chunk, chunk)
+            if time_derivative:
+                chunk = chunk[1:] - chunk[:-1]
+            moments += mult(chunk.T, chunk)
+            sums += chunk.sum(axis=0)
+        cov_mtx.update_moments(moments, sums, tlen)
 
 class QuadraticExpansionNode(PolynomialExpansionNode):
     """Perform expansion in the space formed by all linear and quadratic
@@ -96,9 +197,10 @@ class QuadraticExpansionNode(PolynomialExpansionNode):
     ``QuadraticExpansionNode()`` is equivalent to a
     ``PolynomialExpansionNode(2)``"""
 
-    def __init__(self, input_dim = None, dtype = None):
+    def __init__(self, input_dim = None, dtype = None, max_temp_size=2**22):
         super(QuadraticExpansionNode, self).__init__(2, input_dim = input_dim,
-                                                     dtype = dtype)
+                                                     dtype = dtype,
+                                                     max_temp_size=max_temp_size)
 
 class RBFExpansionNode(mdp.Node):
     """Expand input space with Gaussian Radial Basis Functions (RBFs).
@@ -115,7 +217,10 @@ class RBFExpansionNode(mdp.Node):
     for anisotropic RBFs.
     """
 
-    def __init__(self, centers, sizes, dtype = None):
+    # default for nodes pickled before max_temp_size was added
+    max_temp_size = 2**22
+
+    def __init__(self, centers, sizes, max_temp_size=2**22, dtype = None):
         """
         :Arguments:
           centers
@@ -131,8 +236,13 @@ def __init__(self, centers, sizes, dtype = None):
             or a covariance matrix (for anisotropic RBFs).
             If ``sizes`` is not a list, the same variance/covariance
             is used for all RBFs.
+          max_temp_size
+            Maximum number of elements of the temporary arrays used
+            during execution. The input data is processed in chunks of
+            rows small enough to respect this limit.
         """
         super(RBFExpansionNode, self).__init__(None, None, dtype)
+        self.max_temp_size = max_temp_size
         self._init_RBF(centers, sizes)
 
     @staticmethod
@@ -143,6 +253,10 @@ def is_trainable():
     def is_invertible():
         return False
 
+    @staticmethod
+    def is_row_independent():
+        return True
+
     def _init_RBF(self, centers, sizes):
         # initialize the centers of the RBFs
         centers = numx.array(centers, self.dtype)
@@ -182,19 +296,66 @@ def _init_RBF(self, centers, sizes):
 
         self._centers = centers
         self._sizes = sizes
+        self._init_expansion_terms()
 
-    def _execute(self, x):
-        y = numx.zeros((x.shape[0], self._output_dim), dtype = self.dtype)
+    def _init_expansion_terms(self):
+        """Precompute the terms of the expanded quadratic forms.
+
+        The squared distance to the centers is computed as
+        ``x^T S_j^-1 x - 2 x^T S_j^-1 c_j + c_j^T S_j^-1 c_j``, so that
+        the execution reduces to matrix products over all RBFs at once.
+        """
         c, s = self._centers, self._sizes
-        for i in range(self._output_dim):
-            dist = x - c[i,:]
-            if self._isotropic:
-                tmp = (dist**2.).sum(axis=1) / s[i]
-            else:
-                tmp = (dist*matmult(dist, s[i,:,:])).sum(axis=1)
-            y[:,i] = numx.exp(-0.5*tmp)
+        if self._isotropic:
+            # for isotropic RBFs the quadratic term is ||x||^2 / s_j
+            self._inv_sizes = 1. / s
+            self._lin_terms = (c * self._inv_sizes[:, numx.newaxis]).T
+            self._const_terms = (c**2.).sum(axis=1) * self._inv_sizes
+        else:
+            # stack the inverse covariance matrices into a
+            # input_dim x (output_dim*input_dim) matrix
+            self._stacked_sizes = numx.ascontiguousarray(
+                s.transpose(1, 0, 2).reshape(self._input_dim, -1))
+            lin_terms = numx.einsum('ijk,ik->ij', s, c)
+            self._lin_terms = lin_terms.T
+            self._const_terms = (lin_terms * c).sum(axis=1)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if '_lin_terms' not in state:
+            # pickled before the expansion terms were precomputed
+            self._init_expansion_terms()
+
+    def _execute(self, x):
+        y = numx.empty((x.shape[0], self._output_dim), dtype = self.dtype)
+        if self._isotropic:
+            temp_row_size = self._output_dim
+        else:
+            temp_row_size = self._output_dim * self._input_dim
+        chunk_size = max(1, self.max_temp_size // temp_row_size)
+        for start in range(0, x.shape[0], chunk_size):
+            stop = start + chunk_size
+            y[start:stop] = self._execute_chunk(x[start:stop])
         return y
 
+    def _execute_chunk(self, x):
+        # squared Mahalanobis distance to all centers, via the expansion
+        # precomputed in _init_expansion_terms
+        dist = mult(x, self._lin_terms)
+        dist *= -2.
+        dist += self._const_terms
+        if self._isotropic:
+            dist += numx.outer((x**2.).sum(axis=1), self._inv_sizes)
+        else:
+            quad = mult(x, self._stacked_sizes)
+            quad = quad.reshape(x.shape[0], self._output_dim, self._input_dim)
+            quad *= x[:, numx.newaxis, :]
+            dist += quad.sum(axis=2)
+        # remove negative values caused by roundoff errors
+        numx.maximum(dist, 0., dist)
+        dist *= -0.5
+        return numx.exp(dist, dist)
+
 class GrowingNeuralGasExpansionNode(GrowingNeuralGasNode):
     """
     Perform a trainable radial basis expansion, where the centers and
@@ -218,7 +379,7 @@ class GrowingNeuralGasExpansionNode(GrowingNeuralGasNode):
 
     def __init__(self, start_poss=None, eps_b=0.2, eps_n=0.006, max_age=50,
                  lambda_=100, alpha=0.5, d=0.995, max_nodes=100,
-                 input_dim=None, dtype=None):
+                 engine="graph", input_dim=None, dtype=None):
         """
         For a full list of input arguments please check the documentation
         of GrowingNeuralGasNode.
@@ -235,7 +396,7 @@ def __init__(self, start_poss=None, eps_b=0.2, eps_n=0.006, max_age=50,
         super(GrowingNeuralGasExpansionNode, self).__init__(
             start_poss=start_poss, eps_b=eps_b, eps_n=eps_n, max_age=max_age,
             lambda_=lambda_, alpha=alpha, d=d, max_nodes=max_nodes,
-            input_dim=input_dim, dtype=dtype)
+            engine=engine, input_dim=input_dim, dtype=dtype)
 
     def _set_input_dim(self, n):
         # Needs to be overwritten because GrowingNeuralGasNode would
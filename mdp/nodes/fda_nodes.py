@@ -150,6 +150,10 @@ def _train(self, x, label):
         """
         pass
 
+    @staticmethod
+    def is_row_independent():
+        return True
+
     def _execute(self, x, n=None):
         """Compute the output of the FDA projection.
 
@@ -163,3 +167,13 @@ def _execute(self, x, n=None):
 
     def _inverse(self, y):
         return mdp.utils.mult(y, mdp.utils.pinv(self.v))+self.avg
+
+    def get_affine_transform(self):
+        if self.is_training():
+            return None
+        return self.v, -mdp.utils.mult(self.avg, self.v)
+
+    def get_affine_inverse(self):
+        if self.is_training():
+            return None
+        return mdp.utils.pinv(self.v), self.avg
@@ -147,6 +147,10 @@ def core(self, data):
         defining the linear transformation."""
         pass
 
+    @staticmethod
+    def is_row_independent():
+        return True
+
     def _execute(self, x):
         if not self.whitened:
             x = self.white.execute(x)
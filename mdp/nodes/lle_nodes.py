@@ -1,13 +1,50 @@
 __docformat__ = "restructuredtext en"
 
-from mdp import numx, numx_linalg, Cumulator, TrainingException, MDPWarning
+from mdp import (numx, numx_linalg, numx_rand, Cumulator, TrainingException,
+                 MDPWarning, NodeException)
 from mdp.utils import mult, nongeneral_svd, svd, sqrtm, symeig
 import warnings as _warnings
 
 # some useful functions
 sqrt = numx.sqrt
 
-# search XXX for locations where future work is needed
+def _import_sparse_modules():
+    """Return the scipy modules needed for the sparse mode."""
+    try:
+        import scipy.sparse
+        import scipy.sparse.linalg
+        import scipy.spatial
+    except ImportError:
+        err = "The sparse mode requires scipy.sparse and scipy.spatial."
+        raise NodeException(err)
+    return scipy.sparse, scipy.sparse.linalg, scipy.spatial
+
+def _sparse_bottom_eigenvectors(WW, n_vectors):
+    """Return the n_vectors bottom eigenvectors of the sparse matrix WW,
+    excluding the constant vector.
+
+    The constant vector must be in the null space of WW. The eigenvectors
+    are computed with ARPACK in shift-invert mode around zero, where the
+    constant vector is projected out of the inverted operator (otherwise
+    its huge eigenvalue would limit the accuracy of the other ones).
+    """
+    sparse, sparse_linalg = _import_sparse_modules()[:2]
+    N = WW.shape[0]
+    # the shift must be small compared to the bottom eigenvalues, it only
+    # prevents the factorized matrix from being exactly singular
+    sigma = -1e-12 * WW.diagonal().mean()
+    lu = sparse_linalg.splu((WW - sigma * sparse.identity(N)).tocsc())
+    def _project(x):
+        return x - x.mean()
+    def _inverse_matvec(x):
+        return _project(lu.solve(_project(x.ravel())))
+    OPinv = sparse_linalg.LinearOperator((N, N), matvec=_inverse_matvec,
+                                         dtype=WW.dtype)
+    v0 = _project(numx_rand.uniform(-1, 1, N))
+    sig, U = sparse_linalg.eigsh(WW, k=n_vectors, sigma=sigma, which='LM',
+                                 OPinv=OPinv, v0=v0)
+    order = numx.argsort(sig)
+    return sig[order], U[:, order]
 
 #########################################################
 #  Locally Linear Embedding
@@ -37,7 +74,15 @@ class LLENode(Cumulator):
     Original code contributed by: Jake VanderPlas, University of Washington,
     """
 
-    def __init__(self, k, r=0.001, svd=False, verbose=False,
+    # number of points for which the neighbors are searched at once
+    # in the sparse mode
+    _batch_size = 10000
+
+    # defaults for nodes pickled before the sparse mode was added
+    sparse = False
+    _tree = None
+
+    def __init__(self, k, r=0.001, svd=False, verbose=False, sparse=False,
                  input_dim=None, output_dim=None, dtype=None):
         """
         :Arguments:
@@ -56,6 +101,12 @@ def __init__(self, k, r=0.001, svd=False, verbose=False,
            verbose
              if true, displays information about the progress
              of the algorithm
+           sparse
+             if true, the nearest neighbors are found with a KD-tree,
+             the weight matrix is stored as a sparse matrix and its
+             null space is computed with ARPACK (the ``svd`` argument
+             is then ignored); this requires scipy and makes it
+             possible to process large data sets
            output_dim
              number of dimensions to output or a float between 0.0 and
              1.0. In the latter case, ``output_dim`` specifies the desired
@@ -78,6 +129,39 @@ def __init__(self, k, r=0.001, svd=False, verbose=False,
         self.r = r
         self.svd = svd
         self.verbose = verbose
+        self.sparse = sparse
+        # KD-tree of the training data in the sparse mode
+        self._tree = None
+
+    def __getstate__(self):
+        # the KD-tree is only a cache, it is rebuilt when needed
+        state = self.__dict__.copy()
+        state['_tree'] = None
+        return state
+
+    def _find_neighbors(self, x, k, exclude_self=False):
+        """Return the indices of the k nearest training points for each
+        point in x, using a KD-tree.
+
+        If exclude_self is true, x must be the training data and the
+        points themselves are excluded from the neighbors.
+        """
+        # the training data does not change after the training, so the
+        # tree is built once and reused by execute
+        if self._tree is None:
+            spatial = _import_sparse_modules()[2]
+            self._tree = spatial.cKDTree(self.data)
+        tree = self._tree
+        n_query = k+1 if exclude_self else k
+        nbrs = numx.empty((x.shape[0], k), dtype='i')
+        for start in range(0, x.shape[0], self._batch_size):
+            stop = start + self._batch_size
+            batch_nbrs = tree.query(x[start:stop], k=n_query)[1]
+            batch_nbrs = batch_nbrs.reshape((-1, n_query))
+            if exclude_self:
+                batch_nbrs = batch_nbrs[:, 1:]
+            nbrs[start:stop] = batch_nbrs
+        return nbrs
 
     def _stop_training(self):
         Cumulator._stop_training(self)
@@ -119,10 +203,14 @@ def _stop_training(self):
         # determine number of output dims, precalculate useful stuff
         if learn_outdim:
             Qs, sig2s, nbrss = self._adjust_output_dim()
+        else:
+            Qs = sig2s = nbrss = None
+
+        if self.sparse:
+            self._stop_training_sparse(Qs, sig2s, nbrss)
+            return
 
         # build the weight matrix
-        #XXX future work:
-        #XXX   for faster implementation, W should be a sparse matrix
         W = numx.zeros((N, N), dtype=self.dtype)
 
         if self.verbose:
@@ -185,10 +273,7 @@ def _stop_training(self):
         #Compute this using the svd of (W-I):
         W[W_diag_idx, W_diag_idx] -= 1.
 
-        #XXX future work:
-        #XXX  use of upcoming ARPACK interface for bottom few eigenvectors
-        #XXX   of a sparse matrix will significantly increase the speed
-        #XXX   of the next step
+        # (with sparse=True the null space is computed with ARPACK instead)
         if self.svd:
             sig, U = nongeneral_svd(W.T, range=(2, self.output_dim+1))
         else:
@@ -202,6 +287,63 @@ def _stop_training(self):
 
         self.training_projection = U
 
+    def _stop_training_sparse(self, Qs=None, sig2s=None, nbrss=None):
+        """Compute the weight matrix as a sparse matrix and its null space
+        with ARPACK.
+
+        The weights are computed in batches of points with stacked
+        linear algebra routines.
+        """
+        from numpy.linalg import solve as stacked_solve, svd as stacked_svd
+        sparse = _import_sparse_modules()[0]
+        M = self.data
+        N = M.shape[0]
+        k = self.k
+        if nbrss is None:
+            nbrss = self._find_neighbors(M, k, exclude_self=True)
+
+        if self.verbose:
+            print ' - constructing sparse [%i x %i] weight matrix...' % (N, N)
+
+        Q_diag_idx = numx.arange(k)
+        weights = numx.empty((N, k), dtype=self.dtype)
+        for start in range(0, N, self._batch_size):
+            stop = min(start + self._batch_size, N)
+            M_Mi = M[nbrss[start:stop]] - M[start:stop, numx.newaxis, :]
+            if Qs is None:
+                # stacked covariance matrices of distances
+                Q = numx.einsum('ijk,ilk->ijl', M_Mi, M_Mi)
+            else:
+                Q = Qs[start:stop].copy()
+            if self.r is None:
+                # automatic mode, see _stop_training
+                if sig2s is None:
+                    sig2 = stacked_svd(M_Mi, compute_uv=0)**2
+                else:
+                    sig2 = sig2s[start:stop]
+                r = sig2[:, self.output_dim:].sum(axis=1)
+            else:
+                r = self.r * Q.trace(axis1=1, axis2=2)
+            Q[:, Q_diag_idx, Q_diag_idx] += r[:, numx.newaxis]
+            w = stacked_solve(Q, numx.ones((stop-start, k, 1)))[:, :, 0]
+            w /= w.sum(axis=1)[:, numx.newaxis]
+            weights[start:stop] = w
+
+        # W[nbrs, row] contains the weights for row
+        W = sparse.csc_matrix((weights.ravel(), nbrss.ravel(),
+                               numx.arange(0, N*k+1, k)), shape=(N, N))
+        self.W = W.tocsr()
+
+        if self.verbose:
+            msg = (' - finding [%i x %i] null space of weight matrix\n'
+                   '     (may take a while)...' % (self.output_dim, N))
+            print msg
+
+        W = (W - sparse.identity(N, format='csc')).tocsr()
+        WW = W * W.T
+        sig, U = _sparse_bottom_eigenvectors(WW, self.output_dim)
+        self.training_projection = U
+
     def _adjust_output_dim(self):
         # this function is called if we need to compute the number of
         # output dimensions automatically; some quantities that are
@@ -219,18 +361,26 @@ def _adjust_output_dim(self):
         m_est_array = []
         Qs = numx.zeros((N, k, k))
         sig2s = numx.zeros((N, d_in))
-        nbrss = numx.zeros((N, k), dtype='i')
+        if self.sparse:
+            nbrss = self._find_neighbors(M, k, exclude_self=True)
+        else:
+            nbrss = numx.zeros((N, k), dtype='i')
 
         for row in range(N):
             #-----------------------------------------------
             #  find k nearest neighbors
             #-----------------------------------------------
-            M_Mi = M-M[row]
-            nbrs = numx.argsort((M_Mi**2).sum(1))[1:k+1]
-            M_Mi = M_Mi[nbrs]
+            if self.sparse:
+                nbrs = nbrss[row]
+                M_Mi = M[nbrs] - M[row]
+            else:
+                M_Mi = M-M[row]
+                nbrs = numx.argsort((M_Mi**2).sum(1))[1:k+1]
+                M_Mi = M_Mi[nbrs]
             # compute covariance matrix of distances
             Qs[row, :, :] = mult(M_Mi, M_Mi.T)
-            nbrss[row, :] = nbrs
+            if not self.sparse:
+                nbrss[row, :] = nbrs
 
             #-----------------------------------------------
             # singular values of M_Mi give the variance:
@@ -272,17 +422,26 @@ def _execute(self, x):
         #----------------------------------------------------
         N = self.data.shape[0]
         Nx = x.shape[0]
-        W = numx.zeros((Nx, N), dtype=self.dtype)
 
         k, r = self.k, self.r
         d_out = self.output_dim
         Q_diag_idx = numx.arange(k)
 
+        if self.sparse:
+            nbrss = self._find_neighbors(x, k)
+            weights = numx.empty((Nx, k), dtype=self.dtype)
+        else:
+            W = numx.zeros((Nx, N), dtype=self.dtype)
+
         for row in range(Nx):
             #find nearest neighbors of x in M
-            M_xi = self.data-x[row]
-            nbrs = numx.argsort( (M_xi**2).sum(1) )[:k]
-            M_xi = M_xi[nbrs]
+            if self.sparse:
+                nbrs = nbrss[row]
+                M_xi = self.data[nbrs]-x[row]
+            else:
+                M_xi = self.data-x[row]
+                nbrs = numx.argsort( (M_xi**2).sum(1) )[:k]
+                M_xi = M_xi[nbrs]
 
             #find corrected covariance matrix Q
             Q = mult(M_xi, M_xi.T)
@@ -296,7 +455,16 @@ def _execute(self, x):
             #solve for weights
             w = self._refcast(numx_linalg.solve(Q , numx.ones(k)))
             w /= w.sum()
-            W[row, nbrs] = w
+            if self.sparse:
+                weights[row] = w
+            else:
+                W[row, nbrs] = w
+
+        if self.sparse:
+            sparse = _import_sparse_modules()[0]
+            W = sparse.csr_matrix((weights.ravel(), nbrss.ravel(),
+                                   numx.arange(0, Nx*k+1, k)), shape=(Nx, N))
+            return W * self.training_projection
 
         #multiply weights by result of SVD from training
         return numx.dot(W, self.training_projection)
@@ -359,7 +527,7 @@ class HLLENode(LLENode):
     #  projections for new points using the LLE framework.
     #----------------------------------------------------
 
-    def __init__(self, k, r=0.001, svd=False, verbose=False,
+    def __init__(self, k, r=0.001, svd=False, verbose=False, sparse=False,
                  input_dim=None, output_dim=None, dtype=None):
         """
         :Keyword arguments:
@@ -379,6 +547,11 @@ def __init__(self, k, r=0.001, svd=False, verbose=False,
            verbose
               if true, displays information about the progress
               of the algorithm
+           sparse
+              if true, the nearest neighbors are found with a KD-tree,
+              the weight matrix is stored as a sparse matrix and its
+              null space is computed with ARPACK (the ``svd`` argument
+              is then ignored); this requires scipy
            output_dim
               number of dimensions to output or a float between 0.0
               and 1.0. In the latter case, output_dim specifies the
@@ -388,7 +561,7 @@ def __init__(self, k, r=0.001, svd=False, verbose=False,
               keep as many dimensions as necessary in order to explain
               95% of the input variance)
         """
-        LLENode.__init__(self, k, r, svd, verbose,
+        LLENode.__init__(self, k, r, svd, verbose, sparse,
                          input_dim, output_dim, dtype)
 
     def _stop_training(self):
@@ -438,14 +611,19 @@ def _stop_training(self):
             _warnings.warn(wrn, MDPWarning)
 
         #build the weight matrix
-        #XXX   for faster implementation, W should be a sparse matrix
-        W = numx.zeros((N, dp*N), dtype=self.dtype)
+        if self.sparse:
+            if not learn_outdim:
+                nbrss = self._find_neighbors(M, k, exclude_self=True)
+            # the nonzero entries W[nbrs, row*dp:(row+1)*dp]
+            weights = numx.empty((N, k, dp), dtype=self.dtype)
+        else:
+            W = numx.zeros((N, dp*N), dtype=self.dtype)
 
         if self.verbose:
-            print ' - constructing [%i x %i] weight matrix...' % W.shape
+            print ' - constructing [%i x %i] weight matrix...' % (N, dp*N)
 
         for row in range(N):
-            if learn_outdim:
+            if learn_outdim or self.sparse:
                 nbrs = nbrss[row, :]
             else:
                 # -----------------------------------------------
@@ -497,7 +675,10 @@ def _stop_training(self):
             S[numx.where(numx.absolute(S)<1E-4)] = 1.0
             #print w.shape, S.shape, (w/S).shape
             #print W[nbrs, row*dp:(row+1)*dp].shape
-            W[nbrs, row*dp:(row+1)*dp] = w / S
+            if self.sparse:
+                weights[row] = w / S
+            else:
+                W[nbrs, row*dp:(row+1)*dp] = w / S
 
         #-----------------------------------------------
         # To find the null space, we want the
@@ -510,12 +691,18 @@ def _stop_training(self):
                    'null space of weight matrix...' % (d_out, N))
             print msg
 
-        #XXX future work:
-        #XXX  use of upcoming ARPACK interface for bottom few eigenvectors
-        #XXX   of a sparse matrix will significantly increase the speed
-        #XXX   of the next step
-
-        if self.svd:
+        if self.sparse:
+            sparse = _import_sparse_modules()[0]
+            rows = numx.repeat(nbrss, dp, axis=1).ravel()
+            cols = (numx.arange(N)[:, numx.newaxis, numx.newaxis]*dp +
+                    numx.arange(dp)[numx.newaxis, numx.newaxis, :])
+            cols = numx.repeat(cols, k, axis=1).ravel()
+            W = sparse.csr_matrix((weights.ravel(), (rows, cols)),
+                                  shape=(N, dp*N))
+            del weights
+            sig, U = _sparse_bottom_eigenvectors(W * W.T, d_out)
+            Y = U*numx.sqrt(N)
+        elif self.svd:
             sig, U = nongeneral_svd(W.T, range=(2, d_out+1))
             Y = U*numx.sqrt(N)
         else:
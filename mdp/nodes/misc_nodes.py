@@ -3,8 +3,11 @@
 import mdp
 from mdp import numx, utils, Node, NodeException, PreserveDimNode
 
+import struct
 import cPickle as pickle
 import pickle as real_pickle
+from numpy.lib.format import dtype_to_descr, write_array_header_1_0
+from numpy.lib.stride_tricks import as_strided
 
 class IdentityNode(PreserveDimNode):
     """Execute returns the input data and the node is not trainable.
@@ -23,6 +26,106 @@ def _get_supported_dtypes(self):
     def is_trainable():
         return False
 
+    @staticmethod
+    def is_row_independent():
+        return True
+
+    def get_affine_transform(self):
+        if self.input_dim is None:
+            return None
+        return (numx.eye(self.input_dim, dtype=self.dtype),
+                numx.zeros(self.input_dim, dtype=self.dtype))
+
+    def get_affine_inverse(self):
+        return self.get_affine_transform()
+
+class AffineNode(Node):
+    """Execute the affine transformation ``mult(x, w) + b``.
+
+    The node is not trainable. It is for example created by
+    `mdp.Flow.compile` to replace a sequence of affine nodes by a single
+    matrix multiplication. If ``inverse_w`` is given, the node is
+    invertible and the inverse is ``mult(y, inverse_w) + inverse_b``.
+    """
+
+    def __init__(self, w, b=None, inverse_w=None, inverse_b=None,
+                 dtype=None):
+        """
+        Input arguments:
+        w -- Transformation matrix of shape (input_dim, output_dim)
+        b -- Offset added to the output (default: no offset)
+        inverse_w -- Matrix of shape (output_dim, input_dim) used by
+            the inverse (default: the node is not invertible)
+        inverse_b -- Offset added to the inverse output
+        """
+        w = numx.asarray(w)
+        if w.ndim != 2:
+            err = "w has rank %d, should be 2" % w.ndim
+            raise NodeException(err)
+        if b is None:
+            b = numx.zeros(w.shape[1], dtype=w.dtype)
+        self.w = w
+        self.b = numx.asarray(b)
+        if inverse_w is not None:
+            inverse_w = numx.asarray(inverse_w)
+            if inverse_w.shape != w.shape[::-1]:
+                err = ("inverse_w has shape %s, should be %s" %
+                       (inverse_w.shape, w.shape[::-1]))
+                raise NodeException(err)
+            if inverse_b is None:
+                inverse_b = numx.zeros(w.shape[0], dtype=inverse_w.dtype)
+            inverse_b = numx.asarray(inverse_b)
+        self.inverse_w = inverse_w
+        self.inverse_b = inverse_b
+        super(AffineNode, self).__init__(input_dim=w.shape[0],
+                                         output_dim=w.shape[1],
+                                         dtype=dtype)
+
+    def _set_dtype(self, t):
+        super(AffineNode, self)._set_dtype(t)
+        self.w = self._refcast(self.w)
+        self.b = self._refcast(self.b)
+        if self.inverse_w is not None:
+            self.inverse_w = self._refcast(self.inverse_w)
+            self.inverse_b = self._refcast(self.inverse_b)
+
+    @staticmethod
+    def is_trainable():
+        return False
+
+    def is_invertible(self):
+        return self.inverse_w is not None
+
+    @staticmethod
+    def is_row_independent():
+        return True
+
+    def _execute(self, x):
+        return mdp.utils.mult(x, self.w) + self.b
+
+    def _inverse(self, y):
+        return mdp.utils.mult(y, self.inverse_w) + self.inverse_b
+
+    def get_affine_transform(self):
+        return self.w, self.b
+
+    def get_affine_inverse(self):
+        if self.inverse_w is None:
+            return None
+        return self.inverse_w, self.inverse_b
+
+def _hit_parade_chunks(length, first_size=64, max_size=8192):
+    """Yield slices that split range(length) in chunks of increasing size.
+
+    The hit-parade thresholds are updated after each chunk. At the
+    beginning they change quickly, so the first chunks are small.
+    """
+    start, size = 0, first_size
+    while start < length:
+        yield slice(start, start+size)
+        start += size
+        size = min(2*size, max_size)
+
 class OneDimensionalHitParade(object):
     """
     Class to produce hit-parades (i.e., a list of the largest
@@ -63,6 +166,23 @@ def update(self, inp):
         inp -- tuple (time-series, time-indices)
         """
         (x, ix) = inp
+        for chunk in _hit_parade_chunks(len(x)):
+            x_chunk = x[chunk]
+            min_M, max_m = self._thresholds()
+            candidates = (x_chunk > min_M) | (x_chunk < max_m)
+            self._update(x_chunk[candidates], ix[chunk][candidates])
+
+    def _thresholds(self):
+        """Return the smallest maximum and the largest minimum.
+
+        The first can only grow and the second can only decrease, so an
+        item which is not larger than the first and not smaller than the
+        second cannot change the hit-parade.
+        """
+        return self.M.min(), self.m.max()
+
+    def _update(self, x, ix):
+        """Insert the items of x one by one in the hit-parade."""
         rows = len(x)
         d = self.d
         M = self.M
@@ -160,8 +280,15 @@ def _train(self, x):
                    for c in range(self.input_dim)]
         tlen = old_tlen + x.shape[0]
         indices = numx.arange(old_tlen, tlen)
-        for c in range(self.input_dim):
-            hit[c].update((x[:, c], indices))
+        for chunk in _hit_parade_chunks(x.shape[0]):
+            x_chunk = x[chunk]
+            # compare all the columns at once with the current thresholds
+            min_M, max_m = numx.array([h._thresholds() for h in hit],
+                                      dtype=self.dtype).T
+            candidates = (x_chunk > min_M) | (x_chunk < max_m)
+            for c in candidates.any(axis=0).nonzero()[0]:
+                cands = candidates[:, c]
+                hit[c]._update(x_chunk[cands, c], indices[chunk][cands])
         self.hit = hit
         self.tlen = tlen
 
@@ -219,20 +346,29 @@ class TimeFramesNode(Node):
     It is not always possible to invert this transformation (the
     transformation is not surjective. However, the ``pseudo_inverse``
     method does the correct thing when it is indeed possible.
+
+    With ``view=True`` and ``gap=1`` the output is a read-only view of the
+    input data, so that the time frames do not need ``time_frames`` times
+    the memory of the input. Use `update_covariance` (or
+    `mdp.nodes.SFANode.train_time_frames`) to compute the covariance matrix
+    of the output without storing it.
     """
 
-    def __init__(self, time_frames, gap=1,
+    def __init__(self, time_frames, gap=1, view=False,
                  input_dim=None, dtype=None):
         """
         Input arguments:
         time_frames -- Number of delayed copies
         gap -- Time delay between the copies
+        view -- If True and gap is 1, execute returns a read-only view
+            of the input data instead of a copy.
         """
         self.time_frames = time_frames
         super(TimeFramesNode, self).__init__(input_dim=input_dim,
                                              output_dim=None,
                                              dtype=dtype)
         self.gap = gap
+        self.view = view
 
     def _get_supported_dtypes(self):
         """Return the list of dtypes supported by this node."""
@@ -261,11 +397,65 @@ def _execute(self, x):
         tf = x.shape[0] - (self.time_frames-1)*gap
         rows = self.input_dim
         cols = self.output_dim
+        if self.view and gap == 1 and tf > 0:
+            # consecutive frames are consecutive in memory, so each output
+            # row is a window of the flattened input
+            x = numx.ascontiguousarray(x)
+            y = as_strided(x, shape=(tf, cols), strides=x.strides)
+            y.flags.writeable = False
+            return y
         y = numx.zeros((tf, cols), dtype=self.dtype)
         for frame in range(self.time_frames):
             y[:, frame*rows:(frame+1)*rows] = x[gap*frame:gap*frame+tf, :]
         return y
 
+    def _get_frames_input(self, x):
+        """Return the data whose time frames are the output of execute.
+
+        The second returned value is True if the frames are in reverse
+        order in the output.
+        """
+        return x, False
+
+    def _frames_length(self, n_rows):
+        """Return the number of output rows for n_rows input rows."""
+        return n_rows - (self.time_frames-1)*self.gap
+
+    def update_covariance(self, x, cov_mtx, time_derivative=False):
+        """Update cov_mtx with the output of execute(x), without computing
+        it.
+
+        cov_mtx -- A `mdp.utils.CovarianceMatrix` instance.
+        time_derivative -- If True, the time derivative of the output
+            (as computed by `mdp.nodes.SFANode.time_derivative`) is used
+            instead.
+
+        The second moments of the output are computed block by block from
+        the input data, so that the time frames are never stored in memory.
+        """
+        self._pre_execution_checks(x)
+        xin, reverse = self._get_frames_input(self._refcast(x))
+        if time_derivative:
+            xin = xin[1:] - xin[:-1]
+        gap = self.gap
+        n = self.input_dim
+        tf = xin.shape[0] - (self.time_frames-1)*gap
+        if tf <= 0:
+            return
+        frames = [xin[gap*frame:gap*frame+tf] for frame in
+                  range(self.time_frames)]
+        if reverse:
+            frames.reverse()
+        moments = numx.empty((self.output_dim, self.output_dim),
+                             dtype=self.dtype)
+        for i in range(self.time_frames):
+            for j in range(i, self.time_frames):
+                block = utils.mult(frames[i].T, frames[j])
+                moments[i*n:(i+1)*n, j*n:(j+1)*n] = block
+                moments[j*n:(j+1)*n, i*n:(i+1)*n] = block.T
+        sums = numx.concatenate([frame.sum(axis=0) for frame in frames])
+        cov_mtx.update_moments(moments, sums, tf)
+
     def pseudo_inverse(self, y):
         """This function returns a pseudo-inverse of the execute frame.
         y == execute(x) only if y belongs to the domain of execute and
@@ -337,7 +527,7 @@ def __init__(self, time_frames, gap=1, input_dim=None, dtype=None):
         gap -- Time delay between the copies
         """
         super(TimeDelayNode, self).__init__(time_frames, gap,
-                                            input_dim, dtype)
+                                            input_dim=input_dim, dtype=dtype)
 
     def _execute(self, x):
         gap = self.gap
@@ -352,6 +542,16 @@ def _execute(self, x):
 
         return y
 
+    def _get_frames_input(self, x):
+        # the output equals the reversed time frames of the data preceded
+        # by (time_frames-1)*gap zeros
+        pad = numx.zeros(((self.time_frames-1)*self.gap, x.shape[1]),
+                         dtype=x.dtype)
+        return numx.concatenate([pad, x]), True
+
+    def _frames_length(self, n_rows):
+        return n_rows
+
     def pseudo_inverse(self, y):
         raise NotImplementedError
 
@@ -360,12 +560,17 @@ class TimeDelaySlidingWindowNode(TimeDelayNode):
     ``TimeDelaySlidingWindowNode`` is an alternative to ``TimeDelayNode``
     which should be used for online learning/execution. Whereas the
     ``TimeDelayNode`` works in a batch manner, for online application
-    a sliding window is necessary which yields only one row per call.
+    a sliding window is necessary which keeps the past input rows between
+    calls. Each call can process any number of rows.
 
     Applied to the same data the collection of all returned rows of the
     ``TimeDelaySlidingWindowNode`` is equivalent to the result of the
     ``TimeDelayNode``.
 
+    The last ``(time_frames-1)*gap`` input rows are stored in a circular
+    buffer. Its state can be saved with `get_buffer_state` and restored
+    with `set_buffer_state`, e.g. to checkpoint an online application.
+
     Original code contributed by Sebastian Hoefer <mail@sebastianhoefer.de>
     Dec 31, 2010
     """
@@ -380,46 +585,60 @@ def __init__(self, time_frames, gap=1, input_dim=None, dtype=None):
         self.gap = gap
         super(TimeDelaySlidingWindowNode, self).__init__(time_frames, gap,
                                                          input_dim, dtype)
-        self.sliding_wnd = None
-        self.cur_idx = 0
-        self.slide = False
-
-    def _init_sliding_window(self):
-        rows = self.gap+1
-        cols = self.input_dim*self.time_frames
-        self.sliding_wnd = numx.zeros((rows, cols), dtype=self.dtype)
+        self.reset()
+
+    def reset(self):
+        """Forget the past input rows."""
+        # circular buffer with the last input rows, the oldest one is
+        # at index buffer_head
+        self.buffer = None
+        self.buffer_head = 0
+
+    def _init_buffer(self):
+        rows = (self.time_frames-1)*self.gap
+        self.buffer = numx.zeros((rows, self.input_dim), dtype=self.dtype)
+        self.buffer_head = 0
+
+    def get_buffer_state(self):
+        """Return a copy of the buffer and the head index."""
+        if self.buffer is None:
+            self._init_buffer()
+        return self.buffer.copy(), self.buffer_head
+
+    def set_buffer_state(self, state):
+        """Restore the buffer state returned by get_buffer_state."""
+        buffer, head = state
+        self.buffer = numx.array(buffer, dtype=self.dtype)
+        self.buffer_head = head
 
     def _execute(self, x):
-        assert x.shape[0] == 1
-
-        if self.sliding_wnd == None:
-            self._init_sliding_window()
+        if self.buffer is None:
+            self._init_buffer()
 
         gap = self.gap
-        rows = self.sliding_wnd.shape[0]
-        cols = self.output_dim
         n = self.input_dim
-
-        new_row = numx.zeros(cols, dtype=self.dtype)
-        new_row[:n] = x
-
-        # Slide
-        if self.slide:
-            self.sliding_wnd[:-1, :] = self.sliding_wnd[1:, :]
-
-        # Delay
-        if self.cur_idx-gap >= 0:
-            new_row[n:] = self.sliding_wnd[self.cur_idx-gap, :-n]
-
-        # Add new row to matrix
-        self.sliding_wnd[self.cur_idx, :] = new_row
-
-        if self.cur_idx < rows-1:
-            self.cur_idx = self.cur_idx+1 
+        n_rows = x.shape[0]
+        buffer = self.buffer
+        n_buffer = buffer.shape[0]
+        # past rows in temporal order, followed by the new rows
+        if n_buffer:
+            order = (self.buffer_head + numx.arange(n_buffer)) % n_buffer
+            data = numx.concatenate([buffer[order], x])
         else:
-            self.slide = True
+            data = x
 
-        return new_row[numx.newaxis,:]
+        y = numx.empty((n_rows, self.output_dim), dtype=self.dtype)
+        for frame in range(self.time_frames):
+            start = n_buffer - gap*frame
+            y[:, frame*n:(frame+1)*n] = data[start:start+n_rows]
+
+        # store the last rows in the buffer, overwriting the oldest ones
+        if n_buffer:
+            n_new = min(n_rows, n_buffer)
+            positions = (self.buffer_head + numx.arange(n_new)) % n_buffer
+            buffer[positions] = data[-n_new:]
+            self.buffer_head = (self.buffer_head + n_new) % n_buffer
+        return y
 
 class EtaComputerNode(Node):
     """Compute the eta values of the normalized training data.
@@ -676,6 +895,10 @@ def _get_supported_dtypes(self):
         return (mdp.utils.get_dtypes('Float') +
                 mdp.utils.get_dtypes('AllInteger'))
 
+    @staticmethod
+    def is_row_independent():
+        return True
+
     def _execute(self, x):
         """Return the clipped data."""
         # n.clip() does not work, since it does not accept None for one bound
@@ -686,16 +909,50 @@ def _execute(self, x):
         return x
 
 
+def _write_npy_header(npy_file, dtype, shape, size=None):
+    """Write a version 1.0 .npy header to the start of npy_file.
+
+    If size is given the header is padded with spaces to exactly size bytes,
+    otherwise the size of the written header is returned.
+    """
+    npy_file.seek(0)
+    write_array_header_1_0(npy_file,
+                           {'descr': dtype_to_descr(numx.dtype(dtype)),
+                            'fortran_order': False,
+                            'shape': tuple(shape)})
+    header_end = npy_file.tell()
+    if size is None:
+        return header_end
+    if header_end > size:
+        err = "The .npy header does not fit in %d bytes." % size
+        raise NodeException(err)
+    # the header length follows the magic string and the version number
+    npy_file.seek(8)
+    npy_file.write(struct.pack("<H", size - 10))
+    # replace the final newline by the padding
+    npy_file.seek(header_end - 1)
+    npy_file.write((" " * (size - header_end) + "\n").encode("ascii"))
+
+
 class HistogramNode(PreserveDimNode):
     """Node which stores a history of the data during its training phase.
 
     The data history is stored in ``self.data_hist`` and can also be deleted to
     free memory. Alternatively it can be automatically pickled to disk.
 
+    The history is collected in a buffer whose capacity is doubled when it
+    is full, so that storing a chunk of data does not copy the previous
+    history. With ``max_samples`` only a uniform random sample of fixed size
+    is kept (reservoir sampling), so that the memory usage is bounded.
+
     Note that data is only stored during training.
     """
 
+    # minimum number of rows allocated for the history buffer
+    _min_hist_capacity = 64
+
     def __init__(self, hist_fraction=1.0, hist_filename=None,
+                 max_samples=None,
                  input_dim=None, output_dim=None, dtype=None):
         """Initialize the node.
 
@@ -706,13 +963,38 @@ def __init__(self, hist_fraction=1.0, hist_filename=None,
             is called and data_hist is then cleared (to free memory).
             If filename is None (default value) then data_hist is not cleared
             and can be directly used after training.
+            If the filename ends with '.npy' the history buffer is instead
+            memory-mapped to this file during the training, which can then
+            be loaded with numpy.load.
+        max_samples -- If specified, only a uniform random sample of
+            max_samples data points is kept (after hist_fraction has been
+            applied), using reservoir sampling.
         """
         super(HistogramNode, self).__init__(input_dim=input_dim,
                                             output_dim=output_dim,
                                             dtype=dtype)
         self._hist_filename = hist_filename
         self.hist_fraction = hist_fraction
-        self.data_hist = None  # stores the data history
+        self.max_samples = max_samples
+        self._hist = None  # history buffer, only _hist_len rows are used
+        self._hist_len = 0
+        self._hist_seen = 0  # number of data points offered to the reservoir
+        self._hist_file = None  # open file for a '.npy' history
+        self._hist_offset = 0  # size of the .npy header
+
+    def _get_data_hist(self):
+        if self._hist is None:
+            return None
+        return self._hist[:self._hist_len]
+
+    def _set_data_hist(self, data_hist):
+        self._close_hist_file()
+        self._hist = data_hist
+        self._hist_len = 0 if data_hist is None else len(data_hist)
+        self._hist_seen = self._hist_len
+
+    data_hist = property(_get_data_hist, _set_data_hist,
+                         doc="The data history.")
 
     def _get_supported_dtypes(self):
         return (mdp.utils.get_dtypes('AllFloat') +
@@ -723,15 +1005,109 @@ def _train(self, x):
         """Store the history data."""
         if self.hist_fraction < 1.0:
             x = x[numx.random.random(len(x)) < self.hist_fraction]
-        if self.data_hist is not None:
-            self.data_hist = numx.concatenate([self.data_hist, x])
+        if self.max_samples is None:
+            self._append_hist(x)
+        else:
+            self._sample_hist(x)
+
+    def _append_hist(self, x):
+        """Append x to the history buffer."""
+        length = self._hist_len + len(x)
+        self._reserve_hist(length, x)
+        self._hist[self._hist_len:length] = x
+        self._hist_len = length
+
+    def _sample_hist(self, x):
+        """Update the reservoir sample of the history with x."""
+        # fill the reservoir first
+        n_fill = max(0, min(len(x), self.max_samples - self._hist_len))
+        if n_fill:
+            self._append_hist(x[:n_fill])
+            self._hist_seen += n_fill
+            x = x[n_fill:]
+        if not len(x):
+            return
+        # the i-th data point (counting from 1) replaces a random item of
+        # the reservoir with probability max_samples / i
+        seen = self._hist_seen + numx.arange(1, len(x)+1)
+        indices = (numx.random.random(len(x)) * seen).astype('l')
+        replace = indices < self.max_samples
+        indices, x = indices[replace], x[replace]
+        # if an item is replaced several times only the last one counts
+        last = len(indices) - 1 - numx.unique(indices[::-1],
+                                              return_index=True)[1]
+        self._hist[indices[last]] = x[last]
+        self._hist_seen = seen[-1]
+
+    def _reserve_hist(self, length, x):
+        """Make sure that the history buffer can store length rows like x.
+
+        The buffer is always reallocated, never resized in place, because
+        data_hist views of the old buffer could still be in use.
+        """
+        if self._hist is None:
+            capacity = max(self._min_hist_capacity, length)
+        elif length > len(self._hist):
+            capacity = 2 * len(self._hist)
+            while capacity < length:
+                capacity *= 2
+        else:
+            return
+        if self.max_samples is not None:
+            capacity = max(length, min(capacity, self.max_samples))
+        shape = (capacity,) + x.shape[1:]
+        dtype = x.dtype if self._hist is None else self._hist.dtype
+        if (self._hist_filename is not None and
+            self._hist_filename.endswith(".npy")):
+            self._reserve_hist_file(shape, dtype)
+        else:
+            hist = numx.empty(shape, dtype=dtype)
+            if self._hist_len:
+                hist[:self._hist_len] = self._hist[:self._hist_len]
+            self._hist = hist
+
+    def _reserve_hist_file(self, shape, dtype):
+        """Extend the memory-mapped '.npy' history file, the data stays in
+        place."""
+        old_hist = None
+        if self._hist_file is None:
+            self._hist_file = open(self._hist_filename, "w+b")
+            # leave room for the header with any number of rows
+            max_shape = (numx.iinfo(numx.intp).max,) + shape[1:]
+            self._hist_offset = _write_npy_header(self._hist_file, dtype,
+                                                  max_shape)
+            # a history set by the user is copied to the file
+            old_hist = self._hist
         else:
-            self.data_hist = x
+            self._hist.flush()
+        nbytes = numx.dtype(dtype).itemsize * int(numx.prod(shape))
+        self._hist_file.truncate(self._hist_offset + nbytes)
+        self._hist = numx.memmap(self._hist_file, dtype=dtype, mode="r+",
+                                 offset=self._hist_offset, shape=shape)
+        if old_hist is not None:
+            self._hist[:self._hist_len] = old_hist[:self._hist_len]
+
+    def _close_hist_file(self):
+        """Write the final .npy header and close the history file."""
+        if self._hist_file is None:
+            return
+        self._hist.flush()
+        dtype = self._hist.dtype
+        shape = (self._hist_len,) + self._hist.shape[1:]
+        self._hist = None
+        nbytes = dtype.itemsize * int(numx.prod(shape))
+        self._hist_file.truncate(self._hist_offset + nbytes)
+        _write_npy_header(self._hist_file, dtype, shape, self._hist_offset)
+        self._hist_file.close()
+        self._hist_file = None
 
     def _stop_training(self):
         """Pickle the histogram data to file and clear it if required."""
         super(HistogramNode, self)._stop_training()
-        if self._hist_filename:
+        if self._hist_file is not None:
+            self._close_hist_file()
+            self._hist_len = 0
+        elif self._hist_filename:
             pickle_file = open(self._hist_filename, "wb")
             try:
                 pickle.dump(self.data_hist, pickle_file, protocol=-1)
@@ -739,6 +1115,28 @@ def _stop_training(self):
                 pickle_file.close( )
             self.data_hist = None
 
+    def __getstate__(self):
+        # the open history file can not be pickled, store the data instead
+        state = self.__dict__.copy()
+        if self._hist_file is not None:
+            state['_hist'] = numx.array(self.data_hist)
+            state['_hist_file'] = None
+            state['_hist_filename'] = None
+        return state
+
+    def __setstate__(self, state):
+        if 'data_hist' in state:
+            # pickled before the history buffer was introduced
+            state = state.copy()
+            hist = state.pop('data_hist')
+            state['_hist'] = hist
+            state['_hist_len'] = 0 if hist is None else len(hist)
+            state['_hist_seen'] = state['_hist_len']
+            state.setdefault('max_samples', None)
+            state.setdefault('_hist_file', None)
+            state.setdefault('_hist_offset', 0)
+        self.__dict__.update(state)
+
 class AdaptiveCutoffNode(HistogramNode):
     """Node which uses the data history during training to learn cutoff values.
 
@@ -751,10 +1149,17 @@ class AdaptiveCutoffNode(HistogramNode):
 
     When ``stop_training`` is called the cutoff values for each coordinate are
     calculated based on the collected histogram data.
+
+    If ``sketch_size`` is specified the data history is not stored. Instead
+    a `mdp.utils.QuantileSketch` of the training data is updated, so that
+    the cutoff values are learned in a single pass with bounded memory.
+    They are then only approximate for more than ``sketch_size`` training
+    points.
     """
 
     def __init__(self, lower_cutoff_fraction=None, upper_cutoff_fraction=None,
-                 hist_fraction=1.0, hist_filename=None,
+                 hist_fraction=1.0, hist_filename=None, sketch_size=None,
+                 max_samples=None,
                  input_dim=None, output_dim=None, dtype=None):
         """Initialize the node.
 
@@ -775,9 +1180,19 @@ def __init__(self, lower_cutoff_fraction=None, upper_cutoff_fraction=None,
             cleared (to free memory).  If filename is ``None``
             (default value) then ``data_hist`` is not cleared and can
             be directly used after training.
+          sketch_size
+            If specified, the cutoff values are learned with a quantile
+            sketch storing at most ``sketch_size`` items per level,
+            and no data history is stored (``hist_fraction`` and
+            ``hist_filename`` are then ignored).
+          max_samples
+            If specified, the cutoff values are learned from a uniform
+            random sample of ``max_samples`` data points, see
+            `HistogramNode`.
         """
         super(AdaptiveCutoffNode, self).__init__(hist_fraction=hist_fraction,
                                                  hist_filename=hist_filename,
+                                                 max_samples=max_samples,
                                                  input_dim=input_dim,
                                                  output_dim=output_dim,
                                                  dtype=dtype)
@@ -785,25 +1200,54 @@ def __init__(self, lower_cutoff_fraction=None, upper_cutoff_fraction=None,
         self.upper_cutoff_fraction = upper_cutoff_fraction
         self.lower_bounds = None
         self.upper_bounds = None
-        
+        self.sketch_size = sketch_size
+        if sketch_size is None:
+            self._sketch = None
+        else:
+            self._sketch = mdp.utils.QuantileSketch(size=sketch_size)
+
     def _get_supported_dtypes(self):
         return (mdp.utils.get_dtypes('Float') +
                 mdp.utils.get_dtypes('AllInteger'))
 
+    def _train(self, x):
+        """Store the history data or update the quantile sketch."""
+        if self._sketch is None:
+            super(AdaptiveCutoffNode, self)._train(x)
+        else:
+            self._sketch.update(x)
+
     def _stop_training(self):
         """Calculate the cutoff bounds based on collected histogram data."""
+        if self._sketch is not None:
+            self._stop_training_sketch()
+            return
         if self.lower_cutoff_fraction or self.upper_cutoff_fraction:
             sorted_data = self.data_hist.copy()
             sorted_data.sort(axis=0)
             if self.lower_cutoff_fraction:
-                index = self.lower_cutoff_fraction * len(sorted_data)
+                index = int(self.lower_cutoff_fraction * len(sorted_data))
                 self.lower_bounds = sorted_data[index]
             if self.upper_cutoff_fraction:
-                index = (len(sorted_data) -
-                         self.upper_cutoff_fraction * len(sorted_data))
+                index = int(len(sorted_data) -
+                            self.upper_cutoff_fraction * len(sorted_data))
                 self.upper_bounds = sorted_data[index]
         super(AdaptiveCutoffNode, self)._stop_training()
 
+    def _stop_training_sketch(self):
+        """Calculate the cutoff bounds based on the quantile sketch."""
+        n = self._sketch.n
+        if self.lower_cutoff_fraction:
+            rank = int(self.lower_cutoff_fraction * n)
+            self.lower_bounds = self._sketch.quantiles([rank])[0]
+        if self.upper_cutoff_fraction:
+            rank = int(n - self.upper_cutoff_fraction * n)
+            self.upper_bounds = self._sketch.quantiles([rank])[0]
+
+    @staticmethod
+    def is_row_independent():
+        return True
+
     def _execute(self, x):
         """Return the clipped data."""
         if self.lower_bounds is not None:
@@ -1,6 +1,6 @@
 __docformat__ = "restructuredtext en"
 
-from mdp import numx, numx_rand, utils, graph, Node
+from mdp import numx, numx_rand, utils, graph, Node, NodeException
 
 class _GNGNodeData(object):
     """Data associated to a node in a Growing Neural Gas graph."""
@@ -32,13 +32,32 @@ class GrowingNeuralGasNode(Node):
     A java implementation is available at:
     http://www.neuroinformatik.ruhr-uni-bochum.de/ini/VDM/research/gsn/DemoGNG/GNG.html
 
+    Two engines are available to store the network:
+
+    'graph' -- The network is stored in an `mdp.graph.Graph` object, each
+        graph node holds its position and cumulative error, and each edge
+        its age.
+    'array' -- The positions, the cumulative errors and the edge ages are
+        stored in contiguous arrays, together with an adjacency matrix.
+        The nearest nodes search, the edge aging and the error decay are
+        vectorized, which is much faster. The `graph` attribute is then
+        built on demand as a snapshot of the current network.
+
     **Attributes and methods of interest**
 
     - graph -- The corresponding `mdp.graph.Graph` object
     """
+
+    # maximum number of entries in the temporary distance matrix
+    # computed by nearest_neighbor
+    _max_dist_size = 2**22
+
+    # nodes pickled before the engine argument was added use the graph
+    engine = "graph"
+
     def __init__(self, start_poss=None, eps_b=0.2, eps_n=0.006, max_age=50,
                  lambda_=100, alpha=0.5, d=0.995, max_nodes=2147483647,
-                 input_dim=None, dtype=None):
+                 engine="graph", input_dim=None, dtype=None):
         """Growing Neural Gas algorithm.
 
         :Parameters:
@@ -91,8 +110,29 @@ def __init__(self, start_poss=None, eps_b=0.2, eps_n=0.006, max_age=50,
             maximal number of nodes in the graph.
 
             Default: 2^31 - 1
+
+          engine
+            either 'graph' or 'array', see the class documentation.
+
+            Default: 'graph'
         """
-        self.graph = graph.Graph()
+        if engine not in ("graph", "array"):
+            err = ("Unknown engine '%s', must be either 'graph' or "
+                   "'array'." % str(engine))
+            raise NodeException(err)
+        self.engine = engine
+        if engine == "graph":
+            self._graph = graph.Graph()
+        else:
+            self._graph = None
+        # storage of the 'array' engine, allocated with the first node
+        self._n_nodes = 0
+        self._pos = None  # node positions
+        self._errors = None  # cumulative errors
+        self._adjacency = None  # symmetric boolean adjacency matrix
+        self._heads = None  # _heads[i,j] is true for an edge from i to j
+        self._ages = None  # edge ages
+        self._graph_view = None  # graph built on demand
         self.tlen = 0
 
         #copy parameters
@@ -106,14 +146,53 @@ def __init__(self, start_poss=None, eps_b=0.2, eps_n=0.006, max_age=50,
         if start_poss is not None:
             if self.dtype is None:
                 self.dtype = start_poss[0].dtype
-            node1 = self._add_node(self._refcast(start_poss[0]))
-            node2 = self._add_node(self._refcast(start_poss[1]))
-            self._add_edge(node1, node2)
+            if engine == "graph":
+                node1 = self._add_node(self._refcast(start_poss[0]))
+                node2 = self._add_node(self._refcast(start_poss[1]))
+                self._add_edge(node1, node2)
+            else:
+                self._add_array_node(self._refcast(start_poss[0]))
+                self._add_array_node(self._refcast(start_poss[1]))
+                self._add_array_edge(0, 1)
 
     def _set_input_dim(self, n):
         self._input_dim = n
         self.output_dim = n
 
+    def __setstate__(self, state):
+        if 'graph' in state:
+            # pickled before the graph became a property
+            state = state.copy()
+            state['_graph'] = state.pop('graph')
+        self.__dict__.update(state)
+
+    def _get_graph(self):
+        if self.engine == "graph":
+            return self._graph
+        if self._graph_view is None:
+            self._graph_view = self._build_graph_view()
+        return self._graph_view
+
+    graph = property(_get_graph,
+                     doc="The corresponding `mdp.graph.Graph` object.")
+
+    def _build_graph_view(self):
+        """Return a graph with the nodes and edges of the 'array' engine.
+
+        The node positions are copies, so changing the graph has no effect
+        on the network.
+        """
+        g = graph.Graph()
+        n = self._n_nodes
+        nodes = [g.add_node(_GNGNodeData(self._pos[i].copy(),
+                                         self._errors[i]))
+                 for i in range(n)]
+        heads, tails = self._heads[:n, :n].nonzero()
+        for head, tail in zip(heads, tails):
+            g.add_edge(nodes[head], nodes[tail],
+                       _GNGEdgeData(self._ages[head, tail]))
+        return g
+
     def _add_node(self, pos):
         node = self.graph.add_node(_GNGNodeData(pos))
         return node
@@ -121,6 +200,60 @@ def _add_node(self, pos):
     def _add_edge(self, from_, to_):
         self.graph.add_edge(from_, to_, _GNGEdgeData())
 
+    def _add_array_node(self, pos):
+        """Append a node to the arrays of the 'array' engine and return its
+        index. The capacity of the arrays is doubled when they are full."""
+        n = self._n_nodes
+        if self._pos is None:
+            capacity = 16
+            self._pos = numx.empty((capacity, len(pos)), dtype=pos.dtype)
+            self._errors = numx.empty(capacity, dtype="d")
+            self._adjacency = numx.zeros((capacity, capacity), dtype=bool)
+            self._heads = numx.zeros((capacity, capacity), dtype=bool)
+            self._ages = numx.zeros((capacity, capacity), dtype="l")
+        elif n == len(self._pos):
+            capacity = 2*n
+            pos_ = numx.empty((capacity, self._pos.shape[1]),
+                              dtype=self._pos.dtype)
+            pos_[:n] = self._pos
+            self._pos = pos_
+            errors = numx.empty(capacity, dtype="d")
+            errors[:n] = self._errors
+            self._errors = errors
+            for name in ("_adjacency", "_heads", "_ages"):
+                old = getattr(self, name)
+                new = numx.zeros((capacity, capacity), dtype=old.dtype)
+                new[:n, :n] = old
+                setattr(self, name, new)
+        self._pos[n] = pos
+        self._errors[n] = 0.
+        self._n_nodes = n+1
+        return n
+
+    def _add_array_edge(self, from_, to_):
+        self._adjacency[from_, to_] = self._adjacency[to_, from_] = True
+        self._heads[from_, to_] = True
+        self._ages[from_, to_] = self._ages[to_, from_] = 0
+
+    def _remove_array_edge(self, node1, node2):
+        self._adjacency[node1, node2] = self._adjacency[node2, node1] = False
+        self._heads[node1, node2] = self._heads[node2, node1] = False
+
+    def _remove_array_node(self, idx):
+        """Remove the node with index idx (which must not have edges) and
+        shift the following nodes, preserving their order."""
+        n = self._n_nodes
+        self._pos[idx:n-1] = self._pos[idx+1:n]
+        self._errors[idx:n-1] = self._errors[idx+1:n]
+        keep = numx.arange(n) != idx
+        for name in ("_adjacency", "_heads", "_ages"):
+            matrix = getattr(self, name)
+            # fancy indexing makes a copy, so the assignment is safe
+            matrix[:n-1, :n-1] = matrix[:n][:, keep][keep]
+            matrix[n-1, :n] = 0
+            matrix[:n, n-1] = 0
+        self._n_nodes = n-1
+
     def _get_nearest_nodes(self, x):
         """Return the two nodes in the graph that are nearest to x and their
         squared distances. (Return ([node1, node2], [dist1, dist2])"""
@@ -180,10 +313,15 @@ def _insert_new_node(self):
                                        fnode.data.cum_error)
 
     def get_nodes_position(self):
+        if self.engine == "array":
+            return numx.array(self._pos[:self._n_nodes], dtype=self.dtype)
         return numx.array(map(lambda n: n.data.pos, self.graph.nodes),
                           dtype = self.dtype)
 
     def _train(self, input):
+        if self.engine == "array":
+            self._train_array(input)
+            return
         g = self.graph
         d = self.d
 
@@ -237,6 +375,86 @@ def _train(self, input):
             for node in g.nodes:
                 node.data.cum_error *= d
 
+    def _train_array(self, input):
+        """Train the network stored in the arrays of the 'array' engine.
+
+        The steps are the same as in the 'graph' engine.
+        """
+        d, max_age = self.d, self.max_age
+        eps_b, eps_n = self.eps_b, self.eps_n
+        # the graph view must be rebuilt after the training
+        self._graph_view = None
+
+        if self._n_nodes == 0:
+            normal = numx_rand.normal
+            self._add_array_node(self._refcast(normal(0.0, 1.0,
+                                                      self.input_dim)))
+            self._add_array_node(self._refcast(normal(0.0, 1.0,
+                                                      self.input_dim)))
+
+        for x in input:
+            self.tlen += 1
+            n = self._n_nodes
+            pos = self._pos[:n]
+
+            # step 2 - find the nearest nodes
+            diff = pos - x
+            dists = (diff*diff).sum(axis=1)
+            n0, n1 = dists.argsort()[:2]
+
+            # step 3 - increase age of the emanating edges
+            neighbors = self._adjacency[n0, :n].nonzero()[0]
+            self._ages[n0, neighbors] += 1
+            self._ages[neighbors, n0] += 1
+
+            # step 4 - update error
+            self._errors[n0] += numx.sqrt(dists[n0])
+
+            # step 5 - move nearest node and neighbours
+            pos[n0] += eps_b*(x - pos[n0])
+            pos[neighbors] += eps_n*(x - pos[neighbors])
+
+            # step 6 - update n0<->n1 edge
+            if self._adjacency[n0, n1]:
+                self._ages[n0, n1] = self._ages[n1, n0] = 0
+            else:
+                self._add_array_edge(n0, n1)
+
+            # step 7 - remove old edges, only the edges of n0 are aged
+            old = neighbors[self._ages[n0, neighbors] > max_age]
+            for neighbor in old:
+                self._remove_array_edge(n0, neighbor)
+            # remove the nodes left without edges, starting from the last
+            # one so that the indices remain valid
+            degrees = self._adjacency[old, :n].sum(axis=1)
+            for idx in sorted(old[degrees == 0], reverse=True):
+                self._remove_array_node(idx)
+
+            # step 8 - add a new node each lambda steps
+            if not self.tlen % self.lambda_ and self._n_nodes < self.max_nodes:
+                self._insert_new_array_node()
+
+            # step 9 - decrease errors
+            self._errors[:self._n_nodes] *= d
+
+    def _insert_new_array_node(self):
+        """Insert a new node where the error is the largest ('array'
+        engine)."""
+        errors = self._errors[:self._n_nodes]
+        qnode = errors.argmax()
+        neighbors = self._adjacency[qnode, :self._n_nodes].nonzero()[0]
+        fnode = neighbors[errors[neighbors].argmax()]
+        new_pos = 0.5*(self._pos[qnode] + self._pos[fnode])
+        new_node = self._add_array_node(new_pos)
+        self._remove_array_edge(qnode, fnode)
+        self._add_array_edge(qnode, new_node)
+        self._add_array_edge(fnode, new_node)
+        # the arrays may have been reallocated
+        errors = self._errors
+        errors[qnode] *= self.alpha
+        errors[fnode] *= self.alpha
+        errors[new_node] = 0.5*(errors[qnode] + errors[fnode])
+
     def nearest_neighbor(self, input):
         """Assign each point in the input data to the nearest node in
         the graph. Return the list of the nearest node instances, and
@@ -245,10 +463,18 @@ def nearest_neighbor(self, input):
         necessary."""
         super(GrowingNeuralGasNode, self).execute(input)
 
-        nodes = []
+        nodes = self.graph.nodes
+        pos = self.get_nodes_position()
+        # process the data in chunks to limit the size of the temporary
+        # difference array
+        chunk_len = max(1, self._max_dist_size // max(1, pos.size))
+        indices = []
         dists = []
-        for x in input:
-            (n0, n1), dist = self._get_nearest_nodes(x)
-            nodes.append(n0)
-            dists.append(numx.sqrt(dist[0]))
-        return nodes, dists
+        for start in range(0, len(input), chunk_len):
+            diff = input[start:start+chunk_len, numx.newaxis, :] - pos
+            sq_dists = (diff*diff).sum(axis=2)
+            chunk_indices = sq_dists.argmin(axis=1)
+            indices.extend(chunk_indices)
+            dists.extend(numx.sqrt(
+                sq_dists[numx.arange(len(chunk_indices)), chunk_indices]))
+        return [nodes[idx] for idx in indices], dists
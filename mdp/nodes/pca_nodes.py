@@ -34,7 +34,7 @@ class PCANode(mdp.Node):
 
     def __init__(self, input_dim=None, output_dim=None, dtype=None,
                  svd=False, reduce=False, var_rel=1E-12, var_abs=1E-15,
-                 var_part=None):
+                 var_part=None, pairwise=False):
         """The number of principal components to be kept can be specified as
         'output_dim' directly (e.g. 'output_dim=10' means 10 components
         are kept) or by the fraction of variance to be explained
@@ -55,6 +55,10 @@ def __init__(self, input_dim=None, output_dim=None, dtype=None,
                   Note: when the 'reduce' switch is enabled, the actual number
                   of principal components (self.output_dim) may be different
                   from that set when creating the instance.
+
+        pairwise -- if True the covariance matrix is accumulated in the
+                    'pairwise' mode of mdp.utils.CovarianceMatrix, which is
+                    numerically more stable (e.g. for single precision data)
         """
         # this must occur *before* calling super!
         self.desired_variance = None
@@ -69,8 +73,9 @@ def __init__(self, input_dim=None, output_dim=None, dtype=None,
         self.var_rel = var_rel
         self.var_part = var_part
         self.reduce = reduce
+        self.pairwise = pairwise
         # empirical covariance matrix, updated during the training phase
-        self._cov_mtx = CovarianceMatrix(dtype)
+        self._cov_mtx = CovarianceMatrix(dtype, pairwise=pairwise)
         # attributes that defined in stop_training
         self.d = None  # eigenvalues
         self.v = None  # eigenvectors, first index for coordinates
@@ -251,6 +256,10 @@ def get_recmatrix(self, transposed=1):
             return self.v.T
         return self.v
 
+    @staticmethod
+    def is_row_independent():
+        return True
+
     def _execute(self, x, n=None):
         """Project the input on the first 'n' principal components.
         If 'n' is not set, use all available components."""
@@ -273,6 +282,16 @@ def _inverse(self, y, n=None):
             return mult(y, v[:n, :]) + self.avg
         return mult(y, v) + self.avg
 
+    def get_affine_transform(self):
+        if self.is_training():
+            return None
+        return self.v, -mult(self.avg, self.v)
+
+    def get_affine_inverse(self):
+        if self.is_training():
+            return None
+        return self.get_recmatrix(), self.avg
+
 
 class WhiteningNode(PCANode):
     """*Whiten* the input data by filtering it through the most
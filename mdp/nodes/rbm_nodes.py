@@ -35,6 +35,15 @@ class RBMNode(mdp.Node):
     Hinton, G. E. (2002). Training products of experts by minimizing
     contrastive divergence. Neural Computation, 14(8):1711-1800
 
+    Large data chunks can be split into minibatches with the ``batch_size``
+    argument of ``train``. With ``persistent=True`` the model term is
+    estimated with Persistent Contrastive Divergence (PCD), i.e. with
+    Gibbs chains (*fantasy particles*) that are kept across updates
+    instead of being restarted from the data, as described in
+    Tieleman, T. (2008). Training restricted Boltzmann machines using
+    approximations to the likelihood gradient. Proceedings of the 25th
+    International Conference on Machine Learning, 1064-1071
+
     **Internal variables of interest**
 
       ``self.w``
@@ -74,8 +83,13 @@ def _init_weights(self):
         # bias on the hidden (output) units
         self.bh = self._refcast(randn(self.output_dim)*0.1)
 
-        # delta w, bv, bh used for momentum term
-        self._delta = (0., 0., 0.)
+        # delta w, bv, bh used for momentum term (updated in place)
+        self._delta = (numx.zeros_like(self.w), numx.zeros_like(self.bv),
+                       numx.zeros_like(self.bh))
+        # hidden states of the persistent Gibbs chains
+        self._fantasy_h = None
+        # number of parameter updates so far
+        self._n_cd_updates = 0
 
     def _sample_h(self, v):
         # returns P(h=1|v,W,b) and a sample from it
@@ -90,7 +104,8 @@ def _sample_v(self, h):
         return probs, v
 
     def _train(self, v, n_updates=1, epsilon=0.1, decay=0., momentum=0.,
-               verbose=False):
+               verbose=False, batch_size=None, persistent=False,
+               err_every=1):
         """Update the internal structures according to the input data `v`.
         The training is performed using Contrastive Divergence (CD).
 
@@ -106,10 +121,37 @@ def _train(self, v, n_updates=1, epsilon=0.1, decay=0., momentum=0.,
             weight decay term. Default value: 0.
           momentum
             momentum term. Default value: 0.
+          batch_size
+            number of observations used for each update of the parameters.
+            If None, the whole chunk is used for a single update.
+            Default value: None
+          persistent
+            if True, the model term is computed from persistent Gibbs
+            chains (PCD) which are kept across updates. The number of
+            chains is the number of observations in the first update.
+            Default value: False
+          err_every
+            the reconstruction error ``self._train_err`` is only
+            computed every `err_every` updates. Default value: 1
         """
         if not self._initialized:
             self._init_weights()
 
+        n = v.shape[0]
+        if batch_size is None:
+            batch_size = n
+        for start in range(0, n, batch_size):
+            self._cd_update(v[start:start+batch_size], n_updates, epsilon,
+                            decay, momentum, persistent, err_every)
+
+        if verbose:
+            print 'training error', self._train_err/self._train_err_len
+            ph, h = self._sample_h(v)
+            print 'energy', self._energy(v, ph).sum()
+
+    def _cd_update(self, v, n_updates, epsilon, decay, momentum, persistent,
+                   err_every):
+        """Perform a single update of the parameters with the data `v`."""
         # useful quantities
         n = v.shape[0]
         w, bv, bh = self.w, self.bv, self.bh
@@ -119,37 +161,56 @@ def _train(self, v, n_updates=1, epsilon=0.1, decay=0., momentum=0.,
 
         # first update of the hidden units for the data term
         ph_data, h_data = self._sample_h(v)
-        # n updates of both v and h for the model term
-        h_model = h_data.copy()
+        # n updates of both v and h for the model term, starting either
+        # from the data or from the persistent chains
+        if persistent:
+            if self._fantasy_h is None:
+                self._fantasy_h = h_data
+            h_model = self._fantasy_h
+        else:
+            h_model = h_data
         for i in range(n_updates):
             pv_model, v_model = self._sample_v(h_model)
             ph_model, h_model = self._sample_h(v_model)
+        if persistent:
+            self._fantasy_h = h_model
+        n_model = v_model.shape[0]
 
         # update w
-        data_term = mult(v.T, ph_data)
+        grad = mult(v.T, ph_data)
+        grad *= 1./n
         model_term = mult(v_model.T, ph_model)
-        dw = momentum*dw + epsilon*((data_term - model_term)/n - decay*w)
+        model_term *= 1./n_model
+        grad -= model_term
+        if decay:
+            grad -= decay*w
+        grad *= epsilon
+        dw *= momentum
+        dw += grad
         w += dw
 
         # update bv
-        data_term = v.sum(axis=0)
-        model_term = v_model.sum(axis=0)
-        dbv = momentum*dbv + epsilon*((data_term - model_term)/n)
+        dbv *= momentum
+        dbv += (epsilon/n)*v.sum(axis=0)
+        dbv -= (epsilon/n_model)*v_model.sum(axis=0)
         bv += dbv
 
         # update bh
-        data_term = ph_data.sum(axis=0)
-        model_term = ph_model.sum(axis=0)
-        dbh = momentum*dbh + epsilon*((data_term - model_term)/n)
+        dbh *= momentum
+        dbh += (epsilon/n)*ph_data.sum(axis=0)
+        dbh -= (epsilon/n_model)*ph_model.sum(axis=0)
         bh += dbh
 
-        self._delta = (dw, dbv, dbh)
-        self._train_err = float(((v-v_model)**2.).sum())
-
-        if verbose:
-            print 'training error', self._train_err/v.shape[0]
-            ph, h = self._sample_h(v)
-            print 'energy', self._energy(v, ph).sum()
+        # reconstruction error
+        if self._n_cd_updates % err_every == 0:
+            if persistent:
+                # the chains are not related to the data
+                pv_model, v_model = self._sample_v(h_data)
+            diff = v - v_model
+            diff *= diff
+            self._train_err = float(diff.sum())
+            self._train_err_len = n
+        self._n_cd_updates += 1
 
     def _stop_training(self):
         #del self._delta
@@ -355,7 +416,7 @@ def is_invertible():
         return False
 
     def train(self, v, l, n_updates=1, epsilon=0.1, decay=0., momentum=0.,
-              verbose=False):
+              verbose=False, batch_size=None, persistent=False, err_every=1):
         """Update the internal structures according to the visible data `v`
         and the labels `l`.
         The training is performed using Contrastive Divergence (CD).
@@ -375,6 +436,9 @@ def train(self, v, l, n_updates=1, epsilon=0.1, decay=0., momentum=0.,
             weight decay term. Default value: 0.
           momentum
             momentum term. Default value: 0.
+
+        For the `batch_size`, `persistent` and `err_every` arguments have a
+        look at the `RBMNode._train` docstring.
         """
 
         if not self.is_training():
@@ -390,4 +454,7 @@ def train(self, v, l, n_updates=1, epsilon=0.1, decay=0., momentum=0.,
                                               epsilon=epsilon,
                                               decay=decay,
                                               momentum=momentum,
-                                              verbose=verbose)
+                                              verbose=verbose,
+                                              batch_size=batch_size,
+                                              persistent=persistent,
+                                              err_every=err_every)
@@ -126,6 +126,13 @@ def _execute(self, x):
             x = self._add_constant(x)
         return mult(x, self.beta)
 
+    def get_affine_transform(self):
+        if self.is_training():
+            return None
+        if self.with_bias:
+            return self.beta[1:, :], self.beta[0, :]
+        return self.beta, numx.zeros(self.beta.shape[1], dtype=self.dtype)
+
     def _add_constant(self, x):
         """Add a constant term to the vector 'x'.
         x -> [1 x]
@@ -66,22 +66,28 @@ class SFANode(Node):
 
           You can even change this behaviour during training. Just set the
           corresponding switch in the `train` method.
+
+      ``pairwise``
+          If ``True`` the covariance matrices are accumulated in the
+          'pairwise' mode of ``mdp.utils.CovarianceMatrix``, which is
+          numerically more stable (e.g. for single precision data).
     """
 
     def __init__(self, input_dim=None, output_dim=None, dtype=None,
-                 include_last_sample=True):
+                 include_last_sample=True, pairwise=False):
         """
-        For the ``include_last_sample`` switch have a look at the
-        SFANode class docstring.
+        For the ``include_last_sample`` and ``pairwise`` switches have a
+        look at the SFANode class docstring.
          """
         super(SFANode, self).__init__(input_dim, output_dim, dtype)
         self._include_last_sample = include_last_sample
+        self.pairwise = pairwise
 
         # init two covariance matrices
         # one for the input data
-        self._cov_mtx = CovarianceMatrix(dtype)
+        self._cov_mtx = CovarianceMatrix(dtype, pairwise=pairwise)
         # one for the derivatives
-        self._dcov_mtx = CovarianceMatrix(dtype)
+        self._dcov_mtx = CovarianceMatrix(dtype, pairwise=pairwise)
 
         # set routine for eigenproblem
         self._symeig = symeig
@@ -130,6 +136,77 @@ def _train(self, x, include_last_sample=None):
         self._cov_mtx.update(x[:last_sample_index, :])
         self._dcov_mtx.update(self.time_derivative(x))
 
+    def train_time_frames(self, x, frames_node, include_last_sample=None):
+        """Train the node with the output of a `mdp.nodes.TimeFramesNode`
+        (or `mdp.nodes.TimeDelayNode`) for the input data x.
+
+        This is equivalent to ``self.train(frames_node.execute(x))``, but
+        the covariance matrices are computed from x block by block, so that
+        the time frames are never stored in memory.
+
+        For the ``include_last_sample`` switch have a look at the
+        SFANode class docstring.
+        """
+        self._train_implicit(x, frames_node, include_last_sample)
+
+    def train_expanded(self, x, expansion_node, include_last_sample=None):
+        """Train the node with the output of a
+        `mdp.nodes.PolynomialExpansionNode` (or
+        `mdp.nodes.QuadraticExpansionNode`) for the input data x.
+
+        This is equivalent to ``self.train(expansion_node.execute(x))``,
+        but the covariance matrices are accumulated over chunks of rows, so
+        that the whole expansion is never stored in memory.
+
+        For the ``include_last_sample`` switch have a look at the
+        SFANode class docstring.
+        """
+        self._train_implicit(x, expansion_node, include_last_sample)
+
+    def _train_implicit(self, x, node, include_last_sample):
+        """Train the node with the output of node for the input data x,
+        using the ``update_covariance`` method of node."""
+        if not self.is_training():
+            err_str = "The training phase has already finished."
+            raise mdp.TrainingFinishedException(err_str)
+        train = type(self)._train
+        # in Python 3 the class attribute is the plain function
+        if getattr(train, '__func__', train) is not SFANode.__dict__['_train']:
+            err = ("Implicit training is not available for nodes which "
+                   "process the data in _train (%s)." % str(self.__class__))
+            raise TrainingException(err)
+        # set the dimensions of the node
+        node._pre_execution_checks(x)
+        if self.input_dim is None:
+            self.input_dim = node.output_dim
+        elif self.input_dim != node.output_dim:
+            err = ("Input dimensions mismatch: %s output dim %d != "
+                   "input dim %d" % (node.__class__.__name__,
+                                     node.output_dim, self.input_dim))
+            raise mdp.InconsistentDimException(err)
+        if self.dtype is None:
+            self.dtype = node.dtype
+        if hasattr(node, "_frames_length"):
+            s = node._frames_length(x.shape[0])
+        else:
+            s = x.shape[0]
+        if s < 2:
+            raise TrainingException('Need at least 2 time samples to '
+                                    'compute time derivative (%d given)'%s)
+        self._train_phase_started = True
+        self._update_covariances(x, node, include_last_sample)
+
+    def _update_covariances(self, x, node, include_last_sample=None):
+        """Update the covariance matrices with the output of node for
+        the input data x."""
+        if include_last_sample is None:
+            include_last_sample = self._include_last_sample
+        last_sample_index = None if include_last_sample else -1
+        # the output of node without its last row is the output
+        # for x without its last row
+        node.update_covariance(x[:last_sample_index, :], self._cov_mtx)
+        node.update_covariance(x, self._dcov_mtx, time_derivative=True)
+
     def _stop_training(self, debug=False):
         ##### request the covariance matrices and clean up
         self.cov_mtx, self.avg, self.tlen = self._cov_mtx.fix()
@@ -168,6 +245,10 @@ def _stop_training(self, debug=False):
         # store bias
         self._bias = mult(self.avg, self.sf)
 
+    @staticmethod
+    def is_row_independent():
+        return True
+
     def _execute(self, x, n=None):
         """Compute the output of the slowest functions.
         If 'n' is an integer, then use the first 'n' slowest components."""
@@ -182,6 +263,16 @@ def _execute(self, x, n=None):
     def _inverse(self, y):
         return mult(y, pinv(self.sf)) + self.avg
 
+    def get_affine_transform(self):
+        if self.is_training():
+            return None
+        return self.sf, -self._bias
+
+    def get_affine_inverse(self):
+        if self.is_training():
+            return None
+        return pinv(self.sf), self.avg
+
     def get_eta_values(self, t=1):
         """Return the eta values of the slow components learned during
         the training phase. If the training phase has not been completed
@@ -226,24 +317,32 @@ class SFA2Node(SFANode):
     Learning of Invariances, Neural Computation, 14(4):715-770 (2002)."""
 
     def __init__(self, input_dim=None, output_dim=None, dtype=None,
-                 include_last_sample=True):
+                 include_last_sample=True, pairwise=False):
         self._expnode = mdp.nodes.QuadraticExpansionNode(input_dim=input_dim,
                                                          dtype=dtype)
         super(SFA2Node, self).__init__(input_dim, output_dim, dtype,
-                                       include_last_sample)
+                                       include_last_sample, pairwise)
 
     @staticmethod
     def is_invertible():
         """Return True if the node can be inverted, False otherwise."""
         return False
 
+    def get_affine_transform(self):
+        # the quadratic expansion makes the execution nonlinear
+        return None
+
+    def get_affine_inverse(self):
+        return None
+
     def _set_input_dim(self, n):
         self._expnode.input_dim = n
         self._input_dim = n
 
     def _train(self, x, include_last_sample=None):
-        # expand in the space of polynomials of degree 2
-        super(SFA2Node, self)._train(self._expnode(x), include_last_sample)
+        # accumulate the covariance matrices in the space of polynomials
+        # of degree 2 without storing the whole expansion
+        self._update_covariances(x, self._expnode, include_last_sample)
 
     def _set_range(self):
         if (self.output_dim is not None) and (
@@ -265,7 +364,14 @@ def _stop_training(self, debug=False):
     def _execute(self, x, n=None):
         """Compute the output of the slowest functions.
         If 'n' is an integer, then use the first 'n' slowest components."""
-        return super(SFA2Node, self)._execute(self._expnode(x), n)
+        if n:
+            sf = self.sf[:, :n]
+            bias = self._bias[:n]
+        else:
+            sf = self.sf
+            bias = self._bias
+        # the expansion is multiplied with sf chunk by chunk
+        return self._expnode.project(x, sf) - bias
 
     def get_quadratic_form(self, nr):
         """
@@ -297,6 +297,18 @@ def _execute(self, x):
         result[:, :-self.L] = src
         return result
 
+    def get_affine_transform(self):
+        if self.is_training():
+            return None
+        n_exp = self.input_dim - self.output_dim
+        w = mdp.numx.zeros((self.input_dim, self.output_dim),
+                           dtype=self.dtype)
+        # the sources and the input signals are copied...
+        w[n_exp:, :] = mdp.numx.eye(self.output_dim, dtype=self.dtype)
+        # ...and the input signals are projected
+        w[:n_exp, -self.L:] = -self.proj_mtx
+        return w, mdp.numx.zeros(self.output_dim, dtype=self.dtype)
+
 class NormalizeNode(mdp.PreserveDimNode):
     """Make input signal meanfree and unit variance"""
     def __init__(self, input_dim=None, output_dim=None, dtype=None):
@@ -320,3 +332,13 @@ def _execute(self, x):
 
     def _inverse(self, y):
         return y*self.s + self.m
+
+    def get_affine_transform(self):
+        if self.is_training():
+            return None
+        return mdp.numx.diag(1./self.s), -self.m/self.s
+
+    def get_affine_inverse(self):
+        if self.is_training():
+            return None
+        return mdp.numx.diag(self.s), self.m
@@ -29,7 +29,8 @@
 from thread_schedule import ThreadScheduler
 from parallelnodes import (
     ParallelExtensionNode, NotForkableParallelException, JoinParallelException,
-    ParallelPCANode, ParallelSFANode, ParallelFDANode, ParallelHistogramNode
+    ParallelPCANode, ParallelSFANode, ParallelFDANode, ParallelHistogramNode,
+    ParallelAdaptiveCutoffNode
 )
 from parallelclassifiers import (
     ParallelGaussianClassifier, ParallelNearestMeanClassifier,
@@ -37,7 +38,8 @@
 )
 from parallelflows import (
     _purge_flownode, FlowTaskCallable, FlowTrainCallable, FlowExecuteCallable,
-    TrainResultContainer, ExecuteResultContainer,
+    FlowJoinCallable, TrainResultContainer, TreeTrainResultContainer,
+    ExecuteResultContainer,
     ParallelFlowException, NoTaskException,
     ParallelFlow, ParallelCheckpointFlow
 )
@@ -68,9 +70,10 @@
     "ParallelExtensionNode", "JoinParallelException",
     "NotForkableParallelException",
     "ParallelSFANode", "ParallelSFANode", "ParallelFDANode",
-    "ParallelHistogramNode",
+    "ParallelHistogramNode", "ParallelAdaptiveCutoffNode",
     "FlowTaskCallable", "FlowTrainCallable", "FlowExecuteCallable",
-    "ExecuteResultContainer", "TrainResultContainer", "ParallelFlowException",
+    "FlowJoinCallable", "ExecuteResultContainer", "TrainResultContainer",
+    "TreeTrainResultContainer", "ParallelFlowException",
     "NoTaskException",
     "ParallelFlow", "ParallelCheckpointFlow",
     "ParallelFlowNode", "ParallelLayer", "ParallelCloneLayer"]
@@ -5,6 +5,8 @@
 as well.
 """
 
+import threading
+
 import mdp
 from mdp import numx as n
 
@@ -122,7 +124,109 @@ def get_results(self):
         flownode = self._flownode
         self._flownode = None
         return [flownode,]
-    
+
+
+class TreeTrainResultContainer(TrainResultContainer):
+    """Container for forked flownodes which are joined in a tree.
+
+    The forked flownodes are not joined here, but paired up by their level
+    in the join tree (the forks from the training tasks have level 0, a join
+    of two level n flownodes has level n+1). As soon as two flownodes with
+    the same level have arrived they are handed out as a pair, so at most one
+    flownode per level is kept here. The pairs are joined by FlowJoinCallable
+    tasks in the scheduler, see the tree_join argument of ParallelFlow.train.
+    """
+
+    def __init__(self):
+        super(TreeTrainResultContainer, self).__init__()
+        self._flownodes = {}  # maps the tree level to a pending flownode
+        self._pairs = []
+        self._n_results = 0
+        self._result_added = threading.Condition(threading.Lock())
+
+    def add_result(self, result, task_index):
+        if isinstance(result, tuple):
+            # result from a FlowJoinCallable
+            level, flownode = result
+        else:
+            level, flownode = 0, result
+        del result
+        self._result_added.acquire()
+        try:
+            self._n_results += 1
+            if level in self._flownodes:
+                self._pairs.append((self._flownodes.pop(level), flownode,
+                                    level + 1))
+            else:
+                self._flownodes[level] = flownode
+            self._result_added.notifyAll()
+        finally:
+            self._result_added.release()
+
+    def get_pairs(self):
+        """Return the list of flownode pairs which are ready to be joined.
+
+        The returned pairs are removed from the container, each pair is a
+        valid data value for FlowJoinCallable.
+        """
+        self._result_added.acquire()
+        try:
+            pairs = self._pairs
+            self._pairs = []
+            return pairs
+        finally:
+            self._result_added.release()
+
+    def wait_for_pairs(self, n_tasks):
+        """Block until a pair is ready or all results have arrived.
+
+        n_tasks -- Total number of tasks that will deliver a result.
+
+        Once all results have arrived the remaining flownodes from different
+        levels are paired as well, so an empty list is only returned when a
+        single flownode is left.
+        """
+        self._result_added.acquire()
+        try:
+            while not self._pairs and self._n_results < n_tasks:
+                self._result_added.wait()
+            if not self._pairs and len(self._flownodes) > 1:
+                levels = sorted(self._flownodes)[:2]
+                self._pairs.append((self._flownodes.pop(levels[0]),
+                                    self._flownodes.pop(levels[1]),
+                                    levels[1] + 1))
+            pairs = self._pairs
+            self._pairs = []
+            return pairs
+        finally:
+            self._result_added.release()
+
+    def get_results(self):
+        flownodes = self._flownodes.values()
+        for pair in self._pairs:
+            flownodes += pair[:2]
+        self._flownodes = {}
+        self._pairs = []
+        self._n_results = 0
+        return flownodes
+
+
+class FlowJoinCallable(FlowTaskCallable):
+    """Joins two forked flownodes, used for the tree join in ParallelFlow.
+
+    The data is a tuple of two flownodes and the level of the join in the
+    tree. The second flownode is joined into the first one, which is then
+    returned together with the level (see TreeTrainResultContainer).
+    """
+
+    def __call__(self, data):
+        flownode, forked_flownode, level = data
+        del data
+        flownode.join(forked_flownode)
+        # free the absorbed fork before the result is returned
+        del forked_flownode
+        return (level, flownode)
+
 
 ### Execute task classes ###
 
@@ -262,6 +366,7 @@ def __init__(self, flow, verbose=False, **kwargs):
     def train(self, data_iterables, scheduler=None,
               train_callable_class=None,
               overwrite_result_container=True,
+              tree_join=False,
               **kwargs):
         """Train all trainable nodes in the flow.
 
@@ -292,6 +397,15 @@ def train(self, data_iterables, scheduler=None,
             the result container in the scheduler will be overwritten with an
             instance of NodeResultContainer (unless it is already an instance
             of NodeResultContainer). This improves the memory efficiency.
+        tree_join -- If True then the forked nodes are joined pairwise in a
+            tree, with the joins being processed as tasks by the scheduler
+            (default value is False, in which case the forked nodes are
+            joined one by one in this process). Two forked nodes are joined
+            as soon as they are available, so the joins overlap with the
+            training. With many tasks this reduces the join time from linear
+            to logarithmic in the number of tasks.
+            This requires a TreeTrainResultContainer in the scheduler,
+            otherwise the results are used without a tree join.
         """
         # Warning: If this method is updated you also have to update train
         #          in ParallelCheckpointFlow.
@@ -306,6 +420,10 @@ def train(self, data_iterables, scheduler=None,
         else:
             if train_callable_class is None:
                 train_callable_class = FlowTrainCallable
+            if tree_join:
+                result_container_class = TreeTrainResultContainer
+            else:
+                result_container_class = TrainResultContainer
             schedulers = None
             # do parallel training
             try:
@@ -339,13 +457,18 @@ def train(self, data_iterables, scheduler=None,
                 if ((scheduler is not None) and
                     overwrite_result_container and
                     (not isinstance(scheduler.result_container,
-                                    TrainResultContainer))):
-                    scheduler.result_container = TrainResultContainer()
+                                    result_container_class))):
+                    scheduler.result_container = result_container_class()
                 ## train all nodes
                 while self.is_parallel_training:
-                    while self.task_available:
-                        task = self.get_task()
-                        scheduler.add_task(*task)
+                    if (tree_join and
+                        isinstance(scheduler.result_container,
+                                   TreeTrainResultContainer)):
+                        self._add_tree_join_tasks(scheduler)
+                    else:
+                        while self.task_available:
+                            task = self.get_task()
+                            scheduler.add_task(*task)
                     results = scheduler.get_results()
                     if results == []:
                         err = ("Could not get any training tasks or results "
@@ -367,8 +490,9 @@ def train(self, data_iterables, scheduler=None,
                         if ((scheduler is not None) and
                             overwrite_result_container and
                             (not isinstance(scheduler.result_container,
-                                            TrainResultContainer))):
-                            scheduler.result_container = TrainResultContainer()
+                                            result_container_class))):
+                            scheduler.result_container = \
+                                                    result_container_class()
             finally:
                 # reset iterable references, which cannot be pickled
                 self._train_data_iterables = None
@@ -376,6 +500,44 @@ def train(self, data_iterables, scheduler=None,
                 if (schedulers is not None) and (scheduler is not None):
                     scheduler.shutdown()
 
+    def _add_tree_join_tasks(self, scheduler):
+        """Add the training tasks and join the forked flownodes in a tree.
+
+        Whenever two flownodes with the same level in the join tree are
+        available in the TreeTrainResultContainer of the scheduler they are
+        joined by a FlowJoinCallable task. So the joins run in parallel to
+        the training and not all forks have to be kept in memory.
+        """
+        result_container = scheduler.result_container
+        join_callable = FlowJoinCallable()
+        train_callable = None
+        last_callable = None
+        n_tasks = 0
+        while True:
+            if self.task_available:
+                data, task_callable = self.get_task()
+                if task_callable is not None:
+                    train_callable = task_callable
+                elif last_callable is not train_callable:
+                    # a join task has replaced the training callable
+                    task_callable = train_callable
+                scheduler.add_task(data, task_callable)
+                del data
+                last_callable = train_callable
+                n_tasks += 1
+                pairs = result_container.get_pairs()
+            else:
+                pairs = result_container.wait_for_pairs(n_tasks)
+                if not pairs:
+                    break
+            while pairs:
+                if last_callable is not join_callable:
+                    scheduler.add_task(pairs.pop(), join_callable)
+                    last_callable = join_callable
+                else:
+                    scheduler.add_task(pairs.pop())
+                n_tasks += 1
+
     def setup_parallel_training(self, data_iterables,
                                 train_callable_class=FlowTrainCallable):
         """Prepare the flow for handing out tasks to do the training.
@@ -722,6 +884,7 @@ def __init__(self, flow, verbose=False, **kwargs):
     def train(self, data_iterables, checkpoints, scheduler=None,
               train_callable_class=FlowTrainCallable,
               overwrite_result_container=True,
+              tree_join=False,
               **kwargs):
         """Train all trainable nodes in the flow.
 
@@ -733,6 +896,7 @@ def train(self, data_iterables, checkpoints, scheduler=None,
                         scheduler=scheduler,
                         train_callable_class=train_callable_class,
                         overwrite_result_container=overwrite_result_container,
+                        tree_join=tree_join,
                         checkpoints=checkpoints,
                         **kwargs)
 
@@ -55,7 +55,7 @@ def _fork(self):
                 forked_nodes.append(node.fork())
             else:
                 forked_nodes.append(node)
-        return self.__class__(forked_nodes)
+        return self.__class__(forked_nodes, use_threads=self.use_threads)
 
     def _join(self, forked_node):
         """Join the trained nodes from the forked layer."""
@@ -72,7 +72,8 @@ class ParallelCloneLayer(hinet.CloneLayer, parallelnodes.ParallelExtensionNode):
 
     def _fork(self):
         """Fork the internal node in the clone layer."""
-        return self.__class__(self.node.fork(), n_nodes=len(self.nodes))
+        return self.__class__(self.node.fork(), n_nodes=len(self.nodes),
+                              use_threads=self.use_threads)
 
     def _join(self, forked_node):
         """Join the internal node in the clone layer."""
@@ -164,9 +164,7 @@ def _join_covariance(cov, forked_cov):
         cov -- Instance of CovarianceMatrix, to which the forked_cov instance
             is aded in-place.
         """
-        cov._cov_mtx += forked_cov._cov_mtx
-        cov._avg += forked_cov._avg
-        cov._tlen += forked_cov._tlen
+        cov.merge(forked_cov)
         
 
 ## MDP parallel node implementations ##
@@ -242,11 +240,49 @@ class ParallelHistogramNode(ParallelExtensionNode, mdp.nodes.HistogramNode):
     """Parallel version of the HistogramNode."""
 
     def _fork(self):
-        return self._default_fork()
+        forked_node = self._default_fork()
+        # only this node writes the history file
+        forked_node._hist_filename = None
+        return forked_node
+
+    def _join(self, forked_node):
+        # the forked data is appended to the history buffer (instead of
+        # replacing data_hist), so that a '.npy' history file is kept
+        if self.max_samples is not None:
+            self._join_reservoir(forked_node)
+        elif forked_node.data_hist is not None:
+            self._append_hist(forked_node.data_hist)
+
+    def _join_reservoir(self, forked_node):
+        """Combine the reservoir samples of the two nodes.
+
+        The number of items taken from each reservoir follows the
+        hypergeometric distribution, so that the result is a uniform
+        sample of all the data seen by the two nodes.
+        """
+        if forked_node.data_hist is None:
+            return
+        if self.data_hist is None:
+            self._append_hist(forked_node.data_hist)
+            self._hist_seen = forked_node._hist_seen
+            return
+        seen1, seen2 = self._hist_seen, forked_node._hist_seen
+        n_samples = min(self.max_samples, seen1 + seen2)
+        n1 = numx.random.hypergeometric(seen1, seen2, n_samples)
+        hist1 = numx.random.permutation(self.data_hist)[:n1]
+        hist2 = numx.random.permutation(forked_node.data_hist)[:n_samples-n1]
+        # overwrite the buffer with the combined sample
+        self._hist_len = 0
+        self._append_hist(numx.concatenate([hist1, hist2]))
+        self._hist_seen = seen1 + seen2
+
+
+class ParallelAdaptiveCutoffNode(ParallelHistogramNode,
+                                 mdp.nodes.AdaptiveCutoffNode):
+    """Parallel version of the AdaptiveCutoffNode."""
 
     def _join(self, forked_node):
-        if (self.data_hist is not None) and (forked_node.data_hist is not None):
-            self.data_hist = numx.concatenate([self.data_hist,
-                                            forked_node.data_hist])
-        elif forked_node.data_hist != None:
-            self.data_hist = forked_node.data_hist
+        if self._sketch is not None:
+            self._sketch.merge(forked_node._sketch)
+        else:
+            super(ParallelAdaptiveCutoffNode, self)._join(forked_node)
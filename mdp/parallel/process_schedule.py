@@ -2,12 +2,6 @@
 Process based scheduler for distribution across multiple CPU cores.
 """
 
-# TODO: use a queue instead of sleep?
-#    http://docs.python.org/library/queue.html
-
-# TODO: use shared memory for data numpy arrays, but this also requires the
-#    use of multiprocessing since the ctype objects can't be pickled
-
 # TODO: only return result when get_results is called,
 #    this sends a special request to the processes to send their data,
 #    we would have to add support for this to the callable,
@@ -23,9 +17,10 @@
 import cPickle as pickle
 import threading
 import subprocess
-import time
+import tempfile
 import traceback
 import warnings
+import Queue
 
 if __name__ == "__main__":
     # try to make sure that mdp can be imported by adding it to sys.path
@@ -39,16 +34,112 @@
     warnings.filterwarnings("ignore", ".*")
 
 import mdp
+from mdp import numx
 from mdp.parallel import Scheduler, cpu_count
 
-SLEEP_TIME = 0.1  # time spend sleeping when waiting for a free process
+# arrays smaller than this (in bytes) are always pickled through the pipe
+SHM_MIN_NBYTES = 2**16
+# tag for the persistent ids of arrays transferred via shared memory
+_SHM_ARRAY_TAG = "mdp_shm_array"
+
+
+def _default_shared_memory_dir():
+    """Return the directory used for the shared memory array files.
+
+    On Linux /dev/shm is used (so the files never hit the disk), otherwise
+    the default temporary directory.
+    """
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def _dump(obj, file, shared_memory_dir=None):
+    """Pickle obj to file and return the list of created array files.
+
+    If shared_memory_dir is given then all large numpy arrays in obj are
+    written to memory mapped files in this directory and only a descriptor
+    of the file is pickled. The caller is responsible for removing the
+    files when they are no longer needed.
+    """
+    pickler = pickle.Pickler(file, -1)
+    filenames = []
+    if shared_memory_dir is not None:
+        def persistent_id(obj):
+            # subclasses like matrix or masked arrays are pickled as usual,
+            # since a memory mapped file would only restore a plain array
+            if (type(obj) is not numx.ndarray or
+                obj.nbytes < SHM_MIN_NBYTES or obj.dtype.hasobject):
+                return None
+            if obj.flags.f_contiguous and not obj.flags.c_contiguous:
+                order = "F"
+            else:
+                order = "C"
+            fd, filename = tempfile.mkstemp(prefix="mdp_shm_",
+                                            dir=shared_memory_dir)
+            os.close(fd)
+            filenames.append(filename)
+            array = numx.memmap(filename, dtype=obj.dtype, mode="w+",
+                                shape=obj.shape, order=order)
+            array[...] = obj
+            array.flush()
+            del array
+            # the dtype itself is pickled, dtype.str would lose the fields
+            # of structured dtypes
+            return (_SHM_ARRAY_TAG, filename, obj.dtype, obj.shape, order)
+        pickler.persistent_id = persistent_id
+    pickler.dump(obj)
+    file.flush()
+    return filenames
+
+
+def _load(file, copy=False):
+    """Unpickle an object from file, as written by _dump.
+
+    Arrays that were transferred via shared memory are mapped copy-on-write,
+    so they can be modified without affecting the file. If copy is True
+    then the arrays are loaded into normal memory instead, so the files can
+    be safely removed afterwards.
+
+    Returns the object and the list of array files that were used.
+    """
+    unpickler = pickle.Unpickler(file)
+    filenames = []
+    def persistent_load(pid):
+        tag, filename, dtype, shape, order = pid
+        if tag != _SHM_ARRAY_TAG:
+            raise pickle.UnpicklingError("unknown persistent id: %s" % tag)
+        filenames.append(filename)
+        array = numx.memmap(filename, dtype=dtype, mode="c",
+                            shape=shape, order=order)
+        if copy:
+            return numx.array(array, order=order)
+        # plain array view, keeps the file mapped as long as it is alive
+        return array.view(numx.ndarray)
+    unpickler.persistent_load = persistent_load
+    return unpickler.load(), filenames
+
+
+def _remove_files(filenames):
+    """Remove the given files, ignore files that are already gone."""
+    for filename in filenames:
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
 
 
 class ProcessScheduler(Scheduler):
     """Scheduler that distributes the task to multiple processes.
 
     The subprocess module is used to start the requested number of processes.
-    The execution of each task is internally managed by dedicated thread.
+    Each process is managed by a dedicated thread, which receives the tasks
+    via a queue.
+
+    With the shared_memory option the numpy arrays in the task data and in
+    the results are not pickled through the pipes but written to memory
+    mapped files, so only a small descriptor is sent to the process. This is
+    much faster for large data chunks.
 
     This scheduler should work on all platforms (at least on Linux,
     Windows XP and Vista).
@@ -56,7 +147,8 @@ class ProcessScheduler(Scheduler):
 
     def __init__(self, result_container=None, verbose=False, n_processes=1,
                  source_paths=None, python_executable=None,
-                 cache_callable=True):
+                 cache_callable=True, shared_memory=False,
+                 shared_memory_dir=None):
         """Initialize the scheduler and start the slave processes.
 
         result_container -- ResultContainer used to store the results.
@@ -76,6 +168,13 @@ def __init__(self, result_container=None, verbose=False, n_processes=1,
             is True). Disabling caching can reduce the memory usage, but will
             generally be less efficient since the task_callable has to be
             pickled each time.
+        shared_memory -- If True then numpy arrays in the task data and in
+            the results (larger than SHM_MIN_NBYTES) are transferred via
+            memory mapped files instead of being pickled through the pipes
+            (default is False).
+        shared_memory_dir -- Directory for the memory mapped files. If None
+            (default value) then /dev/shm is used if available, otherwise
+            the default temporary directory.
         """
         super(ProcessScheduler, self).__init__(
                                         result_container=result_container,
@@ -85,6 +184,12 @@ def __init__(self, result_container=None, verbose=False, n_processes=1,
         else:
             self._n_processes = cpu_count()
         self._cache_callable = cache_callable
+        if shared_memory:
+            if shared_memory_dir is None:
+                shared_memory_dir = _default_shared_memory_dir()
+            self._shared_memory_dir = shared_memory_dir
+        else:
+            self._shared_memory_dir = None
         if python_executable is None:
             python_executable = sys.executable
         # get the location of this module to start the processes
@@ -96,21 +201,33 @@ def __init__(self, result_container=None, verbose=False, n_processes=1,
         #    copy_reg.
         process_args = [python_executable, "-u", module_file]
         process_args.append(str(self._cache_callable))
+        process_args.append(str(self._shared_memory_dir))
         if isinstance(source_paths, str):
             source_paths = [source_paths]
         if source_paths is None:
             source_paths = sys.path
         process_args += source_paths
-        # list of processes not in use, start the processes now
-        self._free_processes = [subprocess.Popen(args=process_args,
-                                                 stdout=subprocess.PIPE,
-                                                 stdin=subprocess.PIPE)
-                                for _ in range(self._n_processes)]
-        # tag each process with its cached callable task_index,
-        # this is compared with _last_callable_index to check if the cached
-        # task_callable is still up to date
-        for process in self._free_processes:
+        # condition to wait for a free process, uses the scheduler lock
+        self._process_available = threading.Condition(self._lock)
+        self._n_free_processes = self._n_processes
+        self._task_queue = Queue.Queue()
+        # start the processes now, each one is managed by its own thread
+        self._processes = []
+        self._threads = []
+        for _ in range(self._n_processes):
+            process = subprocess.Popen(args=process_args,
+                                       stdout=subprocess.PIPE,
+                                       stdin=subprocess.PIPE)
+            # tag each process with its cached callable task_index,
+            # this is compared with _last_callable_index to check if the
+            # cached task_callable is still up to date
             process._callable_index = -1
+            thread = threading.Thread(target=self._process_thread,
+                                      args=(process,))
+            thread.daemon = True
+            thread.start()
+            self._processes.append(process)
+            self._threads.append(thread)
         if self.verbose:
             print ("scheduler initialized with %d processes" %
                    self._n_processes)
@@ -121,76 +238,88 @@ def _shutdown(self):
         If a process is still running a task then an exception is raised.
         """
         self._lock.acquire()
-        if len(self._free_processes) < self._n_processes:
-            raise Exception("some slave process is still working")
-        for process in self._free_processes:
-            pickle.dump("EXIT", process.stdin)
-            process.stdin.flush()
-        self._lock.release()
+        try:
+            if self._n_free_processes < self._n_processes:
+                raise Exception("some slave process is still working")
+            for _ in self._threads:
+                self._task_queue.put(None)
+        finally:
+            self._lock.release()
+        for thread in self._threads:
+            thread.join()
         if self.verbose:
             print "scheduler shutdown"
 
     def _process_task(self, data, task_callable, task_index):
         """Add a task, if possible without blocking.
 
-        It blocks when the system is not able to start a new thread
-        or when the processes are all in use.
+        It blocks when the processes are all in use, until one of them
+        becomes available.
         """
-        task_started = False
-        while not task_started:
-            if not len(self._free_processes):
-                # release lock for other threads and wait
-                self._lock.release()
-                time.sleep(SLEEP_TIME)
-                self._lock.acquire()
-            else:
-                try:
-                    process = self._free_processes.pop()
-                    self._lock.release()
-                    thread = threading.Thread(target=self._task_thread,
-                                              args=(process, data,
-                                                    task_callable, task_index))
-                    thread.start()
-                    task_started = True
-                except thread.error:
-                    if self.verbose:
-                        print ("unable to create new task thread,"
-                               " waiting 2 seconds...")
-                    time.sleep(2)
-
-    def _task_thread(self, process, data, task_callable, task_index):
-        """Thread function which cares for a single task.
-
-        The task is pushed to the process via stdin, then we wait for the
-        result on stdout, pass the result to the result container, free
-        the process and exit.
+        while not self._n_free_processes:
+            # releases the lock while waiting
+            self._process_available.wait()
+        self._n_free_processes -= 1
+        self._lock.release()
+        self._task_queue.put((data, task_callable, task_index))
+
+    def _process_thread(self, process):
+        """Thread function which cares for a single process.
+
+        The tasks are taken from the queue and pushed to the process via
+        stdin, then we wait for the result on stdout, pass the result to the
+        result container and wait for the next task.
         """
-        try:
-            if self._cache_callable:
-                # check if the cached callable is up to date
-                if process._callable_index < self._last_callable_index:
-                    process._callable_index = self._last_callable_index
-                else:
-                    task_callable = None
-            # push the task to the process
-            pickle.dump((data, task_callable, task_index),
-                        process.stdin, protocol=-1)
-            process.stdin.flush()
-            # wait for result to arrive
-            result = pickle.load(process.stdout)
-        except:
-            traceback.print_exc()
-            self._free_processes.append(process)
-            sys.exit("failed to execute task %d in process:" % task_index)
-        # store the result and clean up
-        self._store_result(result, task_index)
-        self._free_processes.append(process)
+        while True:
+            task = self._task_queue.get()
+            if task is None:
+                pickle.dump("EXIT", process.stdin)
+                process.stdin.flush()
+                return
+            data, task_callable, task_index = task
+            del task
+            filenames = []
+            try:
+                if self._cache_callable:
+                    # check if the cached callable is up to date
+                    if process._callable_index < self._last_callable_index:
+                        process._callable_index = self._last_callable_index
+                    else:
+                        task_callable = None
+                # push the task to the process, the data comes separately
+                pickle.dump((task_callable, task_index),
+                            process.stdin, protocol=-1)
+                filenames = _dump(data, process.stdin,
+                                  self._shared_memory_dir)
+                del data
+                # wait for result to arrive
+                result, result_filenames = _load(process.stdout, copy=True)
+                filenames += result_filenames
+            except:
+                traceback.print_exc()
+                self._free_process()
+                sys.exit("failed to execute task %d in process:" % task_index)
+            finally:
+                _remove_files(filenames)
+            # free the process before storing the result, so that all the
+            # processes are free once the last result has been stored
+            self._free_process()
+            self._store_result(result, task_index)
 
+    def _free_process(self):
+        """Mark a process as free and wake up a waiting task."""
+        self._lock.acquire()
+        self._n_free_processes += 1
+        self._process_available.notify()
+        self._lock.release()
 
-def _process_run(cache_callable=True):
+
+def _process_run(cache_callable=True, shared_memory_dir=None):
     """Run this function in a worker process to receive and run tasks.
 
     It waits for tasks on stdin, and sends the results back via stdout.
+    If shared_memory_dir is given then large result arrays are returned via
+    memory mapped files in this directory.
     """
     # use sys.stdout only for pickled objects, everything else goes to stderr
     # NOTE: .buffer is the binary mode interface for stdin and out in py3k
@@ -214,7 +343,8 @@ def _process_run(cache_callable=True):
             if task == "EXIT":
                 exit_loop = True
             else:
-                data, task_callable, task_index = task
+                task_callable, task_index = task
+                data = _load(pickle_in)[0]
                 if task_callable is None:
                     if last_callable is None:
                         err = ("No callable was provided and no cached "
@@ -230,14 +360,15 @@ def _process_run(cache_callable=True):
                     task_callable.setup_environment()
                 result = task_callable(data)
                 del task_callable  # free memory
-                pickle.dump(result, pickle_out, protocol=-1)
-                pickle_out.flush()
+                del data  # release the mapped files
+                _dump(result, pickle_out, shared_memory_dir)
+                del result
         except Exception, exception:
             # return the exception instead of the result
             if task is None:
                 print "unpickling a task caused an exception in a process:"
             else:
-                print "task %d caused exception in process:" % task[2]
+                print "task %d caused exception in process:" % task[1]
             print exception
             traceback.print_exc()
             sys.stdout.flush()
@@ -249,10 +380,16 @@ def _process_run(cache_callable=True):
         cache_callable = True
     else:
         cache_callable = False
-    if len(sys.argv) > 2:
+    # second argument is the shared memory directory
+    if sys.argv[2] == "None":
+        shared_memory_dir = None
+    else:
+        shared_memory_dir = sys.argv[2]
+    if len(sys.argv) > 3:
         # remaining arguments are code paths,
         # put them in front so that they take precedence over PYTHONPATH
-        new_paths = [sys_arg for sys_arg in sys.argv[2:]
+        new_paths = [sys_arg for sys_arg in sys.argv[3:]
                      if sys_arg not in sys.path]
         sys.path = new_paths + sys.path
-    _process_run(cache_callable=cache_callable)
+    _process_run(cache_callable=cache_callable,
+                 shared_memory_dir=shared_memory_dir)
@@ -211,6 +211,8 @@ def __init__(self, result_container=None, verbose=False):
         # count the number of submitted tasks, also used for the task index
         self._task_counter = 0
         self._lock = threading.Lock()
+        # condition to wait for all open tasks to finish
+        self._tasks_finished = threading.Condition(self._lock)
         self._last_callable = None  # last callable is stored
         # task index of the _last_callable, can be *.5 if updated between tasks
         self._last_callable_index = -1.0
@@ -290,6 +292,8 @@ def _store_result(self, result, task_index):
         if self.verbose:
             print "    finished task no. %d" % task_index
         self._n_open_tasks -= 1
+        if self._n_open_tasks == 0:
+            self._tasks_finished.notifyAll()
         self._lock.release()
 
     def get_results(self):
@@ -297,15 +301,14 @@ def get_results(self):
 
         This method blocks if there are open tasks.
         """
-        while True:
-            self._lock.acquire()
-            if self._n_open_tasks == 0:
-                results = self.result_container.get_results()
-                self._lock.release()
-                return results
-            else:
-                self._lock.release()
-                time.sleep(1)
+        self._lock.acquire()
+        try:
+            while self._n_open_tasks:
+                # releases the lock while waiting
+                self._tasks_finished.wait()
+            return self.result_container.get_results()
+        finally:
+            self._lock.release()
 
     def shutdown(self):
         """Controlled shutdown of the scheduler.
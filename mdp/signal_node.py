@@ -5,6 +5,7 @@
 import cPickle as _cPickle
 import warnings as _warnings
 import copy as _copy
+import tempfile as _tempfile
 import inspect
 
 import mdp
@@ -56,7 +57,7 @@ class NodeMetaclass(type):
 
     # methods that can overwrite docs:
     DOC_METHODS = ['_train', '_stop_training', '_execute', '_inverse',
-                   '_label', '_prob']
+                   '_label', '_prob', '_prob_array']
 
     def __new__(cls, classname, bases, members):
         # select private methods that can overwrite the docstring
@@ -224,6 +225,10 @@ class Node(object):
 
     __metaclass__ = NodeMetaclass
 
+    # input signatures which passed the execution checks while the node is
+    # frozen (None if the node is not frozen), see `freeze`
+    _frozen_signatures = None
+
     def __init__(self, input_dim=None, output_dim=None, dtype=None):
         """If the input dimension and the output dimension are
         unspecified, they will be set when the `train` or `execute`
@@ -427,6 +432,63 @@ def is_invertible():
         """Return True if the node can be inverted, False otherwise."""
         return True
 
+    @staticmethod
+    def is_row_independent():
+        """Return True if each row of the execution output only depends on
+        the corresponding row of the input, False otherwise.
+
+        Containers like `mdp.hinet.CloneLayer` can then execute such a node
+        on all their input slices at once.
+        """
+        return False
+
+    def freeze(self):
+        """Freeze the node, whose training must be completed.
+
+        The execution checks (training state, input rank, dimension and
+        dtype) are then only performed once for each input signature, i.e.
+        for each combination of input dtype and shape of the data points.
+        Further calls of `execute` with the same signature directly call
+        `_execute`, which reduces the overhead of small nodes and of
+        networks with many nodes.
+
+        The node must not be modified while it is frozen. Container nodes
+        (like `mdp.hinet.FlowNode` or `mdp.hinet.Layer`) also freeze their
+        internal nodes.
+        """
+        if self.is_training():
+            err_str = ("Only nodes which completed the training phase can "
+                       "be frozen.")
+            raise TrainingException(err_str)
+        if self._frozen_signatures is None:
+            self._frozen_signatures = set()
+
+    def unfreeze(self):
+        """Restore the normal execution checks (see `freeze`)."""
+        self._frozen_signatures = None
+
+    def is_frozen(self):
+        """Return True if the node is frozen (see `freeze`)."""
+        return self._frozen_signatures is not None
+
+    def get_affine_transform(self):
+        """Return a tuple ``(W, b)`` such that ``execute(x)`` is equal to
+        ``mult(x, W) + b``, or None if the execution is not affine.
+
+        The default implementation returns None. Nodes whose execution is
+        an affine map (like `mdp.nodes.PCANode`) overwrite this method, so
+        that `mdp.Flow.compile` can fuse them with their neighbours. The
+        returned arrays must not be modified.
+        """
+        return None
+
+    def get_affine_inverse(self):
+        """Return a tuple ``(W, b)`` such that ``inverse(y)`` is equal to
+        ``mult(y, W) + b``, or None if the inverse is not affine or is not
+        available (see `get_affine_transform`).
+        """
+        return None
+
     ### check functions
     def _check_input(self, x):
         # check input rank
@@ -612,7 +674,16 @@ def execute(self, x, *args, **kwargs):
         their execution phase. The docstring of the `_execute` method
         overwrites this docstring.
         """
+        frozen_signatures = self._frozen_signatures
+        if frozen_signatures is not None:
+            signature = (x.dtype, x.shape[1:])
+            if signature in frozen_signatures and x.shape[0]:
+                if x.dtype != self._dtype:
+                    x = x.astype(self._dtype)
+                return self._execute(x, *args, **kwargs)
         self._pre_execution_checks(x)
+        if frozen_signatures is not None:
+            frozen_signatures.add(signature)
         return self._execute(self._refcast(x), *args, **kwargs)
 
     def inverse(self, y, *args, **kwargs):
@@ -712,6 +783,111 @@ def _set_output_dim(self, n):
         self._output_dim = n
 
 
+class _CumulatorBuffer(object):
+    """Growable array used by the 'buffer' storage of `VariadicCumulator`.
+
+    The capacity of the buffer is doubled whenever it is exhausted, so that
+    appending is amortized O(1) and no second copy of the collected data is
+    needed at the end of training. Once the buffer exceeds ``ram_limit``
+    bytes it is moved to a memory-mapped temporary file in ``spill_dir``.
+    """
+
+    # minimum number of rows allocated
+    min_capacity = 64
+
+    def __init__(self, ram_limit=None, spill_dir=None):
+        self.ram_limit = ram_limit
+        self.spill_dir = spill_dir
+        self.length = 0
+        self._array = None
+        self._file = None
+
+    def append(self, x):
+        """Append the rows of x to the buffer."""
+        x = numx.asarray(x)
+        if self._array is None:
+            self._allocate(max(self.min_capacity, x.shape[0]),
+                           x.shape[1:], x.dtype)
+        elif x.shape[1:] != self._array.shape[1:]:
+            err = ("Cumulator Error: inconsistent shape of the collected "
+                   "data (%s != %s)" % (str(x.shape[1:]),
+                                        str(self._array.shape[1:])))
+            raise mdp.MDPException(err)
+        dtype = numx.promote_types(self._array.dtype, x.dtype)
+        new_length = self.length + x.shape[0]
+        if new_length > self._array.shape[0] or dtype != self._array.dtype:
+            capacity = self._array.shape[0]
+            while capacity < new_length:
+                capacity *= 2
+            self._resize(capacity, dtype)
+        self._array[self.length:new_length] = x
+        self.length = new_length
+
+    def get(self):
+        """Return the collected data as an array.
+
+        The buffer must not be used anymore afterwards.
+        """
+        if self._array is None:
+            return numx.array([])
+        if self._file is None:
+            # shrink the buffer in place
+            self._array.resize((self.length,) + self._array.shape[1:],
+                               refcheck=False)
+            return self._array
+        return self._array[:self.length].view(numx.ndarray)
+
+    def _nbytes(self, capacity, tail_shape, dtype):
+        return capacity * int(numx.prod(tail_shape)) * dtype.itemsize
+
+    def _use_memmap(self, capacity, tail_shape, dtype):
+        return (self.ram_limit is not None and
+                self._nbytes(capacity, tail_shape, dtype) > self.ram_limit)
+
+    def _allocate(self, capacity, tail_shape, dtype):
+        shape = (capacity,) + tail_shape
+        if self._use_memmap(capacity, tail_shape, dtype):
+            # the file is deleted as soon as it is closed and unmapped
+            self._file = _tempfile.TemporaryFile(prefix='mdp_cumulator_',
+                                                 dir=self.spill_dir)
+            self._file.truncate(self._nbytes(capacity, tail_shape, dtype))
+            self._array = numx.memmap(self._file, dtype=dtype,
+                                      mode='r+', shape=shape)
+        else:
+            self._array = numx.empty(shape, dtype=dtype)
+
+    def _resize(self, capacity, dtype):
+        old_array = self._array
+        tail_shape = old_array.shape[1:]
+        if self._file is not None and dtype == old_array.dtype:
+            # extend the file, the collected data stays in place
+            old_array.flush()
+            self._file.truncate(self._nbytes(capacity, tail_shape, dtype))
+            self._array = numx.memmap(self._file, dtype=dtype, mode='r+',
+                                      shape=(capacity,) + tail_shape)
+            return
+        if (self._file is None and dtype == old_array.dtype and
+            not self._use_memmap(capacity, tail_shape, dtype)):
+            # let the allocator grow the array in place if possible
+            old_array.resize((capacity,) + tail_shape, refcheck=False)
+            return
+        old_file = self._file
+        self._file = None
+        self._allocate(capacity, tail_shape, dtype)
+        self._array[:self.length] = old_array[:self.length]
+        del old_array
+        if old_file is not None:
+            old_file.close()
+
+    def __getstate__(self):
+        # the temporary file can not be pickled, store the data instead
+        state = self.__dict__.copy()
+        if self._array is not None:
+            state['_array'] = numx.array(self._array[:self.length])
+        state['_file'] = None
+        return state
+
+
 def VariadicCumulator(*fields):
     """A VariadicCumulator is a `Node` whose training phase simply collects
     all input data. In this way it is possible to easily implement
@@ -720,6 +896,11 @@ def VariadicCumulator(*fields):
     The data is accessible in the attributes given with the VariadicCumulator's
     constructor after the beginning of the `Node._stop_training` phase.
     ``self.tlen`` contains the number of data points collected.
+
+    By default the data is collected in lists and concatenated at the end
+    of the training, so that two copies of the data are kept in memory for
+    a short time. Use `set_storage` to collect the data in growing arrays
+    instead, which can be moved to memory-mapped files if they become large.
     """
 
     class Cumulator(Node):
@@ -732,6 +913,48 @@ def __init__(self, *args, **kwargs):
                     raise mdp.MDPException(errstr % arg)
                 setattr(self, arg, [])
             self.tlen = 0
+            self._cumulator_storage = 'list'
+            self._cumulator_ram_limit = None
+            self._cumulator_spill_dir = None
+
+        def set_storage(self, storage='list', ram_limit=None,
+                        spill_dir=None):
+            """Set how the training data is collected.
+
+            This method must be called before the training begins.
+
+            :Parameters:
+              storage
+                'list' (default) collects the data chunks in lists and
+                concatenates them at the end of the training.
+                'buffer' copies the data chunks in preallocated arrays,
+                whose size is doubled when they are full, so that no
+                second copy of the data is needed at the end of training.
+              ram_limit
+                For the 'buffer' storage only: arrays larger than
+                ``ram_limit`` bytes are moved to memory-mapped temporary
+                files. If None (default) the data is always kept in RAM.
+                With ``ram_limit=0`` the data is always memory-mapped.
+              spill_dir
+                Directory for the memory-mapped files. If None, the
+                default temporary directory is used.
+            """
+            if storage not in ('list', 'buffer'):
+                err = ("Unknown storage '%s', must be either 'list' or "
+                       "'buffer'." % str(storage))
+                raise mdp.MDPException(err)
+            if self._train_phase_started or self.tlen:
+                err = "The storage can only be set before the training."
+                raise TrainingException(err)
+            self._cumulator_storage = storage
+            self._cumulator_ram_limit = ram_limit
+            self._cumulator_spill_dir = spill_dir
+            for field in self._cumulator_fields:
+                if storage == 'list':
+                    setattr(self, field, [])
+                else:
+                    setattr(self, field, _CumulatorBuffer(ram_limit,
+                                                          spill_dir))
 
         def _train(self, *args):
             """Collect all input data in a list."""
@@ -743,7 +966,10 @@ def _stop_training(self, *args, **kwargs):
             """Concatenate the collected data in a single array."""
             for field in self._cumulator_fields:
                 data = getattr(self, field)
-                setattr(self, field, numx.concatenate(data, 0))
+                if isinstance(data, _CumulatorBuffer):
+                    setattr(self, field, data.get())
+                else:
+                    setattr(self, field, numx.concatenate(data, 0))
 
     return Cumulator
 
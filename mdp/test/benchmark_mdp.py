@@ -80,6 +80,19 @@ def polynomial_expansion_benchmark(dim, len, degree, times):
     for i in xrange(times):
         pnode(a)
 
+def flownode_execute_benchmark(n_nodes, len, times, frozen):
+    """    This benchmark executes a FlowNode with 'n_nodes' nodes
+    'times' times on random data of shape (len, 10), to measure the
+    overhead per execute call (the nodes are frozen if 'frozen' is True).
+    Arguments: (n_nodes,len,times,frozen)."""
+    a = numx_rand.random((len, 10))
+    nodes = [mdp.nodes.IdentityNode() for i in xrange(n_nodes)]
+    flownode = mdp.hinet.FlowNode(mdp.Flow(nodes))
+    if frozen:
+        flownode.freeze()
+    for i in xrange(times):
+        flownode(a)
+
 # ISFA benchmark
 
 def _tobias_mix(src):
@@ -209,7 +222,10 @@ def run_benchmarks(bench_funcs, time_digits=15):
 #                   (polynomial_expansion_benchmark, POLY_EXP_ARGS)]
 #else:
 #    BENCH_FUNCS = [(polynomial_expansion_benchmark, POLY_EXP_ARGS)]
+FLOWNODE_EXECUTE_ARGS = [(500, 10, 100, False), (500, 10, 100, True)]
+
 BENCH_FUNCS = [(polynomial_expansion_benchmark, POLY_EXP_ARGS),
+               (flownode_execute_benchmark, FLOWNODE_EXECUTE_ARGS),
                (isfa_spiral_benchmark, [[]]),
                (sfa_benchmark, [[]])]
 
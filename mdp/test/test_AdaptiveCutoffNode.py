@@ -35,3 +35,42 @@ def test_AdaptiveCutoffNode_randomdata():
     node.stop_training()
     node.execute(x)
 
+
+def test_AdaptiveCutoffNode_sketch_smalldata():
+    """Test that the sketch is exact on a small data set."""
+    x1 = numx.array([[0.1, 0.3], [0.3, 0.5], [0.5, 0.7]])
+    x2 = numx.array([[0.4, 0.6], [0.2, 0.4], [0.6, 0.2]])
+    node = mdp.nodes.AdaptiveCutoffNode(lower_cutoff_fraction= 0.2,
+                                        upper_cutoff_fraction=0.4,
+                                        sketch_size=10)
+    node.train(x1)
+    node.train(x2)
+    node.stop_training()
+    assert node.data_hist is None
+    assert numx.all(node.lower_bounds == numx.array([0.2, 0.3]))
+    assert numx.all(node.upper_bounds == numx.array([0.4, 0.5]))
+
+def test_AdaptiveCutoffNode_sketch_randomdata():
+    """Test the approximate cutoff values of the sketch on random data."""
+    node = mdp.nodes.AdaptiveCutoffNode(lower_cutoff_fraction= 0.2,
+                                        upper_cutoff_fraction=0.4,
+                                        sketch_size=200)
+    for i in range(20):
+        node.train(numx_rand.random((1000, 3)))
+    node.stop_training()
+    assert_array_almost_equal(node.lower_bounds, [0.2]*3, 1)
+    assert_array_almost_equal(node.upper_bounds, [0.6]*3, 1)
+    # the sketch size is bounded
+    assert max([len(items) for items in node._sketch._levels]) <= 200
+
+def test_QuantileSketch_merge():
+    x = numx_rand.random((5000, 2))
+    sketch = mdp.utils.QuantileSketch(size=100)
+    for i in range(0, 5000, 1000):
+        forked_sketch = mdp.utils.QuantileSketch(size=100)
+        forked_sketch.update(x[i:i+1000])
+        sketch.merge(forked_sketch)
+    assert sketch.n == 5000
+    ranks = [500, 2500, 4500]
+    quantiles = sketch.quantiles(ranks)
+    assert_array_almost_equal(quantiles, numx.sort(x, axis=0)[ranks], 1)
@@ -131,3 +131,44 @@ def testConvolution2DNode_shape_mismatch():
     filters = numx.random.random((3,5,4))
     node = mdp.nodes.Convolution2DNode(filters, input_shape=(3,2))
     py.test.raises(mdp.NodeException, "node.execute(x)")
+
+@requires_signal
+def testConvolution2DNode_fft_batches():
+    x = numx.random.random((10,17,13))
+    filters = numx.random.random((3,5,4))
+    for mode in ['valid', 'same', 'full']:
+        node_lin = mdp.nodes.Convolution2DNode(filters, approach='linear',
+                                               mode=mode, output_2d=False)
+        y_lin = node_lin.execute(x)
+        # images transformed in small batches
+        node_fft = mdp.nodes.Convolution2DNode(filters, approach='fft',
+                                               mode=mode, output_2d=False,
+                                               max_temp_size=1000)
+        assert_array_almost_equal(node_fft.execute(x), y_lin, 6)
+        node_auto = mdp.nodes.Convolution2DNode(filters, approach='auto',
+                                                mode=mode, output_2d=False)
+        assert_array_almost_equal(node_auto.execute(x), y_lin, 6)
+
+@requires_signal
+def testConvolution2DNode_auto():
+    x = numx.random.random((2,64,64))
+    # small filters are applied directly, large filters with the FFT
+    node = mdp.nodes.Convolution2DNode(numx.random.random((2,2,2)),
+                                       approach='auto')
+    node.execute(x)
+    assert not node._use_fft()
+    node = mdp.nodes.Convolution2DNode(numx.random.random((2,15,15)),
+                                       approach='auto')
+    node.execute(x)
+    assert node._use_fft()
+    # only the linear filtering supports other boundary conditions
+    node = mdp.nodes.Convolution2DNode(numx.random.random((2,15,15)),
+                                       approach='auto', boundary='wrap')
+    node.execute(x)
+    assert not node._use_fft()
+
+@requires_signal
+def testConvolution2DNode_fast_fft_size():
+    from mdp.nodes.convolution_nodes import _fast_fft_size
+    for n, size in [(1, 1), (7, 8), (11, 12), (17, 18), (31, 32), (97, 100)]:
+        assert _fast_fft_size(n) == size
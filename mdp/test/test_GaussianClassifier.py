@@ -74,3 +74,60 @@ def distr(size): return normal(0, 1., size=(size)) * std_
     classification = node.label(x)
 
     assert_array_equal(classes, classification)
+
+def testGaussianClassifier_class_probabilities():
+    x = numx_rand.random((300, 3))
+    labels = numx.arange(300) % 3
+    x[labels == 1] += 2.
+    # small chunks of rows
+    node = mdp.nodes.GaussianClassifier(max_temp_size=20)
+    node.train(x, labels)
+    node.stop_training()
+    # reference computation with the inverse covariance matrices
+    prob = numx.zeros((x.shape[0], 3))
+    for i in xrange(3):
+        x_mn = x - node.means[i]
+        exponent = -0.5 * (mult(x_mn, node.inv_covs[i])*x_mn).sum(axis=1)
+        det = numx.linalg.det(utils.inv(node.inv_covs[i]))
+        gauss = (2.*numx.pi)**(-1.5) * numx.exp(exponent) / numx.sqrt(det)
+        assert_array_almost_equal(node._gaussian_prob(x, i), gauss, decimal)
+        prob[:, i] = node.p[i] * gauss
+    prob /= prob.sum(axis=1)[:, numx.newaxis]
+    assert_array_almost_equal(node.class_probabilities(x), prob, decimal)
+    assert_array_equal(node.label(x), [node.labels[i]
+                                       for i in prob.argmax(axis=1)])
+
+def testGaussianClassifier_high_dimension():
+    # the determinants of the covariance matrices underflow
+    dim = 400
+    x1 = normal(0., 0.1, size=(2000, dim))
+    x2 = normal(0., 0.1, size=(2000, dim)) + 0.2
+    node = mdp.nodes.GaussianClassifier()
+    node.train(x1, 1)
+    node.train(x2, 2)
+    node.stop_training()
+    prob = node.class_probabilities(x1[:10])
+    assert numx.all(numx.isfinite(prob))
+    assert_array_equal(node.label(x1[:10]), [1]*10)
+    assert_array_equal(node.label(x2[:10]), [2]*10)
+
+def testGaussianClassifier_old_state():
+    """Test that a trained node pickled without the whitening matrices
+    can be restored."""
+    x = numx_rand.random((300, 3))
+    labels = numx.arange(300) % 3
+    x[labels == 1] += 2.
+    node = mdp.nodes.GaussianClassifier()
+    node.train(x, labels)
+    node.stop_training()
+    state = node.__dict__.copy()
+    for key in ['max_temp_size', 'log_dets', '_whitening',
+                '_whitened_means', '_log_consts']:
+        del state[key]
+    old_node = mdp.nodes.GaussianClassifier.__new__(
+                                                mdp.nodes.GaussianClassifier)
+    old_node.__setstate__(state)
+    assert old_node.max_temp_size == 2**22
+    assert_array_almost_equal(old_node.log_dets, node.log_dets, decimal)
+    assert_array_almost_equal(old_node.class_probabilities(x),
+                              node.class_probabilities(x), decimal)
@@ -53,3 +53,62 @@ def test_GrowingNeuralGasNode():
     assert_equal(dists[0],1.)
     assert_array_equal(nodes[0].data.pos,numx.asarray([2,0]))
 
+
+def test_GrowingNeuralGasNode_array_engine():
+    # the 'array' engine must give the same network as the 'graph' engine
+    dim = 3
+    npoints = 2000
+    data = _uniform(-1, 1, [npoints, dim])
+    gngs = []
+    for engine in ("graph", "array"):
+        # the graph engine moves the start positions in place
+        gng = mdp.nodes.GrowingNeuralGasNode(start_poss=[data[0,:].copy(),
+                                                         data[1,:].copy()],
+                                             lambda_=50, max_age=20,
+                                             engine=engine)
+        gng.train(data)
+        gng.stop_training()
+        gngs.append(gng)
+    assert_array_almost_equal(gngs[0].get_nodes_position(),
+                              gngs[1].get_nodes_position())
+    # compare the edges of the graph view
+    def _edges(gng):
+        nodes = gng.graph.nodes
+        return sorted([(nodes.index(e.head), nodes.index(e.tail), e.data.age)
+                       for e in gng.graph.edges])
+    assert_equal(_edges(gngs[0]), _edges(gngs[1]))
+    errors = [[n.data.cum_error for n in gng.graph.nodes] for gng in gngs]
+    assert_array_almost_equal(errors[0], errors[1])
+    # nearest_neighbor returns the nodes of the graph view
+    x = _uniform(-1, 1, [10, dim])
+    results = [gng.nearest_neighbor(x) for gng in gngs]
+    for (nodes0, dists0), (nodes1, dists1) in zip(results[:1], results[1:]):
+        assert_array_almost_equal(dists0, dists1)
+        for n0, n1 in zip(nodes0, nodes1):
+            assert_array_almost_equal(n0.data.pos, n1.data.pos)
+
+def test_GrowingNeuralGasNode_array_engine_random_start():
+    data = _uniform(-1, 1, [500, 2])
+    gng = mdp.nodes.GrowingNeuralGasNode(lambda_=20, max_nodes=10,
+                                         engine="array")
+    gng.train(data)
+    gng.stop_training()
+    assert_equal(len(gng.graph.nodes), gng.get_nodes_position().shape[0])
+    assert gng.get_nodes_position().shape[0] <= 10
+
+def test_GrowingNeuralGasNode_old_state():
+    """Test that a state with the graph in the __dict__ can be restored."""
+    data = _uniform(-1, 1, [100, 2])
+    gng = mdp.nodes.GrowingNeuralGasNode(lambda_=20, max_nodes=5)
+    gng.train(data)
+    gng.stop_training()
+    state = gng.__dict__.copy()
+    del state['engine']
+    state['graph'] = state.pop('_graph')
+    old_gng = mdp.nodes.GrowingNeuralGasNode.__new__(
+                                            mdp.nodes.GrowingNeuralGasNode)
+    old_gng.__setstate__(state)
+    assert old_gng.engine == "graph"
+    assert old_gng.graph is gng.graph
+    assert_array_equal(old_gng.get_nodes_position(),
+                       gng.get_nodes_position())
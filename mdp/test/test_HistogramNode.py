@@ -1,3 +1,7 @@
+import os
+import shutil
+import tempfile
+
 from _tools import *
 
 def testHistogramNode_nofraction():
@@ -18,3 +22,62 @@ def testHistogramNode_fraction():
     node.train(x1)
     node.train(x2)
     assert len(node.data_hist) < 1000
+
+def testHistogramNode_buffer():
+    """Test that the history buffer grows over many chunks."""
+    node = mdp.nodes.HistogramNode()
+    x = numx_rand.random((1000, 3))
+    for i in range(0, 1000, 30):
+        node.train(x[i:i+30])
+    assert_array_equal(node.data_hist, x)
+    assert len(node._hist) < 2000
+
+def testHistogramNode_max_samples():
+    """Test HistogramNode with reservoir sampling."""
+    node = mdp.nodes.HistogramNode(max_samples=100)
+    x = numx.arange(10000, dtype="d").reshape((5000, 2))
+    node.train(x[:50])
+    assert_array_equal(node.data_hist, x[:50])
+    for i in range(50, 5000, 300):
+        node.train(x[i:i+300])
+    assert len(node.data_hist) == 100
+    assert len(node._hist) == 100
+    # the sample is a subset of the data without duplicates
+    rows = node.data_hist[:, 0].astype("l") // 2
+    assert len(numx.unique(rows)) == 100
+    assert_array_equal(node.data_hist, x[rows])
+    # the sample should cover the whole data
+    assert rows.min() < 1000 and rows.max() > 4000
+
+def testHistogramNode_npy_file():
+    """Test that the history is written to a .npy file."""
+    dirname = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(dirname, "hist.npy")
+        node = mdp.nodes.HistogramNode(hist_filename=filename)
+        x = numx_rand.random((500, 3))
+        for i in range(0, 500, 100):
+            node.train(x[i:i+100])
+        assert_array_equal(node.data_hist, x)
+        node.stop_training()
+        assert node.data_hist is None
+        assert_array_equal(numx.load(filename), x)
+    finally:
+        shutil.rmtree(dirname)
+
+def testHistogramNode_old_state():
+    """Test that a state with data_hist in the __dict__ can be restored."""
+    node = mdp.nodes.HistogramNode()
+    node.train(numx_rand.random((10, 3)))
+    node.stop_training()
+    state = node.__dict__.copy()
+    for key in ['_hist', '_hist_len', '_hist_seen', '_hist_file',
+                '_hist_offset', 'max_samples']:
+        del state[key]
+    x = numx_rand.random((20, 3))
+    state['data_hist'] = x
+    old_node = mdp.nodes.HistogramNode.__new__(mdp.nodes.HistogramNode)
+    old_node.__setstate__(state)
+    assert_array_equal(old_node.data_hist, x)
+    assert old_node.max_samples is None
+    assert_array_equal(old_node.copy().data_hist, x)
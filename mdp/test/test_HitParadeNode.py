@@ -53,3 +53,28 @@ def testOneDimensionalHitParade():
     assert_array_equal(ind_maxima,[110,103,0,10,50])
     assert_array_equal(minima,[-3.1,-3,-1.5,-1.4,-1.3])
     assert_array_equal(ind_minima,[123,130,1,11,51])
+
+def testHitParade_chunked_update():
+    # the chunked update must give the same results as inserting all the
+    # items one by one
+    signal = numx.cumsum(normal(0., 1., (5000, 4)), axis=0)
+    indices = numx.arange(5000)
+    for n, gap in [(1, 1), (5, 3), (20, 50)]:
+        hit = mdp.nodes.HitParadeNode(n, gap)
+        hit.train(signal[:2000])
+        hit.train(signal[2000:])
+        maxima, max_ind = hit.get_maxima()
+        minima, min_ind = hit.get_minima()
+        for c in range(signal.shape[1]):
+            ref = mdp.nodes._OneDimensionalHitParade(n, gap)
+            ref._update(signal[:, c], indices)
+            ref_maxima, ref_max_ind = ref.get_maxima()
+            ref_minima, ref_min_ind = ref.get_minima()
+            assert_array_equal(maxima[:, c], ref_maxima)
+            assert_array_equal(max_ind[:, c], ref_max_ind)
+            assert_array_equal(minima[:, c], ref_minima)
+            assert_array_equal(min_ind[:, c], ref_min_ind)
+            one_dim = mdp.nodes._OneDimensionalHitParade(n, gap)
+            one_dim.update((signal[:, c], indices))
+            assert_array_equal(one_dim.get_maxima()[1], ref_max_ind)
+            assert_array_equal(one_dim.get_minima()[1], ref_min_ind)
@@ -52,3 +52,37 @@ def distr(size): return normal(0, 1., size=(size)) * std_
     node.train(x, classes)
     classification = node.label(x)
     assert_array_equal(classes, classification)
+
+def testKNNClassifier_index():
+    x = normal(0., 1., size=(500, 3))
+    classes = (x[:,0] > 0).astype('i') + 2*(x[:,1] > 0).astype('i')
+    x_test = normal(0., 1., size=(200, 3))
+    labels = []
+    for index, max_dist_size in [("brute", 2**22), ("brute", 1000),
+                                 ("kdtree", 2**22)]:
+        node = mdp.nodes.KNNClassifier(k=5, index=index,
+                                       max_dist_size=max_dist_size)
+        node.train(x, classes)
+        labels.append(node.label(x_test))
+    assert_array_equal(labels[0], labels[1])
+    assert_array_equal(labels[0], labels[2])
+
+def testKNNClassifier_k_larger_than_samples():
+    node = mdp.nodes.KNNClassifier(k=10)
+    node.train(numx.array([[0., 0.], [0., 1.], [5., 5.]]), [1, 1, 2])
+    assert_array_equal(node.label(numx.array([[5., 5.]])), [1])
+
+def testKNNClassifier_wrong_index():
+    py.test.raises(mdp.NodeException, mdp.nodes.KNNClassifier, index="ball")
+
+def testKNNClassifier_prob_array():
+    x = normal(0., 1., size=(500, 3))
+    classes = (x[:,0] > 0).astype('i') + 2*(x[:,1] > 0).astype('i')
+    node = mdp.nodes.KNNClassifier(k=5)
+    node.train(x, classes)
+    x_test = normal(0., 1., size=(50, 3))
+    prob, labels = node.prob_array(x_test)
+    assert_array_almost_equal(prob.sum(1), numx.ones(50))
+    assert_array_equal(labels[prob.argmax(1)], node.label(x_test))
+    assert_array_equal([r[0] for r in node.rank(x_test)],
+                       labels[prob.argmax(1)])
@@ -57,3 +57,15 @@ def distr(size): return normal(0, 1., size=(size)) * std_
     node.train(x, classes)
     classification = node.label(x)
     assert_array_equal(classes, classification)
+
+def testNearestMeanClassifier_prob_array():
+    x = normal(0., 1., size=(500, 3))
+    classes = (x[:,0] > 0).astype('i') + 2*(x[:,1] > 0).astype('i')
+    node = mdp.nodes.NearestMeanClassifier()
+    node.train(x, classes)
+    x_test = normal(0., 1., size=(50, 3))
+    prob, labels = node.prob_array(x_test)
+    assert_array_almost_equal(prob.sum(1), numx.ones(50))
+    assert_array_equal(labels[prob.argmax(1)], node.label(x_test))
+    for r, p in zip(node.rank(x_test), node.prob(x_test)):
+        assert [p[k] for k in r] == sorted(p.values(), reverse=True)
@@ -90,6 +90,19 @@ def testPCANode_range_argument():
     y = node.execute(x, n=5)
     assert y.shape[1] == 5
 
+def testPCANode_pairwise():
+    x = numx.random.random((100,10)) + 1000.
+    node = mdp.nodes.PCANode(pairwise=True)
+    assert node._cov_mtx.pairwise
+    ref_node = mdp.nodes.PCANode()
+    for start in range(0, 100, 10):
+        node.train(x[start:start+10])
+        ref_node.train(x[start:start+10])
+    node.stop_training()
+    ref_node.stop_training()
+    assert_array_almost_equal(node.avg, ref_node.avg)
+    assert_array_almost_equal(node.d, ref_node.d)
+
 def testPCANode_SVD():
     # it should pass atleast the same test as PCANode
     line_x = numx.zeros((1000,2),"d")
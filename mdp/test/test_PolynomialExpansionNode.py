@@ -48,3 +48,17 @@ def test_expansion():
             des = hardcoded_expansion(inp, degree)
             exp = expand.execute(inp)
             assert_array_almost_equal(exp, des, decimal)
+
+def test_expansion_chunks():
+    inp = uniform((50, 4))
+    for degree in xrange(1,4):
+        des = hardcoded_expansion(inp, degree)
+        # chunks of 3 rows
+        expand = mdp.nodes.PolynomialExpansionNode(degree=degree,
+                                                   max_temp_size=3*len(des[0]))
+        exp = expand.execute(inp)
+        assert exp.flags.c_contiguous
+        assert_array_almost_equal(exp, des, decimal)
+        matrix = uniform((des.shape[1], 3))
+        assert_array_almost_equal(expand.project(inp, matrix),
+                                  mult(des, matrix), decimal)
@@ -54,3 +54,46 @@ def scalar_to_covs(x, n):
     rbf = mdp.nodes.RBFExpansionNode(centers, sizes)
     check_mn_cov(rbf, sizes)
 
+
+def testRBFExpansionNode_chunks():
+    # compare with a direct computation of the RBFs, using small chunks
+    dim, n = 3, 7
+    centers = numx_rand.random((n, dim))
+    x = numx_rand.random((50, dim))
+    iso_sizes = 0.3 + numx_rand.random(n)*0.2
+    aniso_sizes = [mdp.utils.symrand(numx.array([0.2, 0.3, 0.4]))
+                   for i in xrange(n)]
+    for sizes in (iso_sizes, aniso_sizes):
+        rbf = mdp.nodes.RBFExpansionNode(centers, sizes, max_temp_size=40)
+        y = rbf(x)
+        for i in xrange(n):
+            dist = x - centers[i, :]
+            if numx.isscalar(sizes[i]):
+                tmp = (dist**2.).sum(axis=1) / sizes[i]
+            else:
+                tmp = (dist*mdp.utils.mult(dist,
+                                           mdp.utils.inv(sizes[i]))).sum(1)
+            assert_array_almost_equal(y[:, i], numx.exp(-0.5*tmp))
+        # the chunk size does not change the result
+        rbf.max_temp_size = 2**22
+        assert_array_almost_equal(rbf(x), y)
+
+def testRBFExpansionNode_old_state():
+    # a node pickled before the expansion terms were precomputed
+    dim, n = 3, 7
+    centers = numx_rand.random((n, dim))
+    x = numx_rand.random((50, dim))
+    iso_sizes = 0.3 + numx_rand.random(n)*0.2
+    aniso_sizes = [mdp.utils.symrand(numx.array([0.2, 0.3, 0.4]))
+                   for i in xrange(n)]
+    for sizes in (iso_sizes, aniso_sizes):
+        rbf = mdp.nodes.RBFExpansionNode(centers, sizes)
+        state = rbf.__dict__.copy()
+        for key in ['max_temp_size', '_inv_sizes', '_lin_terms',
+                    '_const_terms', '_stacked_sizes']:
+            state.pop(key, None)
+        old_rbf = mdp.nodes.RBFExpansionNode.__new__(
+                                                mdp.nodes.RBFExpansionNode)
+        old_rbf.__setstate__(state)
+        assert old_rbf.max_temp_size == 2**22
+        assert_array_almost_equal(old_rbf(x), rbf(x))
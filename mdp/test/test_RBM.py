@@ -223,3 +223,41 @@ def test_RBMWithLabelsNode():
     nzeros = idxzeros.sum()
     point5 = numx.zeros((nzeros, L)) + 0.5
     assert_array_almost_equal(pl[idxzeros], point5, 2)
+
+def test_RBM_minibatches():
+    I, J = 6, 3
+    v = numx_rand.randint(0, 2, (100, I)).astype('d')
+    # one call with minibatches is equivalent to one call per minibatch
+    numx_rand.seed(1)
+    bm1 = mdp.nodes.RBMNode(J, I)
+    for start in xrange(0, 100, 30):
+        bm1.train(v[start:start+30], momentum=0.5)
+    numx_rand.seed(1)
+    bm2 = mdp.nodes.RBMNode(J, I)
+    bm2.train(v, momentum=0.5, batch_size=30)
+    assert_array_almost_equal(bm1.w, bm2.w)
+    assert_array_almost_equal(bm1.bv, bm2.bv)
+    assert_array_almost_equal(bm1.bh, bm2.bh)
+    assert bm1._train_err == bm2._train_err
+
+def test_RBM_learning_persistent():
+    I, J = 4, 2
+    bm = mdp.nodes.RBMNode(J, I)
+    # the observations consist of two disjunct patterns that
+    # never appear together
+    N = 10000
+    v = numx.zeros((N,I))
+    for n in xrange(N):
+        r = numx_rand.random()
+        if r>0.666: v[n,:] = [0,1,0,1]
+        elif r>0.333: v[n,:] = [1,0,1,0]
+
+    for k in xrange(200):
+        if k%5==0: spinner()
+        bm.train(v, epsilon=0.1, momentum=0.5, batch_size=100,
+                 persistent=True, err_every=10)
+        # the error is computed on a minibatch of 100 observations
+        if bm._train_err/100. < 0.1: break
+
+    assert bm._fantasy_h.shape == (100, J)
+    assert bm._train_err / 100. < 0.1
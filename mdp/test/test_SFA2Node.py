@@ -65,3 +65,20 @@ def test_output_dim_bug():
     sfa.train(mat)
     out = sfa.execute(mat)
     assert out.shape[1] == 3
+
+def test_implicit_expansion():
+    x = numx.random.random((300, 4))
+    sfa2 = mdp.nodes.SFA2Node()
+    # expand in small chunks of rows
+    sfa2._expnode.max_temp_size = 100
+    sfa2.train(x[:150])
+    sfa2.train(x[150:])
+    sfa2.stop_training(debug=True)
+    sfa = mdp.nodes.SFANode()
+    expnode = mdp.nodes.QuadraticExpansionNode()
+    sfa.train(expnode(x[:150]))
+    sfa.train(expnode(x[150:]))
+    sfa.stop_training(debug=True)
+    assert_array_almost_equal(sfa2.cov_mtx, sfa.cov_mtx, decimal)
+    assert_array_almost_equal(sfa2.dcov_mtx, sfa.dcov_mtx, decimal)
+    assert_array_almost_equal(sfa2.d, sfa.d, decimal-3)
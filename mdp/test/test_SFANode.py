@@ -147,3 +147,62 @@ def testSFANode_derivative_bug2D_eigen():
                                         overwrite=False)
     assert_array_almost_equal(eigvalues, sfa.d, decimal)
     assert_array_almost_equal(eigvectors, sfa.sf, decimal)
+
+def testSFANode_train_time_frames():
+    x = numx.random.random((200, 3))
+    for frames_node in [mdp.nodes.TimeFramesNode(4, 2),
+                        mdp.nodes.TimeDelayNode(4, 2)]:
+        for include_last_sample in (True, False):
+            sfa = mdp.nodes.SFANode(include_last_sample=include_last_sample)
+            sfa.train(frames_node.execute(x[:100]))
+            sfa.train(frames_node.execute(x[100:]))
+            sfa.stop_training(debug=True)
+            sfa_frames = mdp.nodes.SFANode(
+                                    include_last_sample=include_last_sample)
+            sfa_frames.train_time_frames(x[:100], frames_node)
+            sfa_frames.train_time_frames(x[100:], frames_node)
+            sfa_frames.stop_training(debug=True)
+            assert_array_almost_equal(sfa.cov_mtx, sfa_frames.cov_mtx)
+            assert_array_almost_equal(sfa.dcov_mtx, sfa_frames.dcov_mtx)
+            assert_array_almost_equal(sfa.d, sfa_frames.d)
+
+def testSFANode_train_expanded():
+    x = numx.random.random((200, 3))
+    # small chunks of rows
+    expansion_node = mdp.nodes.PolynomialExpansionNode(3, max_temp_size=100)
+    for include_last_sample in (True, False):
+        sfa = mdp.nodes.SFANode(include_last_sample=include_last_sample)
+        sfa.train(expansion_node.execute(x[:100]))
+        sfa.train(expansion_node.execute(x[100:]))
+        sfa.stop_training(debug=True)
+        sfa_exp = mdp.nodes.SFANode(include_last_sample=include_last_sample)
+        sfa_exp.train_expanded(x[:100], expansion_node)
+        sfa_exp.train_expanded(x[100:], expansion_node)
+        sfa_exp.stop_training(debug=True)
+        assert_array_almost_equal(sfa.cov_mtx, sfa_exp.cov_mtx)
+        assert_array_almost_equal(sfa.dcov_mtx, sfa_exp.dcov_mtx)
+        assert_array_almost_equal(sfa.d, sfa_exp.d)
+
+def testSFANode_pairwise_float32():
+    # single precision data with a large mean, trained in many chunks
+    dim = 10000
+    freqs = [2*numx.pi*1, 2*numx.pi*5]
+    t = numx.linspace(0, 1, num=dim)
+    mat = numx.array([numx.sin(freqs[0]*t), numx.sin(freqs[1]*t)]).T
+    mat = (mult(mat, uniform((2,2))) + 100.).astype('f')
+    sfa = mdp.nodes.SFANode(dtype='f', pairwise=True)
+    assert sfa._cov_mtx.pairwise and sfa._dcov_mtx.pairwise
+    # reference computed in double precision on the same data
+    sfa_ref = mdp.nodes.SFANode(dtype='d')
+    for start in range(0, dim, 100):
+        sfa.train(mat[start:start+100])
+        sfa_ref.train(mat[start:start+100].astype('d'))
+    sfa.stop_training(debug=True)
+    sfa_ref.stop_training(debug=True)
+    assert sfa.cov_mtx.dtype == numx.dtype('f')
+    assert_array_almost_equal(sfa.avg / sfa_ref.avg, [1., 1.], 5)
+    assert_array_almost_equal(sfa.cov_mtx, sfa_ref.cov_mtx, 4)
+    scale = abs(sfa_ref.dcov_mtx).max()
+    assert_array_almost_equal(sfa.dcov_mtx / scale,
+                              sfa_ref.dcov_mtx / scale, 3)
+    assert_array_almost_equal(sfa.d / sfa_ref.d, [1., 1.], 3)
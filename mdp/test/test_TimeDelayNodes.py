@@ -78,3 +78,27 @@ def test_TimeDelayNodes():
 
     assert_array_equal(real_res, slider_res)
 
+
+def test_TimeDelaySlidingWindowNode_blocks():
+    x = numx_rand.random((50, 3))
+    for time_frames, gap in [(3, 2), (4, 1), (1, 3)]:
+        res = TimeDelayNode(time_frames=time_frames, gap=gap).execute(x)
+        slider = TimeDelaySlidingWindowNode(time_frames=time_frames, gap=gap)
+        # blocks shorter and longer than the buffer
+        blocks = [slider.execute(x[start:stop]) for start, stop in
+                  [(0, 1), (1, 3), (3, 20), (20, 21), (21, 50)]]
+        assert_array_equal(numx.concatenate(blocks), res)
+
+def test_TimeDelaySlidingWindowNode_buffer_state():
+    x = numx_rand.random((30, 2))
+    slider = TimeDelaySlidingWindowNode(time_frames=3, gap=2)
+    slider.execute(x[:13])
+    state = slider.get_buffer_state()
+    res = slider.execute(x[13:])
+    new_slider = TimeDelaySlidingWindowNode(time_frames=3, gap=2)
+    new_slider.execute(x[:1])
+    new_slider.set_buffer_state(state)
+    assert_array_equal(new_slider.execute(x[13:]), res)
+    slider.reset()
+    assert_array_equal(slider.execute(x),
+                       TimeDelayNode(time_frames=3, gap=2).execute(x))
@@ -24,3 +24,32 @@ def test_TimeFramesNode():
 
 def test_TimeFramesNodeBugInputDim():
     mdp.nodes.TimeFramesNode(time_frames=10, gap=1, input_dim=1)
+
+def test_TimeFramesNode_view():
+    inp = numx_rand.random((20, 3))
+    out = mdp.nodes.TimeFramesNode(4, 1).execute(inp)
+    node = mdp.nodes.TimeFramesNode(4, 1, view=True)
+    out_view = node.execute(inp)
+    assert_array_equal(out_view, out)
+    assert not out_view.flags.writeable
+    # with a gap larger than one the frames are copied
+    node = mdp.nodes.TimeFramesNode(4, 2, view=True)
+    assert_array_equal(node.execute(inp),
+                       mdp.nodes.TimeFramesNode(4, 2).execute(inp))
+
+def test_TimeFramesNode_update_covariance():
+    inp = numx_rand.random((50, 3))
+    for node in [mdp.nodes.TimeFramesNode(3, 2),
+                 mdp.nodes.TimeDelayNode(3, 2)]:
+        for pairwise in (False, True):
+            for time_derivative in (False, True):
+                out = node.execute(inp)
+                if time_derivative:
+                    out = out[1:] - out[:-1]
+                cov = mdp.utils.CovarianceMatrix(pairwise=pairwise)
+                cov.update(out)
+                cov_frames = mdp.utils.CovarianceMatrix(pairwise=pairwise)
+                node.update_covariance(inp, cov_frames,
+                                       time_derivative=time_derivative)
+                for res, res_frames in zip(cov.fix(), cov_frames.fix()):
+                    assert_array_almost_equal(res, res_frames)
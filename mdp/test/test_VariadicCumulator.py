@@ -30,3 +30,51 @@ def _stop_training(self, *args, **kwargs):
     for i in range(NREP):
         ab.train(x[i], y[i])
     ab.stop_training()
+
+def _check_storage(**kwargs):
+    ONELEN = 101
+    NREP = 7
+    x = [numx_rand.rand(ONELEN, 3) for _ in range(NREP)]
+    y = [numx_rand.rand(ONELEN, 2) for _ in range(NREP)]
+    ab = mdp.VariadicCumulator('a', 'b')()
+    ab.set_storage('buffer', **kwargs)
+    for i in range(NREP):
+        ab.train(x[i], y[i])
+    # a copy of the node can be made during training
+    ab_copy = ab.copy()
+    ab.stop_training()
+    ab_copy.stop_training()
+    for node in (ab, ab_copy):
+        assert node.tlen == ONELEN*NREP
+        assert type(node.a) is numx.ndarray
+        assert_array_equal(node.a, numx.concatenate(x))
+        assert_array_equal(node.b, numx.concatenate(y))
+
+def test_VariadicCumulator_buffer():
+    _check_storage()
+
+def test_VariadicCumulator_buffer_memmap():
+    # spill data to a memory-mapped file right away
+    _check_storage(ram_limit=0)
+    # or only when the buffer becomes large
+    _check_storage(ram_limit=5000)
+
+def test_VariadicCumulator_set_storage():
+    node = mdp.Cumulator()
+    py.test.raises(mdp.MDPException, node.set_storage, 'foo')
+    node.train(numx_rand.rand(10, 3))
+    py.test.raises(mdp.TrainingException, node.set_storage, 'buffer')
+
+def test_ClassifierCumulator_buffer():
+    x = numx_rand.rand(10, 3)
+    for storage in ('list', 'buffer'):
+        node = mdp.ClassifierCumulator()
+        node.set_storage(storage, ram_limit=0)
+        node.train(x, 1)
+        node.train(x, ['a']*10)
+        node.train(x, numx.arange(10))
+        node.stop_training()
+        assert_array_equal(node.data, numx.concatenate([x]*3))
+        assert node.labels.shape == (30,)
+        assert list(node.labels[:12]) == ['1']*10 + ['a']*2
+        assert node.labels[-1] == '9'
@@ -238,3 +238,107 @@ def test_execute_magic():
         y = node(x)
         y2 = node(x)
         assert_array_equal(y, y2)
+
+
+@requires_joblib
+def test_memory_backend():
+    """Test that the memory backend caches results and counts hits."""
+    global _counter
+    x = mdp.numx.array([[102.]])
+    node = _CounterNode()
+
+    _counter = 0
+    with mdp.caching.cache(backend='memory'):
+        mem_cache = mdp.caching.get_memory_cache()
+        mem_cache.clear()
+        result = node.execute(x)
+        assert _counter == 1
+        assert mem_cache.misses == 1
+        result2 = node.execute(x)
+        assert _counter == 1
+        assert mem_cache.hits == 1
+        assert_array_equal(result, result2)
+        # the cached result is not affected by changes to the returned one
+        result2[0, 0] = -1.
+        assert_array_equal(node.execute(x), result)
+        # different input data
+        node.execute(x + 1.)
+        assert _counter == 2
+    # cache is not active anymore
+    node.execute(x)
+    assert _counter == 3
+
+
+@requires_joblib
+def test_memory_backend_eviction():
+    """Test the least recently used eviction of the memory backend."""
+    global _counter
+    x = mdp.numx.zeros((10, 1))
+    node = _CounterNode()
+
+    _counter = 0
+    # enough space for two results
+    with mdp.caching.cache(backend='memory', memory_limit=2*x.nbytes):
+        mem_cache = mdp.caching.get_memory_cache()
+        mem_cache.clear()
+        node.execute(x)
+        node.execute(x + 1.)
+        assert _counter == 2
+        assert mem_cache.nbytes == 2*x.nbytes
+        # x is now the most recently used result
+        node.execute(x)
+        assert _counter == 2
+        node.execute(x + 2.)
+        assert _counter == 3
+        assert mem_cache.evictions == 1
+        assert len(mem_cache) == 2
+        # x + 1. has been evicted, x has not
+        node.execute(x)
+        assert _counter == 3
+        node.execute(x + 1.)
+        assert _counter == 4
+        # results larger than the limit are not stored
+        big_x = mdp.numx.zeros((100, 1))
+        node.execute(big_x)
+        node.execute(big_x)
+        assert _counter == 6
+        assert mem_cache.nbytes <= 2*x.nbytes
+
+
+@requires_joblib
+def test_memory_backend_instances():
+    """Test the memory backend with caching of a single instance."""
+    global _counter
+    x = mdp.numx.array([[10.]])
+    node = _CounterNode()
+    node2 = _CounterNode()
+
+    _counter = 0
+    with mdp.caching.cache(cache_instances=[node], backend='memory'):
+        node.execute(x)
+        node.execute(x)
+        assert _counter == 1
+        node2.execute(x)
+        node2.execute(x)
+        assert _counter == 3
+
+
+@requires_joblib
+def test_memory_backend_node_state():
+    """Test that the memory backend does not return results for an old
+    state of the node."""
+    global _counter
+    x = mdp.numx.array([[11.]])
+    node = _CounterNode()
+
+    _counter = 0
+    with mdp.caching.cache(backend='memory'):
+        node.execute(x)
+        node.execute(x)
+        assert _counter == 1
+        # the changed node state gives a different cache key
+        node.param = 1
+        node.execute(x)
+        assert _counter == 2
+        node.execute(x)
+        assert _counter == 2
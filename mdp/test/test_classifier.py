@@ -181,3 +181,32 @@ def testKMeansClassifier():
             set(res1) != set(res2)
             ), ("Error in K-Means classifier. "
                 "This might be a bug or just a local minimum.")
+
+def testClassifierNode_prob_array():
+    bc = _BogusClassifier()
+    test_data = numx_rand.random((30, 20)) - 0.5
+    prob, labels = bc.prob_array(test_data)
+    assert prob.shape == (30, 2)
+    assert labels.tolist() == [-1, 1]
+    for p_array, p in zip(prob, bc.prob(test_data)):
+        assert_array_almost_equal(p_array, [p[-1], p[1]])
+
+def testClassifierNode_prob_array_rank():
+    class _ArrayClassifier(ClassifierNode):
+        @staticmethod
+        def is_trainable():
+            return False
+        def _prob_array(self, x):
+            prob = numx.concatenate([_sigmoid(x.sum(1))[:, numx.newaxis],
+                                     numx.zeros((len(x), 1))], axis=1)
+            prob[:, 1] = 1 - prob[:, 0]
+            return prob, numx.array(['a', 'b'])
+    ac = _ArrayClassifier()
+    test_data = numx_rand.random((30, 20)) - 0.5
+    prob = ac.prob(test_data)
+    assert isinstance(prob[0], dict)
+    for r, p in zip(ac.rank(test_data), prob):
+        assert sorted(r) == ['a', 'b']
+        assert p[r[0]] >= p[r[1]]
+    for r, p in zip(ac.rank(test_data, threshold=0.5), prob):
+        assert r == [k for k in p if p[k] > 0.5]
@@ -8,6 +8,10 @@
     "not mdp.config.has_caching",
     "This test requires the 'joblib' module.")
 
+requires_scipy = skip_on_condition(
+    "not mdp.numx_description == 'scipy'",
+    "This test requires 'scipy'")
+
 def _s_shape(theta):
     """
     returns x,y
@@ -195,6 +199,50 @@ def test_HLLENode():
         assert numx.all(res[idx,0]-res[idx[0],0]<1e-2),\
                'Projection should be aligned as original space'
 
+def _assert_same_projection(res, res_sparse):
+    # the projections are only defined up to the sign
+    for i in range(res.shape[1]):
+        sign = numx.sign(mdp.utils.mult(res[:,i], res_sparse[:,i]))
+        assert_array_almost_equal(res[:,i], sign*res_sparse[:,i], 5)
+
+@requires_scipy
+def test_LLENode_sparse():
+    n, k = 50, 2
+    x, y, z, t = _s_shape_1D(n)
+    data = numx.asarray([x,y,z]).T
+    for output_dim in (1, 0.9):
+        for r in (0.001, None):
+            lle = mdp.nodes.LLENode(k, r=r, output_dim=output_dim)
+            lle_sparse = mdp.nodes.LLENode(k, r=r, output_dim=output_dim,
+                                           sparse=True)
+            for node in (lle, lle_sparse):
+                node.train(data)
+                node.stop_training()
+            _assert_same_projection(lle.training_projection,
+                                    lle_sparse.training_projection)
+            assert_array_almost_equal(lle.W, lle_sparse.W.toarray())
+            if r is not None:
+                err = _compare_neighbors(data, lle_sparse.execute(data), k)
+                assert err.max() == 0
+
+@requires_scipy
+def test_HLLENode_sparse():
+    n, k = 250, 4
+    x, y, z, t = _s_shape_1D(n)
+    data = numx.asarray([x,y,z]).T
+    hlle_sparse = mdp.nodes.HLLENode(k, r=0.001, output_dim=1, sparse=True)
+    res_sparse = hlle_sparse(data)
+    err = _compare_neighbors(data, res_sparse, k)
+    assert err.max() == 0
+    # the constant vector is not part of the projection
+    assert abs(hlle_sparse.training_projection.mean()) < 1e-6
+    # the KD-tree of the training data is built once and reused
+    tree = hlle_sparse._tree
+    assert tree is not None
+    hlle_sparse.execute(data[:10])
+    assert hlle_sparse._tree is tree
+    assert hlle_sparse.copy()._tree is None
+
 def test_XSFANode():
     T = 5000
     N = 3
@@ -338,3 +338,54 @@ def testgenerator():
         raise Exception('Expected mdp.FlowException')
     except mdp.FlowException:
         pass
+
+def test_flow_compile():
+    x = uniform((1000, 6))
+    flow = mdp.Flow([mdp.nodes.WhiteningNode(), mdp.nodes.SFANode(),
+                     mdp.nodes.NormalizeNode(),
+                     mdp.nodes.PolynomialExpansionNode(2),
+                     mdp.nodes.PCANode(), mdp.nodes.SFANode()])
+    py.test.raises(mdp.FlowException, flow.compile)
+    flow.train(x)
+    compiled = flow.compile(x)
+    assert len(compiled) == 3
+    assert isinstance(compiled[0], mdp.nodes.AffineNode)
+    assert compiled[1] is flow[3]
+    assert isinstance(compiled[2], mdp.nodes.AffineNode)
+    assert_array_almost_equal(compiled.execute(x), flow.execute(x),
+                              decimal-3)
+    # the first affine node can be inverted
+    y = flow[:3].execute(x)
+    assert compiled[0].is_invertible()
+    assert compiled[2].is_invertible()
+    assert_array_almost_equal(compiled[0].inverse(y), flow[:3].inverse(y),
+                              decimal-3)
+    assert_array_almost_equal(compiled[0].inverse(y), x, decimal-3)
+
+def test_flow_compile_size():
+    # the projection on two components is not fused with the
+    # transformation back to the input space, which would need a larger
+    # matrix
+    x = uniform((100, 6))
+    pca = mdp.nodes.PCANode(output_dim=2)
+    pca.train(x)
+    pca.stop_training()
+    affine = mdp.nodes.AffineNode(uniform((2, 6)))
+    flow = mdp.Flow([pca, affine])
+    compiled = flow.compile(x)
+    assert compiled[0] is pca
+    assert compiled[1] is affine
+    flow = mdp.Flow([pca, affine, mdp.nodes.AffineNode(uniform((6, 3)))])
+    compiled = flow.compile(x)
+    assert len(compiled) == 2
+    assert compiled[0] is pca
+    assert not compiled[1].is_invertible()
+
+def test_flow_compile_float32():
+    # the default tolerances of the check depend on the dtype
+    x = uniform((1000, 10)).astype("f")
+    flow = mdp.Flow([mdp.nodes.PCANode(dtype="f"),
+                     mdp.nodes.SFANode(dtype="f")])
+    flow.train(x)
+    compiled = flow.compile(x)
+    assert compiled.execute(x).dtype == numx.dtype("f")
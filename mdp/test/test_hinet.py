@@ -181,6 +181,66 @@ def test_CloneLayer():
     assert layer.dtype == numx.dtype('f')
     assert y.dtype == layer.dtype
 
+def test_Layer_threads():
+    x = numx_rand.random([100,30])
+    layer = mh.Layer(_pca_nodes([10, 17, 3], [5, 3, 1]))
+    thread_layer = mh.Layer(_pca_nodes([10, 17, 3], [5, 3, 1]),
+                            use_threads=True)
+    layer.train(x)
+    thread_layer.train(x)
+    assert_array_almost_equal(thread_layer.execute(x), layer.execute(x))
+    # nested threaded layers are executed sequentially in the pool threads
+    nested_layer = mh.Layer([thread_layer, layer], use_threads=True)
+    assert_array_almost_equal(
+        nested_layer.execute(numx.concatenate([x, x], axis=1)),
+        numx.concatenate([layer.execute(x)]*2, axis=1))
+
+def test_SameInputLayer_threads():
+    x = numx_rand.random([100,10])
+    layer = mh.SameInputLayer(_pca_nodes([10, 10, 10], [5, 3, 1]))
+    thread_layer = mh.SameInputLayer(_pca_nodes([10, 10, 10], [5, 3, 1]),
+                                     use_threads=True)
+    layer.train(x)
+    thread_layer.train(x)
+    assert_array_almost_equal(thread_layer.execute(x), layer.execute(x))
+
+def test_CloneLayer_threads():
+    x = numx_rand.random([10,70])
+    layer = mh.CloneLayer(mdp.nodes.PCANode(input_dim=10, output_dim=5), 7)
+    thread_layer = mh.CloneLayer(mdp.nodes.PCANode(input_dim=10,
+                                                   output_dim=5), 7,
+                                 use_threads=True)
+    layer.train(x)
+    thread_layer.train(x)
+    mh.set_thread_pool_size(2)
+    assert_array_almost_equal(thread_layer.execute(x), layer.execute(x))
+    mh.set_thread_pool_size()
+    # the single node instance is never used concurrently
+    frames_layer = mh.CloneLayer(mdp.nodes.TimeFramesNode(2, input_dim=10),
+                                 7, use_threads=True)
+    assert not frames_layer._execute_threaded()
+    seq_layer = mh.CloneLayer(mdp.nodes.TimeFramesNode(2, input_dim=10), 7)
+    assert_array_equal(frames_layer.execute(x), seq_layer.execute(x))
+
+def test_CloneLayer_row_independent():
+    x = numx_rand.random([100,30])
+    sfa_node = mdp.nodes.SFANode(input_dim=3, output_dim=2)
+    flownode = mh.FlowNode(mdp.Flow([
+                    mdp.nodes.QuadraticExpansionNode(input_dim=3),
+                    mdp.nodes.IdentityNode(input_dim=9)]))
+    for node in (sfa_node, flownode):
+        layer = mh.CloneLayer(node, 10)
+        assert layer.is_row_independent()
+        if layer.is_trainable():
+            layer.train(x)
+        y = layer.execute(x)
+        # compare with the execution of the single input slices
+        assert_array_almost_equal(mh.Layer._execute.im_func(layer, x), y)
+    assert not mdp.nodes.TimeFramesNode(2).is_row_independent()
+    assert not mh.FlowNode(mdp.Flow([mdp.nodes.IdentityNode(),
+                                     mdp.nodes.NoiseNode()]),
+                           input_dim=3).is_row_independent()
+
 def test_SwitchboardInverse1():
     sboard = mh.Switchboard(input_dim=3,
                             connections=[2,0,1])
@@ -194,6 +254,46 @@ def testSwitchboardInverse2():
                             connections=[2,1,1])
     assert not sboard.is_invertible()
 
+def test_Switchboard_strided_layout():
+    x = numx_rand.random([5, 2*6*8])
+    sboards = [mh.Rectangular2dSwitchboard(in_channels_xy=(6,8),
+                                           field_channels_xy=(2,4),
+                                           field_spacing_xy=(2,2),
+                                           in_channel_dim=2),
+               mh.Rectangular2dSwitchboard(in_channels_xy=(6,8),
+                                           field_channels_xy=(3,3),
+                                           field_spacing_xy=(2,3),
+                                           in_channel_dim=2,
+                                           ignore_cover=True),
+               mh.DoubleRect2dSwitchboard(in_channels_xy=(6,8),
+                                          field_channels_xy=(2,4),
+                                          in_channel_dim=2)]
+    for sboard in sboards:
+        assert sboard._strided_layout is not None
+        # contiguous and non-contiguous input data
+        for x_in in (x, numx.asfortranarray(x), x[::-1, :]):
+            assert_array_equal(sboard.execute(x_in),
+                               x_in[:, sboard.connections])
+    # irregular connections
+    sboard = mh.Switchboard(input_dim=4, connections=[3, 0, 2, 2, 1])
+    assert sboard._strided_layout is None
+    assert_array_equal(sboard.execute(x[:, :4]),
+                       x[:, :4][:, sboard.connections])
+
+def test_Switchboard_reuse_output():
+    sboard = mh.Rectangular2dSwitchboard(in_channels_xy=(4,4),
+                                         field_channels_xy=2,
+                                         field_spacing_xy=2)
+    sboard.reuse_output = True
+    x = numx_rand.random([5, 16])
+    y = sboard.execute(x)
+    assert_array_equal(y, x[:, sboard.connections])
+    y2 = sboard.execute(2*x)
+    assert y2 is y
+    assert_array_equal(y2, 2*x[:, sboard.connections])
+    # a new array is needed for a different number of data points
+    assert sboard.execute(x[:3]) is not y
+
 ## Tests for MeanInverseSwitchboard ##
 
 def test_MeanInverseSwitchboard1():
@@ -14,6 +14,64 @@ def testCovarianceMatrix():
     assert_array_almost_equal(act_avg,des_avg, decimal)
     assert_array_almost_equal(act_cov,des_cov, decimal)
 
+def testCovarianceMatrixPairwise():
+    mat,mix,inp = get_random_mix()
+    des_cov = numx.cov(inp, rowvar=0)
+    des_avg = mean(inp,axis=0)
+    act_cov = utils.CovarianceMatrix(pairwise=True)
+    for chunk in numx.split(inp, 5):
+        act_cov.update(chunk)
+    act_cov,act_avg,act_tlen = act_cov.fix()
+    assert_equal(act_tlen, inp.shape[0])
+    assert_array_almost_equal(act_avg,des_avg, decimal)
+    assert_array_almost_equal(act_cov,des_cov, decimal)
+
+def testCovarianceMatrixPairwiseNoCenter():
+    mat,mix,inp = get_random_mix()
+    ref_cov = utils.CovarianceMatrix()
+    ref_cov.update(inp)
+    des_cov,des_avg,des_tlen = ref_cov.fix(center=False)
+    act_cov = utils.CovarianceMatrix(pairwise=True)
+    for chunk in numx.split(inp, 4):
+        act_cov.update(chunk)
+    act_cov,act_avg,act_tlen = act_cov.fix(center=False)
+    assert_array_almost_equal(act_avg,des_avg, decimal)
+    assert_array_almost_equal(act_cov,des_cov, decimal)
+
+def testCovarianceMatrixPairwiseFloat32():
+    # large offset, the raw second moments lose all precision in float32
+    inp = (uniform((10000,3)) + 1000.).astype('f')
+    des_cov = numx.cov(inp.astype('d'), rowvar=0)
+    act_cov = utils.CovarianceMatrix(pairwise=True)
+    for chunk in numx.split(inp, 10):
+        act_cov.update(chunk)
+    act_cov,act_avg,act_tlen = act_cov.fix()
+    assert_type_equal(act_cov.dtype, 'f')
+    assert_array_almost_equal(act_cov, des_cov, 3)
+
+def testCovarianceMatrixMerge():
+    mat,mix,inp = get_random_mix()
+    for pairwise in [False, True]:
+        des_cov = utils.CovarianceMatrix(pairwise=pairwise)
+        des_cov.update(inp)
+        des_cov,des_avg,des_tlen = des_cov.fix()
+        act_cov = utils.CovarianceMatrix(pairwise=pairwise)
+        for chunk in numx.split(inp, 5):
+            other_cov = utils.CovarianceMatrix(pairwise=pairwise)
+            other_cov.update(chunk)
+            act_cov.merge(other_cov)
+        act_cov,act_avg,act_tlen = act_cov.fix()
+        assert_equal(act_tlen, des_tlen)
+        assert_array_almost_equal(act_avg,des_avg, decimal)
+        assert_array_almost_equal(act_cov,des_cov, decimal)
+
+def testCovarianceMatrixMergeModeMismatch():
+    inp = uniform((10,3))
+    cov = utils.CovarianceMatrix()
+    other_cov = utils.CovarianceMatrix(pairwise=True)
+    other_cov.update(inp)
+    py.test.raises(mdp.MDPException, cov.merge, other_cov)
+
 def testDelayCovarianceMatrix():
     dt = 5
     mat,mix,inp = get_random_mix()
@@ -53,6 +111,15 @@ def testdtypeCovarianceMatrix():
         assert_type_equal(cov.dtype,type)
         assert_type_equal(avg.dtype,type)
 
+def testdtypeCovarianceMatrixPairwise():
+    for type in TESTYPES:
+        mat,mix,inp = get_random_mix(type='d')
+        cov = utils.CovarianceMatrix(dtype=type, pairwise=True)
+        cov.update(inp)
+        cov,avg,tlen = cov.fix()
+        assert_type_equal(cov.dtype,type)
+        assert_type_equal(avg.dtype,type)
+
 def testdtypeDelayCovarianceMatrix():
     for type in TESTYPES:
         dt = 5
@@ -79,3 +79,48 @@ def test_Node_execution_without_training():
     node = BogusMultiNode()
     node.execute(x)
     assert node.visited == [1, 2, 3, 4]
+
+def test_Node_freeze():
+    x = uniform(MAT_DIM)
+    node = mdp.nodes.PCANode()
+    # the training must be completed
+    node.train(x)
+    try:
+        node.freeze()
+        raise Exception('freeze did not fail during training')
+    except mdp.TrainingException:
+        pass
+    node.stop_training()
+    y = node.execute(x)
+    node.freeze()
+    assert node.is_frozen()
+    # the checks are performed once for each input signature
+    assert mdp.numx.all(node.execute(x) == y)
+    assert mdp.numx.all(node.execute(x) == y)
+    assert len(node._frozen_signatures) == 1
+    node.execute(x.astype('f'))
+    assert len(node._frozen_signatures) == 2
+    # inputs with a new signature are still checked
+    try:
+        node.execute(uniform((10, 3)))
+        raise Exception('wrong input dimension was not detected')
+    except mdp.NodeException:
+        pass
+    node.unfreeze()
+    assert not node.is_frozen()
+    assert mdp.numx.all(node.execute(x) == y)
+
+def test_Flow_freeze():
+    x = uniform(MAT_DIM)
+    flow = mdp.Flow([mdp.nodes.PCANode(), mdp.nodes.SFANode()])
+    flow.train(x)
+    y = flow.execute(x)
+    flownode = mdp.hinet.FlowNode(flow)
+    flownode.freeze()
+    assert flownode.is_frozen()
+    for node in flow:
+        assert node.is_frozen()
+    assert mdp.numx.all(flownode.execute(x) == y)
+    flownode.unfreeze()
+    for node in flow:
+        assert not node.is_frozen()
@@ -290,6 +290,8 @@ def _rand_1d(x):
          init_args=[[lambda x:x, lambda x: x**2, _dumb_quadratic_expansion]]),
     dict(klass='HitParadeNode',
          init_args=[2, 5]),
+    dict(klass='AffineNode',
+         init_args=[lambda: uniform(size=(5, 3)), lambda: uniform(size=3)]),
     dict(klass='TimeFramesNode',
          init_args=[3, 4]),
     dict(klass='TimeDelayNode',
@@ -189,6 +189,57 @@ def test_nonparallel3():
     x = n.random.random([100,10])
     flow.execute(x)
     
+def test_tree_join():
+    """Test parallel training with the tree join of the forked nodes."""
+    precision = 8
+    flow = mdp.Flow([mdp.nodes.PCANode(output_dim=5),
+                     mdp.nodes.SFANode(output_dim=3)])
+    data_iterables = [[n.random.random((30,10))*n.arange(1,11)
+                       for _ in xrange(7)]] * 2
+    for scheduler in [parallel.Scheduler(),
+                      parallel.ThreadScheduler(n_threads=3)]:
+        parallel_flow = parallel.ParallelFlow(flow.copy()[:])
+        parallel_flow.train(data_iterables, scheduler=scheduler,
+                            tree_join=True)
+        scheduler.shutdown()
+        assert isinstance(scheduler.result_container,
+                          parallel.TreeTrainResultContainer)
+        assert parallel_flow[0].tlen == 7*30
+    flow.train(data_iterables)
+    x = n.random.random((20,10))
+    assert_array_almost_equal(abs(flow(x)), abs(parallel_flow(x)), precision)
+
+def test_tree_join_callable():
+    """Test that FlowJoinCallable joins the second flownode into the first."""
+    flownode = mdp.hinet.FlowNode(mdp.Flow([mdp.nodes.PCANode()]))
+    mdp.activate_extension("parallel")
+    try:
+        forks = [flownode.fork() for _ in xrange(2)]
+        for fork in forks:
+            fork.train(n.random.random((30,10)))
+        level, joined = parallel.FlowJoinCallable()((forks[0], forks[1], 1))
+    finally:
+        mdp.deactivate_extension("parallel")
+    assert level == 1
+    assert joined is forks[0]
+    assert joined._flow[0]._cov_mtx._tlen == 60
+
+def test_tree_train_result_container():
+    """Test that the container keeps at most one flownode per level."""
+    container = parallel.TreeTrainResultContainer()
+    container.add_result("a", 1)
+    assert container.get_pairs() == []
+    container.add_result("b", 2)
+    container.add_result("c", 3)
+    assert container.get_pairs() == [("a", "b", 1)]
+    container.add_result((1, "ab"), 4)
+    assert container.get_pairs() == []
+    # all results are in, so the different levels are paired up
+    assert container.wait_for_pairs(4) == [("c", "ab", 2)]
+    container.add_result((2, "abc"), 5)
+    assert container.wait_for_pairs(5) == []
+    assert container.get_results() == ["abc"]
+
 def test_train_purge_nodes():
     """Test that FlowTrainCallable correctly purges nodes."""
     sfa_node = mdp.nodes.SFANode(input_dim=10, output_dim=8)
@@ -1,3 +1,7 @@
+import os
+import shutil
+import tempfile
+
 import mdp.parallel as parallel
 from _tools import *
 
@@ -120,6 +124,70 @@ def test_ParallelHistogramNode_fraction():
         node.join(forked_node)
     assert len(node.data_hist) < 1000
 
+def test_ParallelHistogramNode_npy_file():
+    """Test that the joined history is written to the .npy file."""
+    dirname = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(dirname, "hist.npy")
+        node = parallel.ParallelHistogramNode(hist_filename=filename)
+        x = numx_rand.random((500, 3))
+        for i in range(0, 500, 100):
+            forked_node = node.fork()
+            forked_node.train(x[i:i+100])
+            node.join(forked_node)
+        assert node._hist_file is not None
+        assert_array_equal(node.data_hist, x)
+        node.stop_training()
+        assert_array_equal(numx.load(filename), x)
+    finally:
+        shutil.rmtree(dirname)
+
+def test_ParallelHistogramNode_max_samples():
+    """Test that the reservoir samples of the forks are combined."""
+    node = parallel.ParallelHistogramNode(max_samples=100)
+    x = numx.arange(3000, dtype="d").reshape((1500, 2))
+    for chunk in [x[:1000], x[1000:1200], x[1200:]]:
+        forked_node = node.fork()
+        forked_node.train(chunk)
+        node.join(forked_node)
+    assert len(node.data_hist) == 100
+    assert node._hist_seen == 1500
+    rows = node.data_hist[:, 0].astype("l") // 2
+    assert len(numx.unique(rows)) == 100
+
+def test_ParallelAdaptiveCutoffNode_sketch():
+    """Test that the quantile sketches of the forks are merged."""
+    node = parallel.ParallelAdaptiveCutoffNode(lower_cutoff_fraction=0.2,
+                                               sketch_size=10)
+    x1 = numx.array([[0.1, 0.3], [0.3, 0.5], [0.5, 0.7]])
+    x2 = numx.array([[0.4, 0.6], [0.2, 0.4], [0.6, 0.2]])
+    for chunk in [x1, x2]:
+        forked_node = node.fork()
+        forked_node.train(chunk)
+        node.join(forked_node)
+    node.stop_training()
+    assert numx.all(node.lower_bounds == numx.array([0.2, 0.3]))
+
+def test_ParallelAdaptiveCutoffNode_npy_file():
+    """Test the join of the history in a .npy file."""
+    dirname = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(dirname, "hist.npy")
+        node = parallel.ParallelAdaptiveCutoffNode(lower_cutoff_fraction=0.2,
+                                                   hist_filename=filename)
+        x1 = numx.array([[0.1, 0.3], [0.3, 0.5], [0.5, 0.7]])
+        x2 = numx.array([[0.4, 0.6], [0.2, 0.4], [0.6, 0.2]])
+        for chunk in [x1, x2]:
+            forked_node = node.fork()
+            forked_node.train(chunk)
+            node.join(forked_node)
+        node.stop_training()
+        assert numx.all(node.lower_bounds == numx.array([0.2, 0.3]))
+        assert_array_equal(numx.load(filename),
+                           numx.concatenate([x1, x2]))
+    finally:
+        shutil.rmtree(dirname)
+
 
 class TestDerivedParallelMDPNodes(object):
     """Test derived nodes that use the parallel node classes."""
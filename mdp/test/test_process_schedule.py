@@ -96,3 +96,89 @@ def test_process_scheduler_mdp_version():
     # check that we get 2 identical dictionaries
     assert out[0] == out[1], 'Subprocesses did not run'
     'the same MDP as the parent:\n%s\n--\n%s'%(out[0], out[1])
+
+def test_process_scheduler_shared_memory():
+    """Test process scheduler with shared memory array transport."""
+    scheduler = parallel.ProcessScheduler(verbose=False,
+                                          n_processes=2,
+                                          source_paths=None,
+                                          shared_memory=True)
+    # the arrays must be large enough to be transferred via shared memory
+    data = [mdp.numx_rand.random((10000, 10)) for _ in xrange(6)]
+    for x in data:
+        scheduler.add_task(x, parallel.SqrTestCallable())
+    results = scheduler.get_results()
+    scheduler.shutdown()
+    for x, result in zip(data, results):
+        assert not isinstance(result, n.memmap)
+        assert_array_equal(result, x**2)
+
+def test_process_scheduler_shared_memory_flow():
+    """Test process scheduler with shared memory and real Nodes."""
+    precision = 6
+    flow = mdp.parallel.ParallelFlow([mdp.nodes.PCANode(output_dim=5),
+                                      mdp.nodes.SFANode(output_dim=3)])
+    parallel_flow = mdp.parallel.ParallelFlow(flow.copy()[:])
+    input_dim = 10
+    scales = n.linspace(1, 100, num=input_dim)
+    train_iterables = [[mdp.numx_rand.random((1000, input_dim)) * scales
+                        for _ in xrange(4)] for _ in xrange(2)]
+    x = mdp.numx_rand.random((1000, input_dim))
+    with parallel.ProcessScheduler(n_processes=2, source_paths=None,
+                                   shared_memory=True) as scheduler:
+        parallel_flow.train(train_iterables, scheduler=scheduler)
+        y2 = parallel_flow.execute([x for _ in xrange(4)],
+                                   scheduler=scheduler)[:1000]
+    flow.train(train_iterables)
+    y1 = flow.execute(x)
+    assert_array_almost_equal(abs(y1), abs(y2), precision)
+
+def test_process_scheduler_tree_join():
+    """Test the tree join of the forked nodes in the subprocesses."""
+    precision = 6
+    flow = mdp.Flow([mdp.nodes.PCANode(output_dim=5),
+                     mdp.nodes.SFANode(output_dim=3)])
+    parallel_flow = mdp.parallel.ParallelFlow(flow.copy()[:])
+    input_dim = 10
+    scales = n.linspace(1, 100, num=input_dim)
+    train_iterables = [[mdp.numx_rand.random((100, input_dim)) * scales
+                        for _ in xrange(4)]] * 2
+    with parallel.ProcessScheduler(verbose=False,
+                                   n_processes=3,
+                                   source_paths=None) as scheduler:
+        parallel_flow.train(train_iterables, scheduler=scheduler,
+                            tree_join=True)
+    assert parallel_flow[0].tlen == 4*100
+    flow.train(train_iterables)
+    x = mdp.numx_rand.random((20, input_dim))
+    assert_array_almost_equal(abs(flow(x)), abs(parallel_flow(x)),
+                              precision)
+
+def test_shared_memory_dump_load():
+    """Test the shared memory transport of special arrays."""
+    import tempfile
+    from mdp.parallel.process_schedule import _dump, _load, _remove_files
+    n_rows = 10000
+    structured = n.zeros(n_rows, dtype=[("a", "f8"), ("b", "i4", (2,))])
+    structured["a"] = n.arange(n_rows)
+    structured["b"][:, 1] = 3
+    matrix = n.asmatrix(mdp.numx_rand.random((n_rows, 10)))
+    plain = mdp.numx_rand.random((n_rows, 10))
+    pickle_file = tempfile.TemporaryFile()
+    filenames = []
+    try:
+        filenames = _dump([structured, matrix, plain], pickle_file,
+                          shared_memory_dir=tempfile.gettempdir())
+        # the matrix subclass is pickled as usual
+        assert len(filenames) == 2
+        pickle_file.seek(0)
+        (structured2, matrix2, plain2), _ = _load(pickle_file, copy=True)
+    finally:
+        pickle_file.close()
+        _remove_files(filenames)
+    assert structured2.dtype == structured.dtype
+    assert_array_equal(structured2["a"], structured["a"])
+    assert_array_equal(structured2["b"], structured["b"])
+    assert isinstance(matrix2, n.matrix)
+    assert_array_equal(matrix2, matrix)
+    assert_array_equal(plain2, plain)
@@ -15,6 +15,7 @@
 from quad_forms import QuadraticForm, QuadraticFormException
 from covariance import (CovarianceMatrix, DelayCovarianceMatrix,
                         MultipleCovarianceMatrices,CrossCovarianceMatrix)
+from quantile_sketch import QuantileSketch
 from progress_bar import progressinfo
 from repo_revision import get_git_revision
 from slideshow import (basic_css, slideshow_css, HTMLSlideShow,
@@ -76,12 +77,13 @@ def svd(x, compute_uv = True):
 del introspection
 del quad_forms
 del covariance
+del quantile_sketch
 del progress_bar
 del slideshow
 del repo_revision
 
 __all__ = ['CovarianceMatrix', 'DelayCovarianceMatrix','CrossCovarianceMatrix',
-           'MultipleCovarianceMatrices', 'QuadraticForm',
+           'MultipleCovarianceMatrices', 'QuantileSketch', 'QuadraticForm',
            'QuadraticFormException',
            'comb', 'cov2', 'dig_node', 'get_dtypes', 'get_node_size',
            'hermitian', 'inv', 'mult', 'mult_diag', 'nongeneral_svd',
@@ -128,6 +130,7 @@ def fixup_namespace(mname, names, old_modules):
                  'introspection',
                  'quad_forms',
                  'covariance',
+                 'quantile_sketch',
                  'progress_bar',
                  'slideshow',
                  'repo_revision',
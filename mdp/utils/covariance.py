@@ -22,23 +22,35 @@ class CovarianceMatrix(object):
     the covariance matrix, the average and the number of observations, and
     resets the internal data.
 
-    Note that the internal sum is a standard __add__ operation. We are not
-    using any of the fancy sum algorithms to avoid round off errors when
-    adding many numbers. If you want to contribute a CovarianceMatrix class
-    that uses such algorithms we would be happy to include it in MDP.
-    For a start see the Python recipe by Raymond Hettinger at
-    http://aspn.activestate.com/ASPN/Cookbook/Python/Recipe/393090
+    By default the internal sum is a standard __add__ operation on the
+    raw second moments, which can lead to severe round off errors when
+    adding many numbers (especially with single precision data).
+    In 'pairwise' mode the class instead keeps the mean and the centered
+    second moments of the data seen so far, and combines them with the
+    statistics of each new data chunk using the parallel algorithm of
+    Chan, Golub and LeVeque (a chunked version of Welford's algorithm):
+
+      Chan, T.F., Golub, G.H., and LeVeque, R.J. (1979), Updating Formulae
+      and a Pairwise Algorithm for Computing Sample Variances,
+      Technical Report STAN-CS-79-773, Stanford University.
+
+    Two instances can be combined with the 'merge' method, e.g. to join
+    the statistics collected by parallel forks of a node.
+
     For a review about floating point arithmetic and its pitfalls see
     http://docs.sun.com/source/806-3568/ncg_goldberg.html
     """
 
-    def __init__(self, dtype=None, bias=False):
+    def __init__(self, dtype=None, bias=False, pairwise=False):
         """If dtype is not defined, it will be inherited from the first
         data bunch received by 'update'.
         All the matrices in this class are set up with the given dtype and
         no upcast is possible.
         If bias is True, the covariance matrix is normalized by dividing
         by T instead of the usual T-1.
+        If pairwise is True, centered statistics are accumulated chunk by
+        chunk, which is numerically much more stable than summing the raw
+        second moments (see class docstring).
         """
         if dtype is None:
             self._dtype = None
@@ -53,6 +65,7 @@ def __init__(self, dtype=None, bias=False):
         self._tlen = 0
 
         self.bias = bias
+        self.pairwise = pairwise
 
     def _init_internals(self, x):
         """Init the internal structures.
@@ -82,12 +95,102 @@ def update(self, x):
             self._init_internals(x)
         # cast input
         x = mdp.utils.refcast(x, self._dtype)
+        if self.pairwise:
+            tlen = x.shape[0]
+            if tlen == 0:
+                return
+            avg = x.mean(axis=0)
+            x = x - avg
+            self._combine(mdp.utils.mult(x.T, x), avg, tlen)
+            return
         # update the covariance matrix, the average and the number of
         # observations (try to do everything inplace)
         self._cov_mtx += mdp.utils.mult(x.T, x)
         self._avg += x.sum(axis=0)
         self._tlen += x.shape[0]
 
+    def update_moments(self, second_moments, sums, tlen):
+        """Update internal structures with the statistics of a data set.
+
+        second_moments -- The matrix x.T*x of the data set x.
+        sums -- The sum of the rows of x.
+        tlen -- The number of rows of x.
+
+        This is equivalent to 'update(x)', but x does not need to exist,
+        e.g. when the moments can be computed block by block.
+        """
+        if tlen == 0:
+            return
+        if self._cov_mtx is None:
+            if self._dtype is None:
+                self._dtype = second_moments.dtype
+            dim = second_moments.shape[0]
+            self._input_dim = dim
+            self._cov_mtx = numx.zeros((dim, dim), self._dtype)
+            self._avg = numx.zeros(dim, self._dtype)
+        second_moments = mdp.utils.refcast(second_moments, self._dtype)
+        sums = mdp.utils.refcast(sums, self._dtype)
+        if self.pairwise:
+            avg = sums / tlen
+            self._combine(second_moments - numx.outer(sums, avg), avg, tlen)
+            return
+        self._cov_mtx += second_moments
+        self._avg += sums
+        self._tlen += tlen
+
+    def _combine(self, cov_mtx, avg, tlen):
+        """Combine the internal centered statistics with those of another
+        data set (pairwise mode only).
+
+        cov_mtx -- Centered second moments (i.e. the scatter matrix).
+        avg -- Average of the other data set.
+        tlen -- Number of observations in the other data set.
+        """
+        old_tlen = self._tlen
+        new_tlen = old_tlen + tlen
+        delta = avg - self._avg
+        self._cov_mtx += cov_mtx
+        self._cov_mtx += numx.outer(delta, delta*(float(old_tlen*tlen) /
+                                                  new_tlen)).astype(self._dtype)
+        self._avg += (delta*(float(tlen)/new_tlen)).astype(self._dtype)
+        self._tlen = new_tlen
+
+    def merge(self, other):
+        """Merge the statistics collected by another CovarianceMatrix
+        instance into this one (in-place).
+
+        The two instances must use the same accumulation mode. The other
+        instance is not modified. In pairwise mode the result is the same
+        (up to round off) as if all the data had been passed to this
+        instance.
+        """
+        if other.pairwise != self.pairwise:
+            err = ('Can not merge CovarianceMatrix instances with different '
+                   'accumulation modes (pairwise=%s and pairwise=%s).' %
+                   (self.pairwise, other.pairwise))
+            raise mdp.MDPException(err)
+        if other._cov_mtx is None:
+            return
+        if self._cov_mtx is None:
+            if self._dtype is None:
+                self._dtype = other._dtype
+            self._input_dim = other._input_dim
+            self._cov_mtx = numx.zeros(other._cov_mtx.shape, self._dtype)
+            self._avg = numx.zeros(other._avg.shape, self._dtype)
+        if self._cov_mtx.shape != other._cov_mtx.shape:
+            err = ('Input dimensions mismatch: %d != %d.' %
+                   (self._cov_mtx.shape[0], other._cov_mtx.shape[0]))
+            raise mdp.MDPException(err)
+        if self.pairwise:
+            if other._tlen > 0:
+                self._combine(mdp.utils.refcast(other._cov_mtx, self._dtype),
+                              mdp.utils.refcast(other._avg, self._dtype),
+                              other._tlen)
+        else:
+            self._cov_mtx += mdp.utils.refcast(other._cov_mtx, self._dtype)
+            self._avg += mdp.utils.refcast(other._avg, self._dtype)
+            self._tlen += other._tlen
+
     def fix(self, center=True):
         """Returns a triple containing the covariance matrix, the average and
         the number of observations. The covariance matrix is then reset to
@@ -98,27 +201,37 @@ def fix(self, center=True):
         # local variables
         type_ = self._dtype
         tlen = self._tlen
-        _check_roundoff(tlen, type_)
         avg = self._avg
         cov_mtx = self._cov_mtx
 
-        ##### fix the training variables
-        # fix the covariance matrix (try to do everything inplace)
-        if self.bias:
-            cov_mtx /= tlen
+        if self.pairwise:
+            # the internal matrix already contains the centered statistics
+            # and the internal average is the mean
+            if not center:
+                cov_mtx += numx.outer(avg, avg*tlen).astype(type_)
+            if self.bias:
+                cov_mtx /= tlen
+            else:
+                cov_mtx /= tlen - 1
         else:
-            cov_mtx /= tlen - 1
-
-        if center:
-            avg_mtx = numx.outer(avg, avg)
+            _check_roundoff(tlen, type_)
+            ##### fix the training variables
+            # fix the covariance matrix (try to do everything inplace)
             if self.bias:
-                avg_mtx /= tlen*(tlen)
+                cov_mtx /= tlen
             else:
-                avg_mtx /= tlen*(tlen - 1)
-            cov_mtx -= avg_mtx
+                cov_mtx /= tlen - 1
 
-        # fix the average
-        avg /= tlen
+            if center:
+                avg_mtx = numx.outer(avg, avg)
+                if self.bias:
+                    avg_mtx /= tlen*(tlen)
+                else:
+                    avg_mtx /= tlen*(tlen - 1)
+                cov_mtx -= avg_mtx
+
+            # fix the average
+            avg /= tlen
 
         ##### clean up
         # covariance matrix, updated during the training phase
@@ -337,6 +450,9 @@ def copy(self):
 class CrossCovarianceMatrix(CovarianceMatrix):
 
     def _init_internals(self, x, y):
+        if self.pairwise:
+            err = 'CrossCovarianceMatrix does not support the pairwise mode.'
+            raise mdp.MDPException(err)
         if self._dtype is None:
             self._dtype = x.dtype
             if y.dtype != x.dtype:
@@ -370,6 +486,22 @@ def update(self, x, y):
         self._avgy += y.sum(axis=0)
         self._tlen += x.shape[0]
 
+    def merge(self, other):
+        """Merge the statistics collected by another CrossCovarianceMatrix
+        instance into this one (in-place)."""
+        if other._cov_mtx is None:
+            return
+        if self._cov_mtx is None:
+            if self._dtype is None:
+                self._dtype = other._dtype
+            self._cov_mtx = numx.zeros(other._cov_mtx.shape, self._dtype)
+            self._avgx = numx.zeros(other._avgx.shape, self._dtype)
+            self._avgy = numx.zeros(other._avgy.shape, self._dtype)
+        self._cov_mtx += mdp.utils.refcast(other._cov_mtx, self._dtype)
+        self._avgx += mdp.utils.refcast(other._avgx, self._dtype)
+        self._avgy += mdp.utils.refcast(other._avgy, self._dtype)
+        self._tlen += other._tlen
+
     def fix(self):
         type_ = self._dtype
         tlen = self._tlen
@@ -0,0 +1,119 @@
+import mdp
+
+# import numeric module (scipy, Numeric or numarray)
+numx = mdp.numx
+numx_rand = mdp.numx_rand
+
+class QuantileSketch(object):
+    """This class stores a summary of a data set that can be used to
+    estimate the quantiles of each data column, using bounded memory.
+
+    The data is stored in a hierarchy of compactors, as in the KLL sketch:
+
+      Karnin, Z., Lang, K., and Liberty, E. (2016), Optimal Quantile
+      Approximation in Streams, Proceedings of the 57th Annual Symposium
+      on Foundations of Computer Science.
+
+    Each item stored at level l stands for 2**l data points. When a level
+    holds more than 'size' items, they are sorted and every second item
+    (starting with a random offset) is moved to the next level. Every
+    column receives the same number of items, so all the columns are
+    compacted at the same time with vectorized array operations.
+
+    Up to 'size' data points the quantiles are exact. For larger data sets
+    the rank error is of the order of log2(n/size)/size, and the memory
+    usage is of the order of size*log2(n/size) items per column.
+
+    Two instances can be combined with the 'merge' method, e.g. to join
+    the sketches collected by parallel forks of a node.
+    """
+
+    def __init__(self, size=1000, dtype=None):
+        """Initialize the sketch.
+
+        size -- Maximum number of items stored at each level.
+        dtype -- dtype of the stored items, by default the dtype of the
+            first data chunk is used.
+        """
+        self.size = int(size)
+        self._dtype = dtype
+        # list of 2d arrays with the items at each level (one column per
+        # data column)
+        self._levels = []
+        self.n = 0
+
+    def update(self, x):
+        """Add the 2d array x to the sketch."""
+        if self._dtype is None:
+            self._dtype = x.dtype
+        if not self._levels:
+            self._levels.append(numx.array(x, dtype=self._dtype))
+        else:
+            self._levels[0] = numx.concatenate([self._levels[0], x])
+        self.n += len(x)
+        self._compact()
+
+    def merge(self, other):
+        """Add the data summarized by the sketch other to this sketch.
+
+        The two sketches must have the same size and number of columns.
+        """
+        if self.size != other.size:
+            err = ("Can not merge quantile sketches with different sizes "
+                   "(%d and %d)." % (self.size, other.size))
+            raise mdp.MDPException(err)
+        if self._dtype is None:
+            self._dtype = other._dtype
+        for level, items in enumerate(other._levels):
+            if level < len(self._levels):
+                self._levels[level] = numx.concatenate([self._levels[level],
+                                                        items])
+            else:
+                self._levels.append(items.copy())
+        self.n += other.n
+        self._compact()
+
+    def _compact(self):
+        """Compact the levels which hold more than 'size' items."""
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if len(items) > self.size:
+                items = numx.sort(items, axis=0)
+                # an odd item stays at this level
+                n_pairs = len(items) // 2
+                offset = numx_rand.randint(2)
+                promoted = items[offset:2*n_pairs:2]
+                self._levels[level] = items[2*n_pairs:]
+                if level+1 < len(self._levels):
+                    self._levels[level+1] = numx.concatenate(
+                        [self._levels[level+1], promoted])
+                else:
+                    self._levels.append(promoted)
+            level += 1
+
+    def quantiles(self, ranks):
+        """Return an array with the estimated items of the given ranks.
+
+        ranks -- Sequence of ranks between 0 and n-1. The result has one
+            row for each rank and one column for each data column. The item
+            of rank r is the item that would be at index r if each column
+            of the data were sorted.
+        """
+        if not self.n:
+            err = "The quantile sketch does not contain any data."
+            raise mdp.MDPException(err)
+        items = numx.concatenate(self._levels)
+        weights = numx.concatenate([numx.ones(len(items_), dtype="l") * 2**l
+                                    for l, items_ in enumerate(self._levels)])
+        order = items.argsort(axis=0)
+        cols = numx.arange(items.shape[1])
+        # cumulative weights of the sorted items in each column
+        cum_weights = weights[order].cumsum(axis=0)
+        result = numx.empty((len(ranks), items.shape[1]), dtype=self._dtype)
+        for i, rank in enumerate(ranks):
+            # index of the first item whose cumulative weight exceeds rank
+            idx = (cum_weights <= rank).sum(axis=0)
+            idx = numx.minimum(idx, len(items)-1)
+            result[i] = items[order[idx, cols], cols]
+        return result